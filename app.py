@@ -1,5 +1,6 @@
 from ultralytics import YOLO
 import cv2
+from copy import copy
 from datetime import datetime
 import os
 import django
@@ -11,7 +12,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
 django.setup()
 
 # Import Django models after setup
+from django.db import transaction
 from myapp.models import PalmOilCount
+from myapp.rollup import record_saved
 
 def save_initial_data(suitable_count, unsuitable_count, frame):
     try:
@@ -29,12 +32,15 @@ def save_initial_data(suitable_count, unsuitable_count, frame):
         
         # Simpan data ke database
         relative_path = f'palm_oil_images/{img_filename}'
-        count = PalmOilCount.objects.create(
-            suitable_count=suitable_count,
-            unsuitable_count=unsuitable_count,
-            status="running",
-            image=relative_path
-        )
+        with transaction.atomic():
+            count = PalmOilCount.objects.create(
+                suitable_count=suitable_count,
+                unsuitable_count=unsuitable_count,
+                status="running",
+                image=relative_path
+            )
+            # Rollup harian dan versi cache dashboard ikut diperbarui
+            record_saved(count)
         
         print(f"Data berhasil disimpan dengan ID: {count.id}")
         return count.id
@@ -45,10 +51,13 @@ def save_initial_data(suitable_count, unsuitable_count, frame):
 
 def update_count_data(count_id, suitable_count, unsuitable_count):
     try:
-        count = PalmOilCount.objects.get(id=count_id)
-        count.suitable_count = suitable_count
-        count.unsuitable_count = unsuitable_count
-        count.save()
+        with transaction.atomic():
+            count = PalmOilCount.objects.select_for_update().get(id=count_id)
+            old = copy(count)
+            count.suitable_count = suitable_count
+            count.unsuitable_count = unsuitable_count
+            count.save(update_fields=['suitable_count', 'unsuitable_count'])
+            record_saved(count, old)
         print(f"Data ID {count_id} berhasil diupdate")
     except Exception as e:
         print("Terjadi kesalahan saat update data:", e)
@@ -1,5 +1,212 @@
-from ultralytics import YOLO
-model = YOLO('yolov8n.pt')  # atau model custom Anda
+import argparse
+import glob
+import os
+import sys
+import time
 
-# Ekspor model ke ONNX
-model.export(format='onnx', opset=12, simplify=True)
+import cv2
+import numpy as np
+
+# Reuse the detection server's pre/post-processing so the comparison matches production
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'detection_server'))
+from detectors import OnnxRuntimeDetector, letterbox  # noqa: E402
+from tracker import iou_matrix  # noqa: E402
+
+IMAGE_EXTENSIONS = ('*.jpg', '*.jpeg', '*.png', '*.bmp')
+
+
+def export_onnx(model_path, imgsz, opset=12):
+    """Export a YOLO .pt model to ONNX (simplified)"""
+    from ultralytics import YOLO
+    model = YOLO(model_path)  # atau model custom Anda
+    return model.export(format='onnx', opset=opset, simplify=True, imgsz=imgsz)
+
+
+def load_frames(folder, limit=None):
+    paths = []
+    for pattern in IMAGE_EXTENSIONS:
+        paths.extend(glob.glob(os.path.join(folder, pattern)))
+    paths.sort()
+    if limit:
+        paths = paths[:limit]
+    frames = [(path, cv2.imread(path)) for path in paths]
+    return [(path, frame) for path, frame in frames if frame is not None]
+
+
+def split_held_out(frames, fraction):
+    """Split off the last fraction of frames as a held-out evaluation set.
+
+    Frames are sorted by name, usually capture time, so the held-out block
+    is not a set of near-duplicates of the calibration frames.
+    """
+    held_out = int(round(len(frames) * fraction))
+    if not 0 < held_out < len(frames):
+        return frames, []
+    return frames[:-held_out], frames[-held_out:]
+
+
+class FrameCalibrationReader:
+    """Feeds letterboxed conveyor frames to the INT8 calibrator"""
+
+    def __init__(self, frames, input_name, input_shape):
+        # Generator: only one preprocessed blob is held in memory at a time
+        self._blobs = (
+            {input_name: cv2.dnn.blobFromImage(letterbox(frame, input_shape)[0], 1 / 255.0, swapRB=True)}
+            for _, frame in frames
+        )
+
+    def get_next(self):
+        return next(self._blobs, None)
+
+
+def quantize_int8(fp32_path, frames):
+    """Statically quantize fp32_path to INT8 using frames for calibration"""
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime.quantization import (CalibrationMethod, QuantFormat, QuantType,
+                                          quantize_static)
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    session = ort.InferenceSession(fp32_path, providers=['CPUExecutionProvider'])
+    model_input = session.get_inputs()[0]
+    input_shape = (model_input.shape[2], model_input.shape[3])
+    del session
+
+    base, _ = os.path.splitext(fp32_path)
+    prepared_path = f"{base}_prep.onnx"
+    int8_path = f"{base}_int8.onnx"
+    # Static-shape export, so plain ONNX shape inference is enough (no sympy needed)
+    quant_pre_process(fp32_path, prepared_path, skip_symbolic_shape=True)
+
+    # Per-channel QDQ needs the axis attribute of DequantizeLinear (opset >= 13);
+    # the default opset 12 export falls back to per-tensor weights.
+    opset = max(o.version for o in onnx.load(fp32_path).opset_import if o.domain in ('', 'ai.onnx'))
+    per_channel = opset >= 13
+    if not per_channel:
+        print(f"Opset {opset} model: using per-tensor weight quantization")
+
+    quantize_static(
+        prepared_path,
+        int8_path,
+        FrameCalibrationReader(frames, model_input.name, input_shape),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=per_channel,
+        calibrate_method=CalibrationMethod.MinMax,
+    )
+    os.remove(prepared_path)
+    return int8_path
+
+
+def agreement(reference, candidate, iou_threshold=0.5):
+    """Matches of candidate detections against the reference (same class, IoU >= threshold)"""
+    if not len(reference) or not len(candidate):
+        return 0
+    iou = iou_matrix(reference.boxes, candidate.boxes)
+    iou[reference.classes[:, None] != candidate.classes[None, :]] = 0
+    matched = 0
+    while iou.size and iou.max() >= iou_threshold:
+        r, c = np.unravel_index(iou.argmax(), iou.shape)
+        iou[r, :] = 0
+        iou[:, c] = 0
+        matched += 1
+    return matched
+
+
+def compare_models(fp32_path, int8_path, frames):
+    """Print latency and accuracy of the INT8 model relative to FP32 on the same frames"""
+    if not frames:
+        raise ValueError("No frames to compare the models on")
+    fp32 = OnnxRuntimeDetector(fp32_path)
+    int8 = OnnxRuntimeDetector(int8_path)
+
+    # Warm up both sessions so one-off allocations do not skew latency
+    for detector in (fp32, int8):
+        detector.detect(frames[0][1])
+
+    latencies = {'fp32': [], 'int8': []}
+    fp32_total = int8_total = matched_total = 0
+    for _, frame in frames:
+        start = time.perf_counter()
+        reference = fp32.detect(frame)
+        latencies['fp32'].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        candidate = int8.detect(frame)
+        latencies['int8'].append((time.perf_counter() - start) * 1000)
+
+        fp32_total += len(reference)
+        int8_total += len(candidate)
+        matched_total += agreement(reference, candidate)
+
+    print("\n" + "=" * 60)
+    print(f"FP32 vs INT8 on {len(frames)} frames")
+    print("=" * 60)
+    print(f"{'model':<6} {'size MB':>8} {'load s':>7} {'mean ms':>8} {'p95 ms':>7} {'FPS':>6} {'boxes':>6}")
+    for name, detector, path, boxes in (('fp32', fp32, fp32_path, fp32_total),
+                                        ('int8', int8, int8_path, int8_total)):
+        times = np.array(latencies[name])
+        print(f"{name:<6} {os.path.getsize(path) / 1e6:>8.1f} {detector.load_time:>7.2f} "
+              f"{times.mean():>8.1f} {np.percentile(times, 95):>7.1f} {1000 / times.mean():>6.1f} {boxes:>6}")
+
+    recall = matched_total / fp32_total if fp32_total else 1.0
+    precision = matched_total / int8_total if int8_total else 1.0
+    speedup = np.mean(latencies['fp32']) / np.mean(latencies['int8'])
+    print(f"\nINT8 agreement with FP32 (IoU >= 0.5, same class): "
+          f"recall {recall:.3f}, precision {precision:.3f}")
+    print(f"INT8 speedup: {speedup:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the YOLO model to ONNX, optionally with an INT8 copy")
+    parser.add_argument('--model', default='yolov8n.pt', help="YOLO .pt model to export")
+    parser.add_argument('--imgsz', type=int, nargs='+', default=[640],
+                        help="Export input size: one value, or height width (e.g. 224 640 for an ROI band model)")
+    parser.add_argument('--opset', type=int, default=12, help="ONNX opset (13+ enables per-channel INT8 weights)")
+    parser.add_argument('--onnx', help="Use an existing FP32 .onnx instead of exporting")
+    parser.add_argument('--int8', action='store_true', help="Also write a statically quantized INT8 model")
+    parser.add_argument('--calib-dir', help="Folder of conveyor frames used for INT8 calibration")
+    parser.add_argument('--calib-limit', type=int, default=200, help="Max calibration frames")
+    parser.add_argument('--eval-dir', help="Frames for the FP32/INT8 comparison "
+                                           "(default: held out from --calib-dir, see --eval-split)")
+    parser.add_argument('--eval-split', type=float, default=0.2,
+                        help="Fraction of the --calib-dir frames held out for the comparison without --eval-dir")
+    parser.add_argument('--eval-limit', type=int, default=200, help="Max comparison frames")
+    args = parser.parse_args()
+
+    # Ekspor model ke ONNX
+    fp32_path = args.onnx or export_onnx(args.model, args.imgsz if len(args.imgsz) > 1 else args.imgsz[0], args.opset)
+    print(f"FP32 model: {fp32_path}")
+
+    if not args.int8:
+        return
+
+    if not args.calib_dir:
+        parser.error("--int8 requires --calib-dir")
+    calib_frames = load_frames(args.calib_dir, args.calib_limit)
+    if not calib_frames:
+        parser.error(f"No images found in {args.calib_dir}")
+
+    if args.eval_dir:
+        eval_frames = load_frames(args.eval_dir, args.eval_limit)
+        calib_paths = {os.path.realpath(path) for path, _ in calib_frames}
+        if any(os.path.realpath(path) in calib_paths for path, _ in eval_frames):
+            print("Warning: the evaluation frames overlap the calibration frames; "
+                  "INT8 accuracy will look better than on unseen data")
+    else:
+        # Never evaluate on the frames the INT8 ranges were calibrated on
+        calib_frames, eval_frames = split_held_out(calib_frames, args.eval_split)
+        eval_frames = eval_frames[:args.eval_limit]
+    if not eval_frames:
+        parser.error("No evaluation frames: pass --eval-dir or a larger --calib-dir / --eval-split")
+
+    print(f"Calibrating INT8 model on {len(calib_frames)} frames...")
+    int8_path = quantize_int8(fp32_path, calib_frames)
+    print(f"INT8 model: {int8_path}")
+
+    compare_models(fp32_path, int8_path, eval_frames)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Micro-benchmark: cooldown bookkeeping cost per frame at rising object rates.
+
+Compares the old approach (dict pruned by a full scan every 100 frames)
+with CooldownStore (queue expiry every frame). Run from detection_server/:
+
+    python bench_cooldown.py
+"""
+import time
+
+from cooldown import CooldownStore
+
+FRAMES = 20000
+COOLDOWN_FRAMES = 30
+OBJECTS_PER_FRAME = (1, 10, 100, 1000)
+
+
+def bench_dict_scan(objects_per_frame):
+    counted = {}
+    next_key = 0
+    worst = 0.0
+    live_total = 0
+    start = time.perf_counter()
+    for frame in range(1, FRAMES + 1):
+        t0 = time.perf_counter()
+        if frame % 100 == 0:
+            old_objects = [key for key, frame_counted in counted.items()
+                           if frame - frame_counted > COOLDOWN_FRAMES]
+            for key in old_objects:
+                del counted[key]
+        for _ in range(objects_per_frame):
+            if next_key not in counted:
+                counted[next_key] = frame
+            next_key += 1
+        worst = max(worst, time.perf_counter() - t0)
+        live_total += len(counted)
+    return (time.perf_counter() - start) / FRAMES, worst, live_total / FRAMES
+
+
+def bench_cooldown_store(objects_per_frame):
+    counted = CooldownStore(COOLDOWN_FRAMES)
+    next_key = 0
+    worst = 0.0
+    live_total = 0
+    start = time.perf_counter()
+    for frame in range(1, FRAMES + 1):
+        t0 = time.perf_counter()
+        counted.expire(frame)
+        for _ in range(objects_per_frame):
+            if next_key not in counted:
+                counted.mark(next_key, frame)
+            next_key += 1
+        worst = max(worst, time.perf_counter() - t0)
+        live_total += len(counted)
+    return (time.perf_counter() - start) / FRAMES, worst, live_total / FRAMES
+
+
+def main():
+    print(f"{FRAMES} frames, cooldown {COOLDOWN_FRAMES} frames")
+    print(f"{'objects/frame':>14} | {'impl':>14} | {'avg us/frame':>12} | {'avg us/object':>13} | "
+          f"{'worst frame us':>14} | {'avg entries':>11}")
+    for objects_per_frame in OBJECTS_PER_FRAME:
+        for name, bench in (("dict scan/100", bench_dict_scan), ("CooldownStore", bench_cooldown_store)):
+            avg, worst, live = bench(objects_per_frame)
+            print(f"{objects_per_frame:>14} | {name:>14} | {avg * 1e6:>12.2f} | "
+                  f"{avg * 1e6 / objects_per_frame:>13.3f} | {worst * 1e6:>14.1f} | {live:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from config import Config
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class FrameReader:
+    """Background reader around cv2.VideoCapture.
+
+    A dedicated thread keeps calling cap.read() so OpenCV's internal buffer
+    never fills up with stale frames. Frames are handed to the consumer
+    through a small buffer whose overflow behaviour is set by drop_policy:
+
+    - drop_oldest: newest frame wins, older buffered frames are discarded
+    - drop_newest: buffered frames are kept, the incoming frame is discarded
+    - block: the reader waits until the consumer takes a frame
+    """
+
+    def __init__(self, source=None, width=None, height=None, fps=None,
+                 drop_policy=None, buffer_size=None):
+        self.source = Config.CAMERA_SOURCE if source is None else source
+        self.width = width or Config.CAMERA_WIDTH
+        self.height = height or Config.CAMERA_HEIGHT
+        self.fps = fps or Config.CAMERA_FPS
+        self.drop_policy = drop_policy or Config.CAMERA_DROP_POLICY
+        if self.drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{self.drop_policy}', expected one of {DROP_POLICIES}")
+        self.buffer_size = max(1, buffer_size or Config.CAMERA_BUFFER_SIZE)
+
+        self.cap = None
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.read_errors = 0
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._frame_id = 0
+
+    def open(self):
+        """Open the camera, retrying CAMERA_MAX_ATTEMPTS times"""
+        for attempt in range(1, Config.CAMERA_MAX_ATTEMPTS + 1):
+            cap = cv2.VideoCapture(self.source)
+            if cap.isOpened():
+                cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+                cap.set(cv2.CAP_PROP_FPS, self.fps)
+                # Keep the driver-side queue as short as the backend allows
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                self.cap = cap
+                return True
+            cap.release()
+            print(f"Camera {self.source} not ready (attempt {attempt}/{Config.CAMERA_MAX_ATTEMPTS})")
+            time.sleep(Config.CAMERA_RETRY_DELAY)
+        return False
+
+    def frame_size(self):
+        """Actual (width, height) reported by the camera"""
+        return (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def start(self):
+        if self.cap is None and not self.open():
+            return False
+        self._running = True
+        self._thread = threading.Thread(target=self._reader_loop, name="frame-reader")
+        self._thread.daemon = True
+        self._thread.start()
+        return True
+
+    def _reader_loop(self):
+        while self._running:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.read_errors += 1
+                time.sleep(0.1)
+                continue
+
+            with self._cond:
+                self._frame_id += 1
+                self.frames_read += 1
+                if len(self._buffer) >= self.buffer_size:
+                    if self.drop_policy == DROP_OLDEST:
+                        self._buffer.popleft()
+                        self.frames_dropped += 1
+                    elif self.drop_policy == DROP_NEWEST:
+                        self.frames_dropped += 1
+                        continue
+                    else:
+                        while self._running and len(self._buffer) >= self.buffer_size:
+                            self._cond.wait(0.1)
+                        if not self._running:
+                            break
+                self._buffer.append((self._frame_id, frame))
+                self._cond.notify_all()
+
+    def read(self, timeout=1.0):
+        """Return (frame_id, frame) for the next buffered frame, or (None, None)"""
+        with self._cond:
+            if not self._buffer:
+                self._cond.wait(timeout)
+            if not self._buffer:
+                return None, None
+            item = self._buffer.popleft()
+            self._cond.notify_all()
+            return item
+
+    def stats(self):
+        total = self.frames_read
+        return {
+            "drop_policy": self.drop_policy,
+            "frames_read": total,
+            "frames_dropped": self.frames_dropped,
+            "drop_ratio": round(self.frames_dropped / total, 3) if total else 0.0,
+            "read_errors": self.read_errors,
+            "buffered": len(self._buffer),
+        }
+
+    def release(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(1.0)
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
@@ -1,4 +1,5 @@
 import os
+import socket
 import cv2
 
 class Config:
@@ -11,6 +12,15 @@ class Config:
     DJANGO_HOST = '127.0.0.1'  # IP where Django is running
     DJANGO_PORT = 8000
     DJANGO_TIMEOUT = 10
+    DJANGO_POOL_SIZE = 4            # Keep-alive connections to Django
+    OUTBOX_RETRY_INTERVAL = 2.0     # Seconds before retrying a failed Django sync
+    OUTBOX_FLUSH_TIMEOUT = 5.0      # Max seconds /stop waits for pending Django syncs
+    # Local write-ahead log of count updates (SQLite, WAL mode), replayed to Django
+    COUNTLOG_PATH = os.path.join(os.path.dirname(__file__), 'data', 'countlog.sqlite3')
+    COUNTLOG_COMMIT_INTERVAL = 0.2  # Seconds of updates batched into one fsync
+    OUTBOX_BATCH_SIZE = 100         # Session updates per Django ingest request
+    OUTBOX_EVENT_BATCH_SIZE = 1000  # Crossing events per Django ingest request
+    DEVICE_ID = socket.gethostname()  # Identifies this detection server in Django
 
     # ESP32 integration settings
     ESP32_ENABLED = True  # Set to False to disable ESP32 communication
@@ -21,12 +31,19 @@ class Config:
 
     # Model settings
     MODEL_PATH = os.path.join(os.path.dirname(__file__), 'model.pt')
+    ONNX_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'model.onnx')  # Export with convert.py
+    DETECTOR_BACKEND = 'pytorch'  # 'pytorch', 'onnxruntime' or 'opencv'
+    DETECTOR_INPUT_SHAPE = (640, 640)  # (height, width) network input for OpenCV DNN / dynamic ONNX models
+    DETECTOR_NUM_THREADS = 0      # CPU threads for ONNX Runtime / OpenCV DNN (0 = library default)
+    NMS_IOU_THRESHOLD = 0.45      # IoU threshold of the per-class NMS
     
     # Camera settings
     CAMERA_SOURCE = 0 # 0 untuk webcam lokal
     CAMERA_WIDTH = 640
     CAMERA_HEIGHT = 480
     CAMERA_FPS = 30
+    CAMERA_DROP_POLICY = 'drop_oldest'  # 'drop_oldest' (latest frame wins), 'drop_newest' or 'block'
+    CAMERA_BUFFER_SIZE = 1              # Frames held between the camera reader and the pipeline
     
     # Retry settings
     CAMERA_MAX_ATTEMPTS = 3
@@ -36,10 +53,46 @@ class Config:
     CONFIDENCE_THRESHOLD = 0.5  # Increased for better accuracy
     LINE_POSITION = 0.5  # Posisi garis sebagai rasio dari tinggi frame (0.5 = tengah)
 
+    # Region-of-interest inference: run the detector only on a horizontal band
+    # around the counting line. With the ONNX backends export a band-shaped
+    # model (python convert.py --imgsz 224 640) and set DETECTOR_INPUT_SHAPE to match.
+    ROI_ENABLED = False
+    ROI_BAND_HEIGHT = 96    # Height (px) of the band centred on the counting line
+    ROI_PADDING = 64        # Extra context (px) above and below the band
+
+    # Motion gate: skip the detector on frames where the conveyor is empty or stopped
+    MOTION_GATE_ENABLED = False
+    MOTION_SCALE = 0.25             # Downscale factor of the grayscale motion frame
+    MOTION_PIXEL_THRESHOLD = 25     # Grayscale difference that marks a pixel as changed
+    MOTION_ON_RATIO = 0.01          # Changed-pixel ratio that turns detection on
+    MOTION_OFF_RATIO = 0.003        # Ratio below which the scene counts as quiet
+    MOTION_HOLD_FRAMES = 15         # Quiet frames required before detection turns off
+
+    # Keyframe mode: run the detector every N frames (N adapts to scene activity)
+    # and propagate tracks with their velocity in between
+    KEYFRAME_ENABLED = False
+    KEYFRAME_MIN_INTERVAL = 1       # Detector runs at least every N frames with fast motion
+    KEYFRAME_MAX_INTERVAL = 6       # ... and every N frames when the scene is empty
+    KEYFRAME_MAX_DISPLACEMENT = 24  # Max px a track may move between two keyframes
+
     # Line crossing detection settings
-    TRACKING_DISTANCE_THRESHOLD = 80  # Increased distance to better track same object
+    TRACKING_DISTANCE_THRESHOLD = 80  # Max center distance (px) to associate a detection with a track
     MINIMUM_CROSSING_FRAMES = 5       # Increased frames to confirm crossing and prevent false positives
     COOLDOWN_FRAMES = 30              # Frames to wait before allowing same object to be counted again
+    TRACKER_IOU_THRESHOLD = 0.3       # Minimum IoU to associate a detection with a track
+    TRACKER_MAX_LOST = 10             # Frames a track may go undetected before it is dropped
+    TRACKER_VELOCITY_GAIN = 0.5       # How fast track velocity follows the measured motion (0..1)
+    COUNTED_MEMORY_FRAMES = 900       # Frames a dropped counted track's box is remembered (stopped conveyor)
+
+    # Live count stream (/events, Server-Sent Events)
+    EVENTS_KEEPALIVE = 15            # Seconds between keep-alive comments on an idle stream
+    EVENTS_RETRY_MS = 3000           # Reconnect delay suggested to stream clients
+    GET_COUNTS_MAX_WAIT = 30         # Longest /get_counts?version=... long-poll (seconds)
+
+    # Pipeline settings
+    PIPELINE_QUEUE_SIZE = 2          # Max frames buffered between two stages
+    INFERENCE_QUEUE_SIZE = 1         # Capture -> inference hop; drops the oldest frame, newest wins
+    PIPELINE_STATS_INTERVAL = 10     # Seconds between pipeline stats log lines
 
     # Storage settings
     SAVE_IMAGES = True
@@ -0,0 +1,47 @@
+from collections import deque
+
+from config import Config
+
+
+class CooldownStore:
+    """Set of recently counted keys that expire after a number of frames.
+
+    Membership is an O(1) dict lookup. Every key gets the same cooldown and
+    frames only move forward, so marking order is also expiry order: a FIFO
+    queue of (expiry_frame, key) is already sorted and expire() pops only
+    the entries that are due, amortised O(1) per key instead of a scan of
+    every entry.
+    """
+
+    def __init__(self, cooldown_frames=None):
+        self.cooldown_frames = Config.COOLDOWN_FRAMES if cooldown_frames is None else cooldown_frames
+        self._expiry = {}  # {key: expiry_frame}
+        self._queue = deque()  # (expiry_frame, key), may hold superseded entries
+
+    def __contains__(self, key):
+        return key in self._expiry
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def mark(self, key, frame):
+        """Start (or restart) the cooldown of key at frame"""
+        expiry = frame + self.cooldown_frames
+        self._expiry[key] = expiry
+        self._queue.append((expiry, key))
+
+    def expire(self, frame):
+        """Drop every key whose cooldown ended before frame"""
+        queue = self._queue
+        expired = 0
+        while queue and queue[0][0] < frame:
+            expiry, key = queue.popleft()
+            # Skip entries left behind when a key was marked again
+            if self._expiry.get(key) == expiry:
+                del self._expiry[key]
+                expired += 1
+        return expired
+
+    def clear(self):
+        self._expiry.clear()
+        self._queue.clear()
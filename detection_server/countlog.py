@@ -0,0 +1,229 @@
+import os
+import sqlite3
+import threading
+import time
+
+import cv2
+
+from config import Config
+
+
+class CountLog:
+    """Append-only local log of count updates, stored in SQLite (WAL mode).
+
+    Every count change and session transition is appended with a
+    monotonically increasing sequence number, and so is every counted
+    crossing (the events table). append() only buffers the
+    entry in memory; commit() writes the buffer in one transaction, so a
+    burst of counts costs a single fsync. Entries stay in the log until
+    Django has acknowledged their session up to that sequence number, so a
+    restart or a Django outage never loses counts.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            seq INTEGER PRIMARY KEY,
+            session_key TEXT NOT NULL,
+            status TEXT NOT NULL,
+            suitable_count INTEGER NOT NULL,
+            unsuitable_count INTEGER NOT NULL,
+            image BLOB,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_session ON entries (session_key, seq);
+        CREATE TABLE IF NOT EXISTS events (
+            seq INTEGER PRIMARY KEY,
+            session_key TEXT NOT NULL,
+            class_id INTEGER NOT NULL,
+            confidence REAL NOT NULL,
+            x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER,
+            timestamp REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_key TEXT PRIMARY KEY,
+            record_id INTEGER,
+            acked_seq INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, path=None):
+        self.path = Config.COUNTLOG_PATH if path is None else path
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: each commit is fsynced, which is why commits are batched
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(self.SCHEMA)
+        self._db_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._event_buffer = []
+
+        # Delivered entries and events are deleted, so the highest seq ever
+        # committed is kept in meta; a seq is never handed out twice (Django
+        # would drop the newer event as a duplicate). The other tables cover
+        # logs written before meta existed.
+        row = self._conn.execute(
+            "SELECT MAX(m) FROM (SELECT MAX(seq) AS m FROM entries "
+            "UNION ALL SELECT MAX(seq) FROM events "
+            "UNION ALL SELECT MAX(acked_seq) FROM sessions "
+            "UNION ALL SELECT value FROM meta WHERE key = 'last_seq')"
+        ).fetchone()
+        self._next_seq = (row[0] or 0) + 1
+
+    def append(self, session_key, suitable_count, unsuitable_count, status, frame=None):
+        """Buffer one entry and return its sequence number (no disk I/O)"""
+        if session_key is None:
+            raise ValueError("count log entry without a session")
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._buffer.append((seq, session_key, status, suitable_count, unsuitable_count,
+                                 frame, time.time()))
+            return seq
+
+    def append_event(self, session_key, class_id, confidence, box, timestamp):
+        """Buffer one counted crossing; shares the sequence with count entries"""
+        if session_key is None:
+            raise ValueError("count log event without a session")
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._event_buffer.append((seq, session_key, class_id, confidence, *box, timestamp))
+            return seq
+
+    def buffered(self):
+        with self._lock:
+            return len(self._buffer) + len(self._event_buffer)
+
+    def commit(self):
+        """Write all buffered entries in a single transaction"""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            events, self._event_buffer = self._event_buffer, []
+        if not batch and not events:
+            return 0
+
+        rows = []
+        for seq, session_key, status, suitable, unsuitable, frame, created_at in batch:
+            image = None
+            if frame is not None:
+                ok, encoded = cv2.imencode('.jpg', frame)
+                image = encoded.tobytes() if ok else None
+            rows.append((seq, session_key, status, suitable, unsuitable, image, created_at))
+
+        with self._db_lock:
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                self._conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", events)
+                self._conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('last_seq', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)",
+                    (max(row[0] for row in rows + events),),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                # Put the batch back in front of anything appended meanwhile
+                with self._lock:
+                    self._buffer[:0] = batch
+                    self._event_buffer[:0] = events
+                raise
+        return len(rows) + len(events)
+
+    def pending(self):
+        """Latest unacknowledged entry of every session, oldest first.
+
+        Counts are session totals, so the latest entry supersedes the
+        earlier ones. Sessions that have no Django record yet also get the
+        first image logged for them; started_at is the oldest logged time,
+        used as the record date so a late replay keeps the real date.
+        Sessions that never counted anything are skipped (no empty records
+        in Django).
+        """
+        with self._db_lock:
+            rows = self._conn.execute("""
+                SELECT e.session_key, e.seq, e.status, e.suitable_count, e.unsuitable_count,
+                       s.record_id,
+                       CASE WHEN s.record_id IS NULL THEN
+                           (SELECT i.image FROM entries i
+                            WHERE i.session_key = e.session_key AND i.image IS NOT NULL
+                            ORDER BY i.seq LIMIT 1)
+                       END,
+                       (SELECT MIN(created_at) FROM entries WHERE session_key = e.session_key)
+                FROM entries e
+                LEFT JOIN sessions s ON s.session_key = e.session_key
+                WHERE e.seq = (SELECT MAX(seq) FROM entries WHERE session_key = e.session_key)
+                  AND e.seq > COALESCE(s.acked_seq, 0)
+                  AND (s.record_id IS NOT NULL OR e.suitable_count + e.unsuitable_count > 0)
+                ORDER BY e.seq
+            """).fetchall()
+        keys = ("session_key", "seq", "status", "suitable_count", "unsuitable_count", "record_id", "image",
+                "started_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def ack(self, session_key, seq, record_id):
+        """Mark a session delivered up to seq and drop the entries it covers"""
+        with self._db_lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT INTO sessions (session_key, record_id, acked_seq) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_key) DO UPDATE SET record_id = excluded.record_id, "
+                "acked_seq = MAX(acked_seq, excluded.acked_seq)",
+                (session_key, record_id, seq),
+            )
+            self._conn.execute("DELETE FROM entries WHERE session_key = ? AND seq <= ?", (session_key, seq))
+            self._conn.execute("COMMIT")
+
+    def pending_events(self, limit):
+        """Oldest undelivered crossing events, in sequence order"""
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT seq, session_key, class_id, confidence, x1, y1, x2, y2, timestamp "
+                "FROM events ORDER BY seq LIMIT ?", (limit,)
+            ).fetchall()
+        return [
+            {"seq": seq, "session_key": session_key, "class_id": class_id, "confidence": confidence,
+             "box": [x1, y1, x2, y2], "timestamp": timestamp}
+            for seq, session_key, class_id, confidence, x1, y1, x2, y2, timestamp in rows
+        ]
+
+    def pending_event_count(self):
+        with self._db_lock:
+            return self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def ack_events(self, last_seq):
+        """Drop delivered events; events are delivered in seq order"""
+        with self._db_lock:
+            self._conn.execute("DELETE FROM events WHERE seq <= ?", (last_seq,))
+
+    def discard_empty(self):
+        """Drop stopped sessions that never counted anything (never delivered)"""
+        with self._db_lock:
+            self._conn.execute("""
+                DELETE FROM entries WHERE session_key IN (
+                    SELECT e.session_key FROM entries e
+                    LEFT JOIN sessions s ON s.session_key = e.session_key
+                    WHERE s.record_id IS NULL AND e.status = 'stopped'
+                      AND e.suitable_count + e.unsuitable_count = 0
+                      AND e.seq = (SELECT MAX(seq) FROM entries WHERE session_key = e.session_key)
+                )
+            """)
+
+    def record_id(self, session_key):
+        with self._db_lock:
+            row = self._conn.execute("SELECT record_id FROM sessions WHERE session_key = ?",
+                                     (session_key,)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self.commit()
+        with self._db_lock:
+            self._conn.close()
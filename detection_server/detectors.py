@@ -0,0 +1,214 @@
+import time
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+from config import Config
+from postprocess import Detections
+
+BACKENDS = ('pytorch', 'onnxruntime', 'opencv')
+
+
+def letterbox(frame, new_shape, color=(114, 114, 114)):
+    """Resize keeping aspect ratio and pad to new_shape (h, w).
+
+    Returns the padded image, the scale gain and the (left, top) padding,
+    which are needed to map boxes back to frame coordinates.
+    """
+    h, w = frame.shape[:2]
+    gain = min(new_shape[0] / h, new_shape[1] / w)
+    resized_w, resized_h = int(round(w * gain)), int(round(h * gain))
+    if (resized_w, resized_h) != (w, h):
+        frame = cv2.resize(frame, (resized_w, resized_h), interpolation=cv2.INTER_LINEAR)
+    pad_w = new_shape[1] - resized_w
+    pad_h = new_shape[0] - resized_h
+    left, top = pad_w // 2, pad_h // 2
+    padded = cv2.copyMakeBorder(frame, top, pad_h - top, left, pad_w - left,
+                                cv2.BORDER_CONSTANT, value=color)
+    return padded, gain, (left, top)
+
+
+def nms(boxes, scores, iou_threshold):
+    """Greedy non-maximum suppression, returns kept indices by descending score"""
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(x1[i], x1[rest])
+        yy1 = np.maximum(y1[i], y1[rest])
+        xx2 = np.minimum(x2[i], x2[rest])
+        yy2 = np.minimum(y2[i], y2[rest])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def decode_yolo_output(output, gain, pad, frame_shape, confidence_threshold, iou_threshold):
+    """Turn raw YOLOv8 head output (1, 4 + classes, N) into frame-space Detections"""
+    predictions = np.asarray(output, dtype=np.float32)[0].T  # (N, 4 + classes)
+    class_scores = predictions[:, 4:]
+    classes = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(classes)), classes]
+
+    keep = scores >= confidence_threshold
+    predictions, classes, scores = predictions[keep], classes[keep], scores[keep]
+    if not len(scores):
+        return Detections.empty()
+
+    # cx, cy, w, h in letterboxed pixels -> x1, y1, x2, y2 in frame pixels
+    cx, cy, bw, bh = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+    boxes = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+    boxes[:, [0, 2]] -= pad[0]
+    boxes[:, [1, 3]] -= pad[1]
+    boxes /= gain
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, frame_shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, frame_shape[0])
+
+    # Per-class NMS: offset boxes by class so different classes never overlap
+    offsets = classes[:, None].astype(np.float32) * 4096.0
+    keep = nms(boxes + offsets, scores, iou_threshold)
+    data = np.concatenate([boxes[keep], scores[keep, None], classes[keep, None]], axis=1)
+    return Detections.from_array(data)
+
+
+class Detector(ABC):
+    """Common interface: detect(frame) returns Detections in frame coordinates,
+    filtered by confidence and NMS, ordered by descending score.
+    """
+
+    name = None
+
+    def __init__(self, model_path, confidence_threshold=None, iou_threshold=None):
+        self.model_path = model_path
+        self.confidence_threshold = (Config.CONFIDENCE_THRESHOLD
+                                     if confidence_threshold is None else confidence_threshold)
+        self.iou_threshold = Config.NMS_IOU_THRESHOLD if iou_threshold is None else iou_threshold
+        self.load_time = 0.0
+
+    @abstractmethod
+    def detect(self, frame):
+        """Detections of one BGR frame"""
+
+
+class PyTorchDetector(Detector):
+    """Ultralytics YOLO on PyTorch"""
+
+    name = 'pytorch'
+
+    def __init__(self, model_path, **kwargs):
+        super().__init__(model_path, **kwargs)
+        start = time.time()
+        # Imported here so the lighter backends never pay for loading torch
+        from ultralytics import YOLO
+        self.model = YOLO(model_path)
+        self.load_time = time.time() - start
+
+    def detect(self, frame):
+        results = self.model(frame, conf=self.confidence_threshold, iou=self.iou_threshold, verbose=False)
+        return Detections.from_results(results)
+
+
+class OnnxRuntimeDetector(Detector):
+    """ONNX export run through ONNX Runtime on the CPU"""
+
+    name = 'onnxruntime'
+
+    def __init__(self, model_path, **kwargs):
+        super().__init__(model_path, **kwargs)
+        start = time.time()
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if Config.DETECTOR_NUM_THREADS:
+            options.intra_op_num_threads = Config.DETECTOR_NUM_THREADS
+        self.session = ort.InferenceSession(model_path, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        height, width = model_input.shape[2], model_input.shape[3]
+        # Dynamic axes come back as strings; fall back to the configured size
+        self.input_shape = (height if isinstance(height, int) else Config.DETECTOR_INPUT_SHAPE[0],
+                            width if isinstance(width, int) else Config.DETECTOR_INPUT_SHAPE[1])
+        self.load_time = time.time() - start
+
+    def detect(self, frame):
+        image, gain, pad = letterbox(frame, self.input_shape)
+        blob = cv2.dnn.blobFromImage(image, 1 / 255.0, swapRB=True)
+        output = self.session.run(None, {self.input_name: blob})[0]
+        return decode_yolo_output(output, gain, pad, frame.shape,
+                                  self.confidence_threshold, self.iou_threshold)
+
+
+class OpenCvDnnDetector(Detector):
+    """ONNX export run through OpenCV's DNN module"""
+
+    name = 'opencv'
+
+    def __init__(self, model_path, **kwargs):
+        super().__init__(model_path, **kwargs)
+        start = time.time()
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        if Config.DETECTOR_NUM_THREADS:
+            cv2.setNumThreads(Config.DETECTOR_NUM_THREADS)
+        self.input_shape = tuple(Config.DETECTOR_INPUT_SHAPE)
+        self.load_time = time.time() - start
+
+    def detect(self, frame):
+        image, gain, pad = letterbox(frame, self.input_shape)
+        blob = cv2.dnn.blobFromImage(image, 1 / 255.0, swapRB=True)
+        self.net.setInput(blob)
+        output = self.net.forward()
+        return decode_yolo_output(output, gain, pad, frame.shape,
+                                  self.confidence_threshold, self.iou_threshold)
+
+
+class RoiDetector(Detector):
+    """Runs another detector on a horizontal band around the counting line.
+
+    The band is line_y +/- band_height / 2 plus padding rows of context on
+    each side, clipped to the frame. Boxes are shifted back into full-frame
+    coordinates, so callers see the same Detections as without ROI.
+    """
+
+    name = 'roi'
+
+    def __init__(self, detector, line_y, frame_height, band_height=None, padding=None):
+        super().__init__(detector.model_path, confidence_threshold=detector.confidence_threshold,
+                         iou_threshold=detector.iou_threshold)
+        self.detector = detector
+        self.load_time = detector.load_time
+        band_height = Config.ROI_BAND_HEIGHT if band_height is None else band_height
+        padding = Config.ROI_PADDING if padding is None else padding
+        half = band_height // 2 + padding
+        self.y0 = max(0, line_y - half)
+        self.y1 = min(frame_height, line_y + half)
+        self.name = f"{detector.name}+roi"
+
+    def detect(self, frame):
+        detections = self.detector.detect(frame[self.y0:self.y1])
+        if len(detections):
+            detections.boxes[:, [1, 3]] += self.y0
+        return detections
+
+
+def create_detector(backend=None, model_path=None, **kwargs):
+    """Build the detector selected by Config.DETECTOR_BACKEND"""
+    backend = backend or Config.DETECTOR_BACKEND
+    if backend == 'pytorch':
+        detector = PyTorchDetector(model_path or Config.MODEL_PATH, **kwargs)
+    elif backend == 'onnxruntime':
+        detector = OnnxRuntimeDetector(model_path or Config.ONNX_MODEL_PATH, **kwargs)
+    elif backend == 'opencv':
+        detector = OpenCvDnnDetector(model_path or Config.ONNX_MODEL_PATH, **kwargs)
+    else:
+        raise ValueError(f"Unknown detector backend '{backend}', expected one of {BACKENDS}")
+    print(f"Detector '{detector.name}' loaded from {detector.model_path} in {detector.load_time:.2f}s")
+    return detector
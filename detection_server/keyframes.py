@@ -0,0 +1,55 @@
+import numpy as np
+
+from config import Config
+
+
+class KeyframeScheduler:
+    """Chooses the frames on which the detector runs.
+
+    The interval between keyframes adapts to scene activity: with no tracks
+    the detector runs every max_interval frames (enough to pick up bunches
+    entering the frame), and with moving tracks the interval is shortened so
+    no track travels more than max_displacement pixels between detections.
+    """
+
+    def __init__(self, min_interval=None, max_interval=None, max_displacement=None):
+        self.min_interval = Config.KEYFRAME_MIN_INTERVAL if min_interval is None else min_interval
+        self.max_interval = Config.KEYFRAME_MAX_INTERVAL if max_interval is None else max_interval
+        self.max_displacement = Config.KEYFRAME_MAX_DISPLACEMENT if max_displacement is None else max_displacement
+        self.interval = self.min_interval
+        self._since_keyframe = None
+        self.frames = 0
+        self.keyframes = 0
+
+    def is_keyframe(self):
+        """Call once per frame; True when the detector should run"""
+        self.frames += 1
+        if self._since_keyframe is None or self._since_keyframe + 1 >= self.interval:
+            self._since_keyframe = 0
+            self.keyframes += 1
+            return True
+        self._since_keyframe += 1
+        return False
+
+    def update_activity(self, tracker):
+        """Recompute the interval from the tracker state after a keyframe"""
+        visible = tracker.lost == 0
+        if not visible.any():
+            self.interval = self.max_interval
+            return
+
+        speed = np.abs(tracker.velocity[visible]).max(axis=1)
+        max_speed = float(speed.max())
+        interval = self.max_interval
+        if max_speed > 0:
+            interval = int(self.max_displacement / max_speed)
+
+        self.interval = int(np.clip(interval, self.min_interval, self.max_interval))
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "frames": self.frames,
+            "keyframes": self.keyframes,
+            "detector_ratio": round(self.keyframes / self.frames, 3) if self.frames else 0.0,
+        }
@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+
+from config import Config
+
+
+class MotionGate:
+    """Decides per frame whether the detector needs to run.
+
+    Each frame is downscaled to grayscale and differenced against the
+    previous one, so a stopped conveyor goes quiet immediately and nothing
+    lingers after a bunch has passed. The gate opens as soon as the
+    changed-pixel ratio reaches on_ratio and only closes after the ratio
+    has stayed below off_ratio for hold_frames consecutive frames, so a
+    bunch that slows down while entering the band keeps the detector
+    running.
+    """
+
+    def __init__(self, scale=None, pixel_threshold=None, on_ratio=None, off_ratio=None,
+                 hold_frames=None):
+        self.scale = Config.MOTION_SCALE if scale is None else scale
+        self.pixel_threshold = Config.MOTION_PIXEL_THRESHOLD if pixel_threshold is None else pixel_threshold
+        self.on_ratio = Config.MOTION_ON_RATIO if on_ratio is None else on_ratio
+        self.off_ratio = Config.MOTION_OFF_RATIO if off_ratio is None else off_ratio
+        self.hold_frames = Config.MOTION_HOLD_FRAMES if hold_frames is None else hold_frames
+
+        self.previous = None
+        self.active = True  # Start open; the hold period closes it on a quiet scene
+        self.quiet_frames = 0
+        self.last_ratio = 0.0
+        self.frames = 0
+        self.skipped = 0
+
+    def _prepare(self, frame):
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def should_run(self, frame):
+        """Return True when the detector must run on this frame"""
+        gray = self._prepare(frame)
+        self.frames += 1
+
+        if self.previous is None:
+            self.previous = gray
+            return True
+
+        diff = cv2.absdiff(gray, self.previous)
+        self.previous = gray
+        self.last_ratio = float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+
+        if self.last_ratio >= self.on_ratio:
+            self.active = True
+            self.quiet_frames = 0
+        elif self.active:
+            if self.last_ratio < self.off_ratio:
+                self.quiet_frames += 1
+                if self.quiet_frames >= self.hold_frames:
+                    self.active = False
+            else:
+                self.quiet_frames = 0
+
+        if not self.active:
+            self.skipped += 1
+        return self.active
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "motion_ratio": round(self.last_ratio, 4),
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "skip_ratio": round(self.skipped / self.frames, 3) if self.frames else 0.0,
+        }
@@ -0,0 +1,38 @@
+import threading
+import time
+
+
+class ChangeNotifier:
+    """Latest value of some state plus a version that changes with it.
+
+    Producers call publish() as often as they like; only a real change
+    bumps the version and wakes the readers. Readers block in wait() until
+    the version differs from the one they have already seen, so any
+    number of idle listeners costs nothing.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        # Starts from the clock, so a version seen before a restart never
+        # matches one handed out after it
+        self._version = int(time.time() * 1000)
+        self._value = None
+
+    def publish(self, value):
+        """Store value; returns the (possibly unchanged) version"""
+        with self._cond:
+            if value != self._value:
+                self._value = value
+                self._version += 1
+                self._cond.notify_all()
+            return self._version
+
+    def current(self):
+        with self._cond:
+            return self._version, self._value
+
+    def wait(self, since, timeout=None):
+        """Block until the version is not since, or timeout; returns (version, value)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._version != since, timeout)
+            return self._version, self._value
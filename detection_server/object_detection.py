@@ -1,15 +1,23 @@
-from ultralytics import YOLO
 import cv2
 import json
 import threading
 from datetime import datetime
 import os
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request
 import numpy as np
 import time
-import requests
 import serial
 from config import Config
+from pipeline import Pipeline, FramePacket
+from capture import FrameReader
+from tracker import LineCrossingCounter
+from detectors import create_detector, RoiDetector
+from motion import MotionGate
+from keyframes import KeyframeScheduler
+from postprocess import Detections
+from cooldown import CooldownStore
+from outbox import DjangoOutbox, send_data_to_django
+from notifier import ChangeNotifier
 
 app = Flask(__name__)
 
@@ -83,13 +91,24 @@ class DetectionState:
         self.is_initialized = False
         self.debug_window_shown = False
         # Anti-duplicate detection
-        self.recently_counted_objects = {}  # {object_signature: frame_count}
+        self.recently_counted_objects = CooldownStore()  # counted track ids
         self.frame_count = 0
         # Auto-save tracking
         self.last_save_count = 0
-        self.django_session_id = None
+        self.session_key = None
+        # Only the first image of a session is used (for the Django record)
+        self.session_has_image = False
+        # Django sync runs on the outbox worker, off the detection loop;
+        # updates go through the local count log so none are lost offline
+        self.outbox = DjangoOutbox()
+        # Counts/status snapshot for /events listeners, published on change
+        self.notifier = ChangeNotifier()
         # ESP32 integration
         self.esp32_handler = ESP32Handler()
+        # Staged capture/inference/counting/render pipeline
+        self.pipeline = None
+        self.motion_gate = None
+        self.keyframes = None
 
 detection_state = DetectionState()
 
@@ -121,81 +140,196 @@ def save_count_data(suitable_count, unsuitable_count):
         print(f"Error saving data: {e}")
         return None
 
-def send_data_to_django(suitable_count, unsuitable_count, frame=None):
-    """Send count data to Django database via API"""
-    try:
-        # URL ke Django API untuk menyimpan data - menggunakan config
-        django_url = f"http://{Config.DJANGO_HOST}:{Config.DJANGO_PORT}/api/save_count_data/"
-        
-        data = {
-            "suitable_count": suitable_count,
-            "unsuitable_count": unsuitable_count,
-            "status": "running"
-        }
-        
-        files = {}
-        if frame is not None:
-            # Simpan frame sebagai gambar
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            img_filename = f'palm_oil_{timestamp}.jpg'
-            
-            # Encode frame ke format JPEG
-            ret, img_encoded = cv2.imencode('.jpg', frame)
-            if ret:
-                files['image'] = (img_filename, img_encoded.tobytes(), 'image/jpeg')
-        
-        if files:
-            # Kirim dengan file
-            response = requests.post(django_url, data=data, files=files, timeout=Config.DJANGO_TIMEOUT)
-        else:
-            # Kirim tanpa file
-            response = requests.post(django_url, json=data, timeout=Config.DJANGO_TIMEOUT)
-        
-        if response.status_code == 200:
-            result = response.json()
-            print(f"Data berhasil dikirim ke Django: {result}")
-            return result
-        else:
-            print(f"Error sending to Django: {response.status_code} - {response.text}")
+def count_snapshot():
+    """Current counts and status, as returned by /get_counts and pushed on /events"""
+    # Tentukan status berdasarkan state yang ada
+    if detection_state.is_paused:
+        status = "paused"
+    elif detection_state.is_running and detection_state.is_initialized:
+        status = "running"
+    elif detection_state.is_running and not detection_state.is_initialized:
+        status = "loading"
+    else:
+        status = "stopped"
+
+    return {
+        "suitable_count": detection_state.suitable_count,
+        "unsuitable_count": detection_state.unsuitable_count,
+        "is_initialized": detection_state.is_initialized,
+        "debug_window_shown": detection_state.debug_window_shown,
+        "is_paused": detection_state.is_paused,
+        "is_running": detection_state.is_running,
+        "status": status
+    }
+
+def notify_counts():
+    """Publish the current snapshot to stream listeners (nothing happens if unchanged)"""
+    detection_state.notifier.publish(count_snapshot())
+
+def publish_count_update(frame, events=()):
+    """Push the current counts to the stream listeners, the ESP32 display and Django"""
+    notify_counts()
+    session_key = detection_state.session_key
+    if session_key is None:
+        # Session already stopped: nothing more to log
+        return
+
+    # Send to ESP32 display immediately when count changes
+    detection_state.esp32_handler.send_data(
+        detection_state.suitable_count,  # ripe_count
+        detection_state.unsuitable_count,  # unripe_count
+        "running"
+    )
+
+    # Auto-save ke Django setiap ada perubahan count; the outbox logs it and
+    # creates the record (with the first frame as image) or updates it later.
+    # Later frames are not logged: encoding and fsyncing them would be wasted
+    total_count = detection_state.suitable_count + detection_state.unsuitable_count
+    if total_count != detection_state.last_save_count:
+        detection_state.outbox.submit(
+            session_key,
+            detection_state.suitable_count,
+            detection_state.unsuitable_count,
+            None if detection_state.session_has_image else frame
+        )
+        detection_state.session_has_image = True
+        detection_state.last_save_count = total_count
+
+    # One time-series row per crossing
+    for event in events:
+        detection_state.outbox.submit_event(session_key, event)
+
+def build_detection_pipeline(detector, cap, w, line_y):
+    """Build the capture -> inference -> counting -> render/publish pipeline"""
+    pipeline = Pipeline(queue_size=Config.PIPELINE_QUEUE_SIZE)
+    line_counter = LineCrossingCounter(
+        line_y, recently_counted=detection_state.recently_counted_objects
+    )
+    motion_gate = MotionGate() if Config.MOTION_GATE_ENABLED else None
+    detection_state.motion_gate = motion_gate
+    keyframes = KeyframeScheduler() if Config.KEYFRAME_ENABLED else None
+    detection_state.keyframes = keyframes
+
+    def capture_stage():
+        if detection_state.is_paused:
+            # Keep draining so resume starts from a fresh frame
+            cap.read(timeout=0.1)
             return None
-            
-    except Exception as e:
-        print(f"Error sending data to Django: {e}")
-        return None
 
-def update_django_data(record_id, suitable_count, unsuitable_count):
-    """Update existing Django record"""
-    try:
-        django_url = f"http://{Config.DJANGO_HOST}:{Config.DJANGO_PORT}/api/update_count_data/{record_id}/"
-        
-        data = {
-            "suitable_count": suitable_count,
-            "unsuitable_count": unsuitable_count,
-            "status": "running"
-        }
-        
-        response = requests.put(django_url, json=data, timeout=Config.DJANGO_TIMEOUT)
-        
-        if response.status_code == 200:
-            result = response.json()
-            print(f"Data berhasil diupdate di Django: {result}")
-            return result
-        else:
-            print(f"Error updating Django: {response.status_code} - {response.text}")
+        _, frame = cap.read(timeout=0.5)
+        if frame is None:
             return None
-            
-    except Exception as e:
-        print(f"Error updating data in Django: {e}")
-        return None
 
-def detect_objects_thread(model_path):
+        detection_state.frame_count += 1
+        # Flip frame horizontal (opsional, jika gambar terbalik)
+        frame = cv2.flip(frame, 1)
+        return FramePacket(detection_state.frame_count, frame)
+
+    def inference_stage(packet):
+        # Lewati YOLO jika konveyor kosong / diam
+        if motion_gate is not None and not motion_gate.should_run(packet.frame):
+            return packet
+
+        # Between keyframes the counting stage propagates the tracks instead
+        if keyframes is not None and not keyframes.is_keyframe():
+            packet.propagate = True
+            return packet
+
+        # Proses deteksi
+        packet.detections = detector.detect(packet.frame)
+        return packet
+
+    def counting_stage(packet):
+        frame_count = packet.frame_id
+        tracker = line_counter.tracker
+
+        if packet.propagate:
+            # No detector output: move tracks along their velocity and show
+            # the predicted boxes; crossings are still checked on this frame
+            newly_counted = line_counter.predict(frame_count)
+            packet.detections = Detections(tracker.boxes[tracker.matched],
+                                           tracker.scores[tracker.matched],
+                                           tracker.classes[tracker.matched])
+        elif packet.detections is None:
+            # Skipped by the motion gate: keep tracks as they are
+            return packet
+        else:
+            detections = packet.detections.filter(Config.CONFIDENCE_THRESHOLD)
+            newly_counted = line_counter.update(detections, frame_count)
+            packet.detections = detections
+            if keyframes is not None:
+                keyframes.update_activity(tracker)
+
+        # Each track is counted once, when it crosses the line
+        for i in newly_counted.tolist():
+            cls = int(tracker.classes[i])
+            if cls == 0:
+                detection_state.suitable_count += 1
+                print(f"COUNTED: Ripe - Total: {detection_state.suitable_count}")
+            elif cls == 1:
+                detection_state.unsuitable_count += 1
+                print(f"COUNTED: Unripe - Total: {detection_state.unsuitable_count}")
+            packet.events.append({
+                "class": cls,
+                "confidence": float(tracker.scores[i]),
+                "box": tracker.boxes[i].round().astype(int).tolist(),
+                "timestamp": packet.captured_at,
+            })
+
+        return packet
+
+    def render_publish_stage(packet):
+        frame = packet.frame
+
+        # Gambar garis horizontal
+        cv2.line(frame, (0, line_y), (w, line_y), (0, 255, 0), 2)
+
+        detections = packet.detections if packet.detections is not None else Detections.empty()
+        for (x1, y1, x2, y2), cls, conf in zip(detections.int_boxes().tolist(),
+                                               detections.classes.tolist(),
+                                               detections.scores.tolist()):
+            color = (0, 255, 0) if cls == 0 else (0, 0, 255)
+            class_name = "Ripe" if cls == 0 else "Unripe"
+            label = f"{class_name} {conf:.2f}"
+
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(frame, label, (x1, y1 - 20),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+        # Tampilkan informasi
+        cv2.putText(frame, f"Ripe: {detection_state.suitable_count} Unripe: {detection_state.unsuitable_count}",
+                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+        detection_state.current_frame = frame.copy()
+
+        if packet.events:
+            publish_count_update(frame, packet.events)
+
+        # Tampilkan frame untuk debugging
+        if detection_state.show_debug_window:
+            cv2.imshow('Detection Debug', frame)
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('q'):
+                detection_state.is_running = False
+
+        return packet
+
+    pipeline.add_stage("capture", capture_stage)
+    # FrameReader already keeps only the newest frame; don't queue stale ones for YOLO
+    pipeline.add_stage("inference", inference_stage, queue_size=Config.INFERENCE_QUEUE_SIZE, drop_oldest=True)
+    pipeline.add_stage("counting", counting_stage)
+    pipeline.add_stage("render_publish", render_publish_stage)
+    return pipeline
+
+def detect_objects_thread():
+    pipeline = None
     try:
         print("Loading model and initializing camera...")
-        model = YOLO(model_path)
+        detector = create_detector()
         
-        # Langsung buka webcam dengan index dari config
-        cap = cv2.VideoCapture(Config.CAMERA_SOURCE)
-        if not cap.isOpened():
+        # Buka kamera lewat reader yang terus mengosongkan buffer OpenCV
+        cap = FrameReader()
+        if not cap.open():
             print(f"Error: Tidak dapat membuka kamera dengan index {Config.CAMERA_SOURCE}")
             detection_state.is_running = False
             return
@@ -205,18 +339,15 @@ def detect_objects_thread(model_path):
         # Tunggu sebentar agar kamera siap
         time.sleep(3)
         
-        # Set properti kamera
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, Config.CAMERA_WIDTH)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, Config.CAMERA_HEIGHT)
-        cap.set(cv2.CAP_PROP_FPS, Config.CAMERA_FPS)
-        
         # Verifikasi properti kamera
-        w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        w, h = cap.frame_size()
         line_y = int(h * Config.LINE_POSITION)  # Gunakan posisi dari config
 
-        previous_objects = set()
-        
+        # Batasi inferensi ke pita di sekitar garis hitung
+        if Config.ROI_ENABLED:
+            detector = RoiDetector(detector, line_y, h)
+            print(f"ROI inference band: y={detector.y0}..{detector.y1} of {h}")
+
         # Buat window untuk debugging
         if detection_state.show_debug_window:
             cv2.namedWindow('Detection Debug', cv2.WINDOW_NORMAL)
@@ -228,6 +359,7 @@ def detect_objects_thread(model_path):
         # Set flag bahwa sistem sudah berjalan
         detection_state.is_running = True
         detection_state.is_initialized = True
+        notify_counts()
         
         # Send initial status to ESP32 (connection should already exist from startup)
         if Config.ESP32_ENABLED and detection_state.esp32_handler.is_connected:
@@ -237,139 +369,36 @@ def detect_objects_thread(model_path):
             print("⚠️ Warning: ESP32 not connected, trying to reconnect...")
             if detection_state.esp32_handler.connect():
                 detection_state.esp32_handler.send_data(0, 0, "running")
-        
-        while detection_state.is_running:
-            detection_state.frame_count += 1
-            
-            # Clean up old counted objects every 100 frames
-            if detection_state.frame_count % 100 == 0:
-                old_objects = []
-                for obj_id, frame_counted in detection_state.recently_counted_objects.items():
-                    if detection_state.frame_count - frame_counted > Config.COOLDOWN_FRAMES:
-                        old_objects.append(obj_id)
-                for obj_id in old_objects:
-                    del detection_state.recently_counted_objects[obj_id]
-            
-            if detection_state.is_paused:
-                if detection_state.show_debug_window and detection_state.current_frame is not None:
-                    cv2.imshow('Detection Debug', detection_state.current_frame)
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        break
-                time.sleep(0.1)  # Prevent high CPU usage during pause
-                continue
-            
-            ret, frame = cap.read()
-            if not ret:
-                print("Error: Tidak dapat membaca frame")
-                time.sleep(0.1)  # Tunggu sebentar sebelum mencoba lagi
-                continue
-
-            # Flip frame horizontal (opsional, jika gambar terbalik)
-            frame = cv2.flip(frame, 1)
 
-            # Proses deteksi
-            results = model(frame, verbose=False)
-            
-            # Gambar garis horizontal
-            cv2.line(frame, (0, line_y), (w, line_y), (0, 255, 0), 2)
-            
-            current_objects = set()
-            
-            if len(results) > 0:
-                boxes = results[0].boxes
-                
-                for box in boxes:
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    cls = int(box.cls[0].item())
-                    conf = float(box.conf[0].item())
-                    
-                    # Process detections with confidence above threshold from config
-                    if conf < Config.CONFIDENCE_THRESHOLD:
-                        continue
-                        
-                    center_x = (x1 + x2) / 2
-                    center_y = (y1 + y2) / 2
-                    
-                    # Create object ID with region-based grouping to prevent duplicates
-                    region_x = int(center_x // Config.TRACKING_DISTANCE_THRESHOLD) * Config.TRACKING_DISTANCE_THRESHOLD
-                    obj_id = f"{cls}_{region_x}_{int(center_y)}"
-                    current_objects.add(obj_id)
-                    
-                    # Check if object is crossing the line and hasn't been counted recently
-                    if obj_id not in previous_objects:
-                        crossing_tolerance = Config.MINIMUM_CROSSING_FRAMES
-                        if center_y > line_y - crossing_tolerance and center_y < line_y + crossing_tolerance:
-                            # Create signature to check recent counting
-                            signature = f"{cls}_{region_x}_{line_y}"
-                            
-                            # Only count if this signature hasn't been counted recently
-                            if signature not in detection_state.recently_counted_objects:
-                                if cls == 0:
-                                    detection_state.suitable_count += 1
-                                    print(f"COUNTED: Ripe - Total: {detection_state.suitable_count}")
-                                elif cls == 1:
-                                    detection_state.unsuitable_count += 1
-                                    print(f"COUNTED: Unripe - Total: {detection_state.unsuitable_count}")
-                                
-                                # Mark this signature as recently counted
-                                detection_state.recently_counted_objects[signature] = detection_state.frame_count
-                                
-                                # Send to ESP32 display immediately when count changes
-                                detection_state.esp32_handler.send_data(
-                                    detection_state.suitable_count,  # ripe_count
-                                    detection_state.unsuitable_count,  # unripe_count
-                                    "running"
-                                )
-                                
-                                # Auto-save ke Django setiap ada perubahan count
-                                total_count = detection_state.suitable_count + detection_state.unsuitable_count
-                                if total_count != detection_state.last_save_count:
-                                    if detection_state.django_session_id:
-                                        # Update record yang sudah ada
-                                        django_result = update_django_data(
-                                            detection_state.django_session_id,
-                                            detection_state.suitable_count, 
-                                            detection_state.unsuitable_count
-                                        )
-                                    else:
-                                        # Buat record baru untuk session pertama kali dengan gambar
-                                        django_result = send_data_to_django(
-                                            detection_state.suitable_count, 
-                                            detection_state.unsuitable_count,
-                                            frame  # Kirim frame untuk gambar pertama
-                                        )
-                                        if django_result and "id" in django_result:
-                                            detection_state.django_session_id = django_result["id"]
-                                    
-                                    detection_state.last_save_count = total_count
-                    
-                    color = (0, 255, 0) if cls == 0 else (0, 0, 255)
-                    class_name = "Ripe" if cls == 0 else "Unripe"
-                    label = f"{class_name} {conf:.2f}"
-                    
-                    cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
-                    cv2.putText(frame, label, (int(x1), int(y1) - 20), 
-                              cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-            previous_objects = current_objects
-
-            # Tampilkan informasi
-            cv2.putText(frame, f"Ripe: {detection_state.suitable_count} Unripe: {detection_state.unsuitable_count}", 
-                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            # cv2.putText(frame, f"Line Y: {line_y}", (10, 60),
-            #            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-
-            detection_state.current_frame = frame.copy()
-
-            # Tampilkan frame untuk debugging
-            if detection_state.show_debug_window:
-                cv2.imshow('Detection Debug', frame)
-                key = cv2.waitKey(1) & 0xFF
-                if key == ord('q'):
-                    break
-
-            # Tambahkan delay kecil untuk mengurangi penggunaan CPU
-            time.sleep(0.01)
+        pipeline = build_detection_pipeline(detector, cap, w, line_y)
+        detection_state.pipeline = pipeline
+        cap.start()
+        pipeline.start()
+
+        last_stats_time = time.time()
+        while detection_state.is_running and pipeline.is_alive():
+            time.sleep(0.1)
+
+            if time.time() - last_stats_time >= Config.PIPELINE_STATS_INTERVAL:
+                stats = pipeline.stats()
+                summary = ", ".join(
+                    f"{s['name']} {s['fps']:.1f}fps q={s['queue_depth']}" for s in stats["stages"]
+                )
+                capture = cap.stats()
+                print(f"📊 Pipeline: {summary} | bottleneck: {stats['bottleneck']} | "
+                      f"camera dropped {capture['frames_dropped']}/{capture['frames_read']}")
+                if detection_state.keyframes is not None:
+                    keyframe_stats = detection_state.keyframes.stats()
+                    print(f"🎯 Keyframes: detector on {keyframe_stats['keyframes']}/{keyframe_stats['frames']} "
+                          f"frames, interval {keyframe_stats['interval']}")
+                if detection_state.motion_gate is not None:
+                    motion = detection_state.motion_gate.stats()
+                    print(f"💤 Motion gate: skipped {motion['skipped']}/{motion['frames']} frames "
+                          f"({motion['skip_ratio'] * 100:.1f}%)")
+                last_stats_time = time.time()
+
+        if pipeline.error() is not None:
+            raise pipeline.error()
 
     except Exception as e:
         print(f"Error dalam thread deteksi: {e}")
@@ -377,15 +406,29 @@ def detect_objects_thread(model_path):
         detection_state.is_initialized = False
         detection_state.debug_window_shown = False
     finally:
+        if pipeline is not None:
+            pipeline.stop()
         if detection_state.cap:
             detection_state.cap.release()
             detection_state.cap = None
         if detection_state.show_debug_window:
             cv2.destroyAllWindows()
+        notify_counts()
         # Don't disconnect ESP32 here - let it be handled by stop/start functions
         # detection_state.esp32_handler.disconnect()
         print("🔄 Detection thread cleanup completed (ESP32 connection preserved)")
 
+def log_session_status(status):
+    """Record a session transition with the current counts in the count log"""
+    if detection_state.session_key is None:
+        return
+    detection_state.outbox.submit(
+        detection_state.session_key,
+        detection_state.suitable_count,
+        detection_state.unsuitable_count,
+        status=status
+    )
+
 @app.route('/start', methods=['POST'])
 def start_detection():
     if detection_state.cap is not None:
@@ -398,16 +441,19 @@ def start_detection():
         detection_state.unsuitable_count = 0
         detection_state.is_initialized = False
         # Reset anti-duplicate detection
-        detection_state.recently_counted_objects = {}
+        detection_state.recently_counted_objects = CooldownStore()
         detection_state.frame_count = 0
         # Reset Django tracking
         detection_state.last_save_count = 0
-        detection_state.django_session_id = None
+        detection_state.session_has_image = False
+        detection_state.session_key = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        detection_state.outbox.start()
+        detection_state.outbox.submit(detection_state.session_key, 0, 0, status="running")
         
         detection_state.is_running = True
         detection_state.is_paused = False
-        model_path = "model.pt"
-        thread = threading.Thread(target=detect_objects_thread, args=(model_path,))
+        notify_counts()
+        thread = threading.Thread(target=detect_objects_thread)
         thread.daemon = True
         thread.start()
     return jsonify({"status": "started"})
@@ -415,6 +461,8 @@ def start_detection():
 @app.route('/pause', methods=['POST'])
 def pause_detection():
     detection_state.is_paused = True
+    log_session_status("paused")
+    notify_counts()
     # Send pause status to ESP32
     detection_state.esp32_handler.send_data(
         detection_state.suitable_count,
@@ -426,6 +474,8 @@ def pause_detection():
 @app.route('/resume', methods=['POST'])
 def resume_detection():
     detection_state.is_paused = False
+    log_session_status("running")
+    notify_counts()
     # Send resume status to ESP32
     detection_state.esp32_handler.send_data(
         detection_state.suitable_count,
@@ -439,14 +489,27 @@ def stop_detection():
     detection_state.is_running = False
     detection_state.is_initialized = False
     detection_state.debug_window_shown = False
+    # Stop the pipeline before the session is closed, so no stage still
+    # logs counts without a session; the final totals are logged below
+    if detection_state.pipeline is not None:
+        detection_state.pipeline.stop()
     if detection_state.cap:
         detection_state.cap.release()
         detection_state.cap = None
     detection_state.current_frame = None
+
+    # Log the final counts of this session and try to deliver them before
+    # they are reset; anything undelivered stays in the count log
+    if detection_state.session_key is not None:
+        log_session_status("stopped")
+        detection_state.session_key = None
+        if not detection_state.outbox.flush():
+            print(f"⚠️ Django sync pending, kept in count log: {detection_state.outbox.stats()}")
     
     # Reset counters FIRST
     detection_state.suitable_count = 0
     detection_state.unsuitable_count = 0
+    notify_counts()
     
     # Check ESP32 connection and reconnect if needed
     if not detection_state.esp32_handler.is_connected and Config.ESP32_ENABLED:
@@ -472,25 +535,68 @@ def stop_detection():
 
 @app.route('/get_counts')
 def get_counts():
-    # Tentukan status berdasarkan state yang ada
-    if detection_state.is_paused:
-        status = "paused"
-    elif detection_state.is_running and detection_state.is_initialized:
-        status = "running"
-    elif detection_state.is_running and not detection_state.is_initialized:
-        status = "loading"
+    """Current counts and status, with the snapshot version as ETag.
+
+    ?version=V long-polls: the request waits (up to ?timeout= seconds,
+    capped at GET_COUNTS_MAX_WAIT) until the snapshot is no longer at
+    version V. A matching If-None-Match gets 304 Not Modified.
+    """
+    # Publish first, so the version also covers state changed without a notify
+    version = detection_state.notifier.publish(count_snapshot())
+
+    since = request.args.get('version', type=int)
+    if since is not None and since == version:
+        timeout = min(request.args.get('timeout', Config.GET_COUNTS_MAX_WAIT, type=float),
+                      Config.GET_COUNTS_MAX_WAIT)
+        version, _ = detection_state.notifier.wait(since, max(timeout, 0))
+    version, snapshot = detection_state.notifier.current()
+
+    etag = str(version)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
     else:
-        status = "stopped"
-    
-    return jsonify({
-        "suitable_count": detection_state.suitable_count,
-        "unsuitable_count": detection_state.unsuitable_count,
-        "is_initialized": detection_state.is_initialized,
-        "debug_window_shown": detection_state.debug_window_shown,
-        "is_paused": detection_state.is_paused,
-        "is_running": detection_state.is_running,
-        "status": status
-    })
+        response = jsonify({**snapshot, "version": version})
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@app.route('/events')
+def count_events():
+    """Server-Sent Events: the /get_counts snapshot, pushed whenever it changes.
+
+    Meant for one relay (Django) that fans the stream out to the browsers;
+    an idle stream only gets a keep-alive comment now and then.
+    """
+    def stream():
+        yield f"retry: {Config.EVENTS_RETRY_MS}\n\n"
+        version = None
+        while True:
+            new_version, snapshot = detection_state.notifier.wait(version, Config.EVENTS_KEEPALIVE)
+            if new_version == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = new_version
+            yield f"id: {version}\ndata: {json.dumps(snapshot)}\n\n"
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/pipeline_stats')
+def pipeline_stats():
+    """Per-stage FPS and queue depth of the running detection pipeline"""
+    if detection_state.pipeline is None:
+        return jsonify({"status": "stopped", "stages": [], "bottleneck": None, "end_to_end_fps": 0.0})
+
+    stats = detection_state.pipeline.stats()
+    if detection_state.cap is not None:
+        stats["capture"] = detection_state.cap.stats()
+    if detection_state.motion_gate is not None:
+        stats["motion_gate"] = detection_state.motion_gate.stats()
+    if detection_state.keyframes is not None:
+        stats["keyframes"] = detection_state.keyframes.stats()
+    stats["outbox"] = detection_state.outbox.stats()
+    stats["status"] = "running" if detection_state.pipeline.is_alive() else "stopped"
+    return jsonify(stats)
 
 @app.route('/save_data', methods=['POST'])
 def save_data():
@@ -503,7 +609,8 @@ def save_data():
         django_result = send_data_to_django(
             detection_state.suitable_count, 
             detection_state.unsuitable_count,
-            detection_state.current_frame  # Kirim frame saat ini
+            detection_state.current_frame,  # Kirim frame saat ini
+            http=detection_state.outbox.session
         )
         
         if filepath:
@@ -630,5 +737,11 @@ def initialize_esp32():
 # Initialize ESP32 when the module is loaded
 initialize_esp32()
 
+# Replay count updates left in the local log by a previous run
+detection_state.outbox.start()
+
+# Initial snapshot for /events listeners
+notify_counts()
+
 if __name__ == '__main__':
     app.run(host=Config.HOST, port=Config.PORT, threaded=True) 
\ No newline at end of file
@@ -0,0 +1,282 @@
+import base64
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from countlog import CountLog
+
+try:
+    import msgpack
+except ImportError:  # Batches fall back to JSON
+    msgpack = None
+
+
+def django_url(path):
+    return f"http://{Config.DJANGO_HOST}:{Config.DJANGO_PORT}{path}"
+
+
+def create_http_session():
+    """requests.Session with a keep-alive connection pool to Django"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.DJANGO_POOL_SIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def send_data_to_django(suitable_count, unsuitable_count, frame=None, http=requests):
+    """Send count data to Django database via API"""
+    try:
+        # URL ke Django API untuk menyimpan data - menggunakan config
+        url = django_url("/api/save_count_data/")
+
+        data = {
+            "suitable_count": suitable_count,
+            "unsuitable_count": unsuitable_count,
+            "status": "running"
+        }
+
+        files = {}
+        if frame is not None:
+            # Simpan frame sebagai gambar
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            img_filename = f'palm_oil_{timestamp}.jpg'
+
+            # Encode frame ke format JPEG
+            ret, img_encoded = cv2.imencode('.jpg', frame)
+            if ret:
+                files['image'] = (img_filename, img_encoded.tobytes(), 'image/jpeg')
+
+        if files:
+            # Kirim dengan file
+            response = http.post(url, data=data, files=files, timeout=Config.DJANGO_TIMEOUT)
+        else:
+            # Kirim tanpa file
+            response = http.post(url, json=data, timeout=Config.DJANGO_TIMEOUT)
+
+        if response.status_code == 200:
+            result = response.json()
+            print(f"Data berhasil dikirim ke Django: {result}")
+            return result
+        else:
+            print(f"Error sending to Django: {response.status_code} - {response.text}")
+            return None
+
+    except Exception as e:
+        print(f"Error sending data to Django: {e}")
+        return None
+
+
+def send_batch_to_django(entries, events=(), http=requests):
+    """POST count log entries and crossing events to the Django batch endpoint.
+
+    Uses msgpack (raw JPEG bytes) when it is installed, JSON (base64 images)
+    otherwise. Returns the per-item results in entry order, or None if the
+    batch was not applied at all.
+    """
+    items = []
+    for entry in entries:
+        item = {
+            "session_key": entry["session_key"],
+            "seq": entry["seq"],
+            "suitable_count": entry["suitable_count"],
+            "unsuitable_count": entry["unsuitable_count"],
+            "status": entry["status"],
+            "date": entry["started_at"],
+        }
+        if entry["image"] is not None:
+            item["image"] = entry["image"] if msgpack is not None else base64.b64encode(entry["image"]).decode('ascii')
+        items.append(item)
+    payload = {"device": Config.DEVICE_ID, "items": items, "events": list(events)}
+
+    try:
+        url = django_url("/api/ingest/")
+        if msgpack is not None:
+            response = http.post(url, data=msgpack.packb(payload, use_bin_type=True),
+                                 headers={"Content-Type": "application/msgpack"},
+                                 timeout=Config.DJANGO_TIMEOUT)
+        else:
+            response = http.post(url, json=payload, timeout=Config.DJANGO_TIMEOUT)
+
+        if response.status_code == 200:
+            results = response.json()["results"]
+            print(f"Batch of {len(items)} count updates and {len(payload['events'])} events sent to Django")
+            return results
+        else:
+            print(f"Error sending batch to Django: {response.status_code} - {response.text}")
+            return None
+
+    except Exception as e:
+        print(f"Error sending batch to Django: {e}")
+        return None
+
+
+class DjangoOutbox:
+    """Background worker that replays the local CountLog to Django.
+
+    submit() appends the latest counts of a session to the log and returns
+    at once; the detection loop never touches the disk or the network. The
+    worker commits the log in batches (one fsync per batch), then sends the
+    latest unacknowledged entry of each session through the batch ingest
+    endpoint: the first delivery creates the Django record (with the
+    session image), later ones update it. Counted crossings follow as
+    CountEvent rows. Every entry carries the session key and sequence
+    number, so Django applies each update at most once and retries can
+    never double-count. Whatever is still in the log after a crash or an
+    outage is replayed on start.
+    """
+
+    def __init__(self, count_log=None, retry_interval=None, commit_interval=None):
+        self.log = CountLog() if count_log is None else count_log
+        self.retry_interval = Config.OUTBOX_RETRY_INTERVAL if retry_interval is None else retry_interval
+        self.commit_interval = Config.COUNTLOG_COMMIT_INTERVAL if commit_interval is None else commit_interval
+        self.batch_size = Config.OUTBOX_BATCH_SIZE
+        self.event_batch_size = Config.OUTBOX_EVENT_BATCH_SIZE
+        self.session = create_http_session()
+        self._backlog = 0  # Sessions and events waiting for Django after the last replay
+        self._busy = False
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._retry_at = 0.0
+        self.sent = 0
+        self.failed = 0
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._backlog = len(self.log.pending()) + self.log.pending_event_count()
+            self._thread = threading.Thread(target=self._run, name="django-outbox")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def submit(self, session_key, suitable_count, unsuitable_count, frame=None, status="running"):
+        """Log the latest counts of a session; never blocks on disk or network"""
+        seq = self.log.append(session_key, suitable_count, unsuitable_count, status, frame)
+        with self._cond:
+            self._cond.notify()
+        return seq
+
+    def submit_event(self, session_key, event):
+        """Log one counted crossing (dict with class, confidence, box, timestamp)"""
+        seq = self.log.append_event(session_key, event["class"], event["confidence"],
+                                    event["box"], event["timestamp"])
+        with self._cond:
+            self._cond.notify()
+        return seq
+
+    def record_id(self, session_key):
+        return self.log.record_id(session_key)
+
+    def flush(self, timeout=None):
+        """Wait until everything submitted so far has been delivered.
+
+        Returns False if updates are still pending after timeout seconds;
+        they stay in the log and are delivered later.
+        """
+        timeout = Config.OUTBOX_FLUSH_TIMEOUT if timeout is None else timeout
+        deadline = time.time() + timeout
+        with self._cond:
+            self._retry_at = 0.0
+            self._cond.notify()
+            while self._busy or self._backlog or self.log.buffered():
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stop(self, timeout=None):
+        self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(Config.DJANGO_TIMEOUT)
+        self.log.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pending": self._backlog,
+                "buffered": self.log.buffered(),
+                "sent": self.sent,
+                "failed": self.failed,
+            }
+
+    def _replay(self):
+        """Send the pending entries in batches; returns False if any were not applied"""
+        pending = self.log.pending()
+        event_count = self.log.pending_event_count()
+        with self._cond:
+            self._backlog = len(pending) + event_count
+        for start in range(0, len(pending), self.batch_size):
+            chunk = pending[start:start + self.batch_size]
+            results = send_batch_to_django(chunk, http=self.session)
+            if results is None:
+                return False
+
+            ok = True
+            for entry, result in zip(chunk, results):
+                if result.get("id") is None:
+                    print(f"Django rejected count log entry {entry['seq']}: {result.get('message')}")
+                    ok = False
+                    continue
+                # 'stale' is an ack too: Django already has this seq or a newer one
+                self.log.ack(entry["session_key"], entry["seq"], result["id"])
+                self.sent += 1
+            with self._cond:
+                self._backlog = len(pending) - start - len(chunk) + event_count
+            if not ok:
+                return False
+
+        # Events after sessions, so Django can link them to their record
+        while True:
+            events = self.log.pending_events(self.event_batch_size)
+            if not events:
+                break
+            if send_batch_to_django([], events, http=self.session) is None:
+                return False
+            # Inserted with ignore_conflicts on (device, seq): resending is harmless
+            self.log.ack_events(events[-1]["seq"])
+            self.sent += len(events)
+            with self._cond:
+                self._backlog = max(self._backlog - len(events), 0)
+        with self._cond:
+            self._backlog = 0
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping and not (
+                        self.log.buffered() or (self._backlog and time.time() >= self._retry_at)):
+                    self._cond.wait(max(self._retry_at - time.time(), 0.1) if self._backlog else None)
+                if self._stopping:
+                    return
+                self._busy = True
+
+            # Let a burst of counts accumulate so it is written with one fsync
+            time.sleep(self.commit_interval)
+            try:
+                self.log.commit()
+                self.log.discard_empty()
+                ok = self._replay()
+            except Exception as e:
+                # Keep the worker alive; whatever was not delivered is retried
+                print(f"Error in Django outbox: {e}")
+                ok = False
+
+            with self._cond:
+                self._busy = False
+                if not ok:
+                    self.failed += 1
+                    self._retry_at = time.time() + self.retry_interval
+                self._cond.notify_all()
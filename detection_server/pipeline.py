@@ -0,0 +1,216 @@
+import queue
+import threading
+import time
+from collections import deque
+
+
+class StageStats:
+    """Throughput and backlog counters for a single pipeline stage"""
+
+    def __init__(self, name, window=30):
+        self.name = name
+        self.processed = 0
+        self.busy_time = 0.0
+        self._timestamps = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, busy_time):
+        """Record one processed item and the time spent on it"""
+        with self._lock:
+            self.processed += 1
+            self.busy_time += busy_time
+            self._timestamps.append(time.time())
+
+    def fps(self):
+        """Items per second over the recent window"""
+        with self._lock:
+            if len(self._timestamps) < 2:
+                return 0.0
+            elapsed = self._timestamps[-1] - self._timestamps[0]
+            if elapsed <= 0:
+                return 0.0
+            return (len(self._timestamps) - 1) / elapsed
+
+    def snapshot(self, queue_depth=0, dropped=0):
+        with self._lock:
+            processed = self.processed
+            avg_ms = (self.busy_time / processed * 1000) if processed else 0.0
+        return {
+            "name": self.name,
+            "fps": round(self.fps(), 2),
+            "processed": processed,
+            "avg_process_ms": round(avg_ms, 2),
+            "queue_depth": queue_depth,
+            "dropped": dropped,
+        }
+
+
+class LatestQueue(queue.Queue):
+    """Bounded queue whose put() never blocks: a full queue drops its oldest item.
+
+    Used where only the newest frame is worth processing (capture ->
+    inference), so a slow consumer never works through stale frames.
+    """
+
+    def __init__(self, maxsize=1):
+        super().__init__(maxsize)
+        self.dropped = 0
+
+    def put(self, item, block=True, timeout=None):
+        with self.not_full:
+            while self.maxsize > 0 and self._qsize() >= self.maxsize:
+                self._get()
+                self.dropped += 1
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+
+class FramePacket:
+    """A frame travelling through the pipeline together with its results"""
+
+    def __init__(self, frame_id, frame):
+        self.frame_id = frame_id
+        self.frame = frame
+        self.captured_at = time.time()
+        self.detections = None
+        # True when the detector was skipped and tracks should be propagated
+        self.propagate = False
+        self.events = []
+
+
+class Stage:
+    """Worker thread that takes items from in_queue, processes them and
+    pushes the result to out_queue.
+
+    Returning None from the handler drops the item (nothing is forwarded).
+    A stage without an in_queue is a source: its handler is called with no
+    argument in a loop.
+    """
+
+    POLL_TIMEOUT = 0.1
+
+    def __init__(self, name, handler, in_queue=None, out_queue=None):
+        self.name = name
+        self.handler = handler
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.stats = StageStats(name)
+        self.error = None
+        self._stop_event = None
+        self._thread = None
+
+    def start(self, stop_event):
+        self._stop_event = stop_event
+        self._thread = threading.Thread(target=self._run, name=f"stage-{self.name}")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def queue_depth(self):
+        return self.in_queue.qsize() if self.in_queue is not None else 0
+
+    def queue_dropped(self):
+        return getattr(self.in_queue, 'dropped', 0)
+
+    def _next_item(self):
+        try:
+            return True, self.in_queue.get(timeout=self.POLL_TIMEOUT)
+        except queue.Empty:
+            return False, None
+
+    def _forward(self, item):
+        # Blocking put: a full queue applies back-pressure to this stage so
+        # the slowest stage downstream sets the end-to-end rate.
+        while not self._stop_event.is_set():
+            try:
+                self.out_queue.put(item, timeout=self.POLL_TIMEOUT)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self):
+        try:
+            while not self._stop_event.is_set():
+                if self.in_queue is not None:
+                    ok, item = self._next_item()
+                    if not ok:
+                        continue
+                    start = time.time()
+                    result = self.handler(item)
+                else:
+                    start = time.time()
+                    result = self.handler()
+
+                if result is None:
+                    continue
+
+                self.stats.record(time.time() - start)
+                if self.out_queue is not None:
+                    self._forward(result)
+        except Exception as e:
+            print(f"Error in pipeline stage '{self.name}': {e}")
+            self.error = e
+            self._stop_event.set()
+
+
+class Pipeline:
+    """Chain of stages connected by bounded queues"""
+
+    def __init__(self, queue_size=2):
+        self.queue_size = queue_size
+        self.stages = []
+        self._stop_event = threading.Event()
+
+    def add_stage(self, name, handler, queue_size=None, drop_oldest=False):
+        """Append a stage; the first stage added is the source.
+
+        queue_size and drop_oldest set the queue feeding this stage: by
+        default a blocking queue of the pipeline's queue_size, with
+        drop_oldest a LatestQueue where the newest item wins.
+        """
+        in_queue = None
+        if self.stages:
+            size = queue_size or self.queue_size
+            in_queue = LatestQueue(size) if drop_oldest else queue.Queue(maxsize=size)
+            self.stages[-1].out_queue = in_queue
+        stage = Stage(name, handler, in_queue=in_queue)
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        self._stop_event.clear()
+        for stage in self.stages:
+            stage.start(self._stop_event)
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        for stage in self.stages:
+            stage.join(timeout)
+
+    def is_alive(self):
+        return not self._stop_event.is_set()
+
+    def error(self):
+        for stage in self.stages:
+            if stage.error is not None:
+                return stage.error
+        return None
+
+    def stats(self):
+        """Per-stage FPS and queue depth, plus the stage limiting throughput"""
+        stages = [stage.stats.snapshot(stage.queue_depth(), stage.queue_dropped()) for stage in self.stages]
+        # The bottleneck is the stage with the highest per-item processing
+        # cost; every stage upstream of it ends up blocked on a full queue.
+        bottleneck = None
+        if any(s["processed"] for s in stages):
+            bottleneck = max(stages, key=lambda s: s["avg_process_ms"])["name"]
+        end_to_end_fps = stages[-1]["fps"] if stages else 0.0
+        return {
+            "stages": stages,
+            "bottleneck": bottleneck,
+            "end_to_end_fps": end_to_end_fps,
+        }
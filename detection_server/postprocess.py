@@ -0,0 +1,60 @@
+import numpy as np
+
+
+class Detections:
+    """Detections of one frame held as contiguous NumPy arrays.
+
+    boxes is (N, 4) float32 in xyxy pixel coordinates, scores is (N,)
+    float32 and classes is (N,) int32. All per-frame filtering and geometry
+    works on whole arrays instead of looping over individual boxes.
+    """
+
+    def __init__(self, boxes, scores, classes):
+        self.boxes = boxes
+        self.scores = scores
+        self.classes = classes
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4), dtype=np.float32),
+                   np.zeros((0,), dtype=np.float32),
+                   np.zeros((0,), dtype=np.int32))
+
+    @classmethod
+    def from_array(cls, data):
+        """Build from an (N, 6) array laid out as x1, y1, x2, y2, conf, cls"""
+        data = np.asarray(data, dtype=np.float32).reshape(-1, 6)
+        return cls(np.ascontiguousarray(data[:, :4]),
+                   np.ascontiguousarray(data[:, 4]),
+                   data[:, 5].astype(np.int32))
+
+    @classmethod
+    def from_results(cls, results):
+        """Convert ultralytics results with a single device-to-host copy"""
+        if len(results) == 0 or results[0].boxes is None or len(results[0].boxes) == 0:
+            return cls.empty()
+        # boxes.data is (N, 6): x1, y1, x2, y2, conf, cls
+        return cls.from_array(results[0].boxes.data.cpu().numpy())
+
+    def __len__(self):
+        return len(self.scores)
+
+    def select(self, mask):
+        return Detections(self.boxes[mask], self.scores[mask], self.classes[mask])
+
+    def filter(self, confidence_threshold):
+        """Drop detections below the confidence threshold"""
+        return self.select(self.scores >= confidence_threshold)
+
+    def centers(self):
+        """(N, 2) array of box centers"""
+        return np.stack([(self.boxes[:, 0] + self.boxes[:, 2]) * 0.5,
+                         (self.boxes[:, 1] + self.boxes[:, 3]) * 0.5], axis=1)
+
+    def in_band(self, line_y, tolerance):
+        """Boolean mask of detections whose center lies strictly inside line_y +/- tolerance"""
+        center_y = (self.boxes[:, 1] + self.boxes[:, 3]) * 0.5
+        return np.abs(center_y - line_y) < tolerance
+
+    def int_boxes(self):
+        return self.boxes.astype(np.int32)
@@ -1,36 +1,40 @@
-from ultralytics import YOLO
 import cv2
 import time
 import numpy as np
 from datetime import datetime
 import csv
 import os
+from detectors import create_detector
+from tracker import Tracker, LineCrossingCounter
+from cooldown import CooldownStore
 
 class SimpleObjectCounter:
-    def __init__(self, model_path="model.pt", camera_source=0):
+    def __init__(self, model_path=None, camera_source=0, backend=None):
         print("Initializing Simple Object Counter...")
         
-        # Load YOLO model
-        self.model = YOLO(model_path)
-        print(f"Model loaded: {model_path}")
+        # Detection settings
+        self.confidence_threshold = 0.6
+        
+        # Load detector (PyTorch, ONNX Runtime or OpenCV DNN backend)
+        self.detector = create_detector(backend, model_path,
+                                        confidence_threshold=self.confidence_threshold)
+        print(f"Model loaded: {self.detector.model_path}")
         
         # Camera settings
         self.camera_source = camera_source
         self.cap = None
         
-        # Detection settings
-        self.confidence_threshold = 0.6
         self.line_position = 0.5  # Posisi garis (0.5 = tengah frame)
         
         # Counting variables
         self.ripe_count = 0
         self.unripe_count = 0
-        self.previous_objects = set()
+        self.line_counter = None
         
         # Anti-duplicate detection
-        self.recently_counted_objects = {}
         self.frame_count = 0
         self.cooldown_frames = 30
+        self.recently_counted_objects = CooldownStore(self.cooldown_frames)
         self.tracking_distance = 80
         self.crossing_tolerance = 5
         
@@ -280,8 +284,8 @@ class SimpleObjectCounter:
         # Start inference timing
         inference_start = time.time()
         
-        # Run YOLO detection
-        results = self.model(frame, verbose=False)
+        # Run detection
+        detections = self.detector.detect(frame)
         
         # Calculate inference time
         inference_time = time.time() - inference_start
@@ -291,65 +295,37 @@ class SimpleObjectCounter:
         if len(self.inference_times) > 30:
             self.inference_times.pop(0)
         
-        return results, inference_time * 1000
+        return detections, inference_time * 1000
     
-    def count_objects(self, results, frame_height):
+    def count_objects(self, detections, frame_height):
         """Count objects crossing the detection line"""
         line_y = int(frame_height * self.line_position)
-        current_objects = set()
-        detections = []
+        if self.line_counter is None or self.line_counter.line_y != line_y:
+            self.line_counter = LineCrossingCounter(
+                line_y,
+                tolerance=self.crossing_tolerance,
+                tracker=Tracker(max_distance=self.tracking_distance),
+                recently_counted=self.recently_counted_objects
+            )
+        
+        detections = detections.filter(self.confidence_threshold)
+        
+        # Each track is counted once, when it crosses the line
+        tracker = self.line_counter.tracker
+        for i in self.line_counter.update(detections, self.frame_count).tolist():
+            cls = int(tracker.classes[i])
+            conf = float(tracker.scores[i])
+            if cls == 0:  # Ripe
+                self.ripe_count += 1
+                print(f"COUNTED: Ripe - Total: {self.ripe_count}")
+                # Log detection event to CSV
+                self.log_detection_event(cls, conf)
+            elif cls == 1:  # Unripe
+                self.unripe_count += 1
+                print(f"COUNTED: Unripe - Total: {self.unripe_count}")
+                # Log detection event to CSV
+                self.log_detection_event(cls, conf)
         
-        if len(results) > 0 and results[0].boxes is not None:
-            boxes = results[0].boxes
-            
-            for box in boxes:
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                cls = int(box.cls[0].item())
-                conf = float(box.conf[0].item())
-                
-                # Filter by confidence threshold
-                if conf < self.confidence_threshold:
-                    continue
-                
-                center_x = (x1 + x2) / 2
-                center_y = (y1 + y2) / 2
-                
-                # Create object ID for tracking
-                region_x = int(center_x // self.tracking_distance) * self.tracking_distance
-                obj_id = f"{cls}_{region_x}_{int(center_y)}"
-                current_objects.add(obj_id)
-                
-                # Check if object is crossing the line
-                if obj_id not in self.previous_objects:
-                    if center_y > line_y - self.crossing_tolerance and center_y < line_y + self.crossing_tolerance:
-                        # Create signature to prevent duplicate counting
-                        signature = f"{cls}_{region_x}_{line_y}"
-                        
-                        # Only count if not recently counted
-                        if signature not in self.recently_counted_objects:
-                            if cls == 0:  # Ripe
-                                self.ripe_count += 1
-                                print(f"COUNTED: Ripe - Total: {self.ripe_count}")
-                                # Log detection event to CSV
-                                self.log_detection_event(cls, conf)
-                            elif cls == 1:  # Unripe
-                                self.unripe_count += 1
-                                print(f"COUNTED: Unripe - Total: {self.unripe_count}")
-                                # Log detection event to CSV
-                                self.log_detection_event(cls, conf)
-                            
-                            # Mark as recently counted
-                            self.recently_counted_objects[signature] = self.frame_count
-                
-                # Store detection for drawing
-                detections.append({
-                    'bbox': (int(x1), int(y1), int(x2), int(y2)),
-                    'class': cls,
-                    'confidence': conf,
-                    'center': (int(center_x), int(center_y))
-                })
-        
-        self.previous_objects = current_objects
         return detections, line_y
     
     def draw_results(self, frame, detections, line_y, inference_time):
@@ -360,11 +336,9 @@ class SimpleObjectCounter:
         cv2.line(frame, (0, line_y), (width, line_y), (0, 255, 0), 2)
         
         # Draw detections
-        for det in detections:
-            x1, y1, x2, y2 = det['bbox']
-            cls = det['class']
-            conf = det['confidence']
-            
+        for (x1, y1, x2, y2), cls, conf in zip(detections.int_boxes().tolist(),
+                                               detections.classes.tolist(),
+                                               detections.scores.tolist()):
             # Color and label
             color = (0, 255, 0) if cls == 0 else (0, 0, 255)
             class_name = "Ripe" if cls == 0 else "Unripe"
@@ -423,17 +397,6 @@ class SimpleObjectCounter:
             cv2.putText(frame, f"Frame: {self.frame_count}", (10, y_offset),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
     
-    def cleanup_old_objects(self):
-        """Remove old objects from tracking"""
-        if self.frame_count % 100 == 0:  # Cleanup every 100 frames
-            old_objects = []
-            for obj_id, frame_counted in self.recently_counted_objects.items():
-                if self.frame_count - frame_counted > self.cooldown_frames:
-                    old_objects.append(obj_id)
-            
-            for obj_id in old_objects:
-                del self.recently_counted_objects[obj_id]
-    
     def check_timer(self):
         """Check if session time has expired"""
         elapsed_time = time.time() - self.start_time
@@ -527,17 +490,14 @@ class SimpleObjectCounter:
                 self.calculate_fps()
                 
                 # Process detection
-                results, inference_time = self.process_detection(frame)
+                detections, inference_time = self.process_detection(frame)
                 
                 # Count objects
-                detections, line_y = self.count_objects(results, frame.shape[0])
+                detections, line_y = self.count_objects(detections, frame.shape[0])
                 
                 # Draw results
                 self.draw_results(frame, detections, line_y, inference_time)
                 
-                # Cleanup old objects
-                self.cleanup_old_objects()
-                
                 # Log frame data periodically
                 self.log_frame_data()
                 
@@ -568,7 +528,8 @@ class SimpleObjectCounter:
                 elif key == ord('r'):
                     self.ripe_count = 0
                     self.unripe_count = 0
-                    self.recently_counted_objects = {}
+                    self.recently_counted_objects.clear()
+                    self.line_counter = None
                     print("Counters reset!")
                 elif key == ord('c'):
                     self.save_to_csv(force_save=True)
@@ -604,11 +565,12 @@ def main():
     print("="*30)
     
     # Configuration
-    model_path = "model.pt"  # Path to your YOLO model
+    model_path = None        # None = Config.MODEL_PATH, or Config.ONNX_MODEL_PATH for the ONNX backends
     camera_source = 0        # Camera index (0 for default webcam)
+    backend = None           # None = Config.DETECTOR_BACKEND
     
     # Create and run counter
-    counter = SimpleObjectCounter(model_path, camera_source)
+    counter = SimpleObjectCounter(model_path, camera_source, backend)
     counter.run()
 
 if __name__ == "__main__":
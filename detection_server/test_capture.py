@@ -0,0 +1,80 @@
+"""Tests for FrameReader's drop policies. Run from detection_server/:
+
+    python -m unittest test_capture
+"""
+import threading
+import time
+import unittest
+
+from capture import BLOCK, DROP_NEWEST, DROP_OLDEST, FrameReader
+
+
+class FakeCapture:
+    """Stands in for cv2.VideoCapture: yields frames 1..n, then read errors"""
+
+    def __init__(self, n):
+        self.n = n
+        self.served = 0
+        self.exhausted = threading.Event()
+
+    def read(self):
+        if self.served >= self.n:
+            self.exhausted.set()
+            time.sleep(0.01)
+            return False, None
+        self.served += 1
+        return True, f"frame-{self.served}"
+
+    def release(self):
+        pass
+
+
+def reader(policy, frames=5, buffer_size=1):
+    cap = FakeCapture(frames)
+    frame_reader = FrameReader(source=0, drop_policy=policy, buffer_size=buffer_size)
+    frame_reader.cap = cap
+    return frame_reader, cap
+
+
+class FrameReaderTests(unittest.TestCase):
+    def start(self, frame_reader):
+        self.assertTrue(frame_reader.start())
+        self.addCleanup(frame_reader.release)
+
+    def test_drop_oldest_keeps_the_newest_frame(self):
+        frame_reader, cap = reader(DROP_OLDEST)
+        self.start(frame_reader)
+        self.assertTrue(cap.exhausted.wait(2))
+        self.assertEqual(frame_reader.read(), (5, "frame-5"))
+        stats = frame_reader.stats()
+        self.assertEqual((stats["frames_read"], stats["frames_dropped"], stats["drop_ratio"]), (5, 4, 0.8))
+
+    def test_drop_newest_keeps_the_buffered_frames(self):
+        frame_reader, cap = reader(DROP_NEWEST, buffer_size=2)
+        self.start(frame_reader)
+        self.assertTrue(cap.exhausted.wait(2))
+        self.assertEqual([frame_reader.read()[0] for _ in range(2)], [1, 2])
+        self.assertEqual(frame_reader.stats()["frames_dropped"], 3)
+
+    def test_block_waits_for_the_consumer(self):
+        frame_reader, cap = reader(BLOCK)
+        self.start(frame_reader)
+        time.sleep(0.05)
+        # The reader is stuck on a full buffer, not reading ahead
+        self.assertEqual(cap.served, 2)
+        self.assertEqual([frame_reader.read()[0] for _ in range(5)], [1, 2, 3, 4, 5])
+        self.assertEqual(frame_reader.stats()["frames_dropped"], 0)
+
+    def test_read_times_out_without_frames(self):
+        frame_reader, _ = reader(DROP_OLDEST, frames=0)
+        self.start(frame_reader)
+        self.assertEqual(frame_reader.read(timeout=0.05), (None, None))
+        self.assertGreater(frame_reader.stats()["read_errors"], 0)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            FrameReader(source=0, drop_policy="newest")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""Tests for CooldownStore. Run from detection_server/:
+
+    python -m unittest test_cooldown
+"""
+import unittest
+
+from cooldown import CooldownStore
+
+
+class CooldownStoreTests(unittest.TestCase):
+    def test_key_expires_after_cooldown(self):
+        store = CooldownStore(cooldown_frames=5)
+        store.mark('a', 10)
+        self.assertEqual(store.expire(15), 0)
+        self.assertIn('a', store)
+        self.assertEqual(store.expire(16), 1)
+        self.assertNotIn('a', store)
+
+    def test_remark_extends_the_cooldown(self):
+        store = CooldownStore(cooldown_frames=5)
+        store.mark('a', 10)
+        store.mark('a', 14)
+        store.expire(16)
+        self.assertIn('a', store)
+        store.expire(20)
+        self.assertNotIn('a', store)
+        # The superseded queue entry does not count as a second expiry
+        self.assertEqual(len(store._queue), 0)
+
+    def test_expires_only_due_keys(self):
+        store = CooldownStore(cooldown_frames=3)
+        for frame, key in enumerate('abcde'):
+            store.mark(key, frame)
+        self.assertEqual(store.expire(6), 3)
+        self.assertEqual(sorted(store._expiry), ['d', 'e'])
+        self.assertEqual(len(store), 2)
+
+    def test_clear(self):
+        store = CooldownStore(cooldown_frames=3)
+        store.mark('a', 0)
+        store.clear()
+        self.assertEqual(len(store), 0)
+        self.assertEqual(store.expire(100), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""Tests for the local count log. Run from detection_server/:
+
+    python -m unittest test_countlog
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+
+from countlog import CountLog
+
+
+def frame():
+    return np.zeros((8, 8, 3), dtype=np.uint8)
+
+
+class CountLogTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'countlog.sqlite3')
+        self.log = self.open()
+
+    def open(self):
+        log = CountLog(self.path)
+        self.addCleanup(log.close)
+        return log
+
+    def test_append_only_buffers_until_commit(self):
+        self.log.append('s1', 1, 0, 'running')
+        self.assertEqual(self.log.buffered(), 1)
+        self.assertEqual(self.log.pending(), [])
+        self.assertEqual(self.log.commit(), 1)
+        self.assertEqual(self.log.buffered(), 0)
+        self.assertEqual(len(self.log.pending()), 1)
+
+    def test_pending_is_the_latest_entry_with_the_first_image(self):
+        self.log.append('s1', 0, 0, 'running')
+        self.log.append('s1', 1, 0, 'running', frame())
+        self.log.append('s1', 2, 0, 'running')
+        self.log.commit()
+        [entry] = self.log.pending()
+        self.assertEqual((entry["seq"], entry["suitable_count"]), (3, 2))
+        self.assertTrue(entry["image"].startswith(b'\xff\xd8'))
+
+    def test_sessions_without_counts_are_not_pending(self):
+        self.log.append('s1', 0, 0, 'running')
+        self.log.commit()
+        self.assertEqual(self.log.pending(), [])
+
+    def test_ack_drops_delivered_entries_and_keeps_later_ones(self):
+        self.log.append('s1', 1, 0, 'running', frame())
+        self.log.commit()
+        self.log.ack('s1', 1, 42)
+        self.log.append('s1', 2, 0, 'stopped')
+        self.log.commit()
+        [entry] = self.log.pending()
+        self.assertEqual((entry["seq"], entry["record_id"]), (2, 42))
+        # The record exists already: no image is sent again
+        self.assertIsNone(entry["image"])
+        self.assertEqual(self.log.record_id('s1'), 42)
+
+    def test_entries_survive_a_restart(self):
+        self.log.append('s1', 3, 1, 'running')
+        self.log.append_event('s1', 0, 0.9, [1, 2, 3, 4], 100.0)
+        self.log.close()
+        log = self.open()
+        self.assertEqual([e["suitable_count"] for e in log.pending()], [3])
+        self.assertEqual([e["box"] for e in log.pending_events(10)], [[1, 2, 3, 4]])
+        self.assertEqual(log.append('s1', 4, 1, 'running'), 3)
+
+    def test_seq_is_not_reused_after_delivered_events_are_deleted(self):
+        self.log.append('s1', 1, 0, 'running')
+        self.log.commit()
+        self.log.ack('s1', 1, 42)
+        for _ in range(3):
+            self.log.append_event('s1', 0, 0.9, [0, 0, 1, 1], 0.0)
+        self.log.commit()
+        self.log.ack_events(4)
+        self.log.close()
+        # Nothing is left in entries or events, and the session was acked at 1
+        self.assertEqual(self.open().append_event('s1', 0, 0.9, [0, 0, 1, 1], 0.0), 5)
+
+    def test_discard_empty_stopped_sessions(self):
+        self.log.append('s1', 0, 0, 'running')
+        self.log.append('s1', 0, 0, 'stopped')
+        self.log.commit()
+        self.log.discard_empty()
+        self.log.close()
+        with sqlite3.connect(self.path) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0], 0)
+
+    def test_entries_need_a_session(self):
+        with self.assertRaises(ValueError):
+            self.log.append(None, 1, 0, 'running')
+        with self.assertRaises(ValueError):
+            self.log.append_event(None, 0, 0.9, [0, 0, 1, 1], 0.0)
+
+    def test_failed_commit_rolls_back_and_keeps_the_batch(self):
+        self.log.append('s1', 1, 0, 'running')
+        self.log.commit()
+        self.log.append('s1', 2, 0, 'running')
+        # Same seq as the committed entry: the insert fails half-way
+        self.log._buffer.append((1, 's1', 'running', 9, 9, None, 0.0))
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.log.commit()
+        self.assertFalse(self.log._conn.in_transaction)
+        self.assertEqual(self.log.buffered(), 2)
+        self.assertEqual(self.log.pending()[0]["suitable_count"], 1)
+
+        # Once the bad row is gone the kept entry commits normally
+        del self.log._buffer[1]
+        self.assertEqual(self.log.commit(), 1)
+        self.assertEqual(self.log.pending()[0]["suitable_count"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
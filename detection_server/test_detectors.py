@@ -0,0 +1,137 @@
+"""Tests for the backend-independent detector helpers. Run from detection_server/:
+
+    python -m unittest test_detectors
+"""
+import unittest
+
+import numpy as np
+
+from detectors import Detector, RoiDetector, create_detector, decode_yolo_output, letterbox, nms
+from postprocess import Detections
+
+# A 100 x 200 (h x w) frame letterboxed into 320 x 320: gain 1.6, 80 rows of padding on top
+FRAME_SHAPE = (100, 200, 3)
+INPUT_SHAPE = (320, 320)
+GAIN, PAD = 1.6, (0, 80)
+
+
+def yolo_output(*predictions):
+    """(1, 4 + classes, N) head output from rows of cx, cy, w, h, class scores..."""
+    return np.array(predictions, dtype=np.float32).T[None]
+
+
+class LetterboxTests(unittest.TestCase):
+    def test_gain_and_padding(self):
+        frame = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+        frame[40:60, 100:140] = 255
+        padded, gain, pad = letterbox(frame, INPUT_SHAPE)
+        self.assertEqual(padded.shape, (320, 320, 3))
+        self.assertEqual((gain, pad), (GAIN, PAD))
+        # Padding rows are filled, the image sits between them
+        self.assertEqual(padded[:80].tolist(), np.full((80, 320, 3), 114).tolist())
+        self.assertEqual(padded[240:].tolist(), np.full((80, 320, 3), 114).tolist())
+        # A frame point (x, y) lands at (x * gain + left, y * gain + top)
+        self.assertEqual(padded[int(50 * GAIN) + PAD[1], int(120 * GAIN) + PAD[0]].tolist(), [255, 255, 255])
+        self.assertEqual(padded[int(20 * GAIN) + PAD[1], int(20 * GAIN) + PAD[0]].tolist(), [0, 0, 0])
+
+    def test_same_size_is_not_resized(self):
+        frame = np.ones((320, 320, 3), dtype=np.uint8)
+        padded, gain, pad = letterbox(frame, INPUT_SHAPE)
+        self.assertEqual((gain, pad), (1.0, (0, 0)))
+        np.testing.assert_array_equal(padded, frame)
+
+
+class NmsTests(unittest.TestCase):
+    def test_keeps_the_best_of_overlapping_boxes(self):
+        boxes = np.array([[0, 0, 10, 10], [1, 0, 11, 10], [50, 50, 60, 60]], dtype=np.float32)
+        scores = np.array([0.8, 0.9, 0.5], dtype=np.float32)
+        self.assertEqual(nms(boxes, scores, 0.5).tolist(), [1, 2])
+
+    def test_overlap_above_the_threshold_is_suppressed(self):
+        boxes = np.array([[0, 0, 10, 10], [5, 0, 15, 10]], dtype=np.float32)  # IoU 1/3
+        scores = np.array([0.9, 0.8], dtype=np.float32)
+        self.assertEqual(nms(boxes, scores, 0.4).tolist(), [0, 1])
+        self.assertEqual(nms(boxes, scores, 0.3).tolist(), [0])
+
+
+class DecodeYoloOutputTests(unittest.TestCase):
+    def decode(self, output):
+        return decode_yolo_output(output, GAIN, PAD, FRAME_SHAPE, confidence_threshold=0.25, iou_threshold=0.5)
+
+    def test_maps_boxes_back_to_the_frame(self):
+        # Letterboxed cx, cy, w, h of frame box (100, 40, 140, 60)
+        detections = self.decode(yolo_output([192, 160, 64, 32, 0.9, 0.1]))
+        np.testing.assert_allclose(detections.boxes, [[100, 40, 140, 60]], atol=1e-4)
+        np.testing.assert_allclose(detections.scores, [0.9])
+        self.assertEqual(detections.classes.tolist(), [0])
+
+    def test_per_class_nms_and_confidence(self):
+        detections = self.decode(yolo_output(
+            [192, 160, 64, 32, 0.9, 0.1],
+            [194, 160, 64, 32, 0.8, 0.1],   # Same class, overlapping: suppressed
+            [192, 160, 64, 32, 0.1, 0.7],   # Other class on the same spot: kept
+            [100, 200, 20, 20, 0.2, 0.1],   # Below the confidence threshold
+        ))
+        np.testing.assert_allclose(detections.boxes, [[100, 40, 140, 60]] * 2, atol=1e-4)
+        np.testing.assert_allclose(detections.scores, [0.9, 0.7])
+        self.assertEqual(detections.classes.tolist(), [0, 1])
+
+    def test_boxes_are_clipped_to_the_frame(self):
+        detections = self.decode(yolo_output([10, 90, 40, 40, 0.9, 0.0]))
+        np.testing.assert_allclose(detections.boxes, [[0, 0, 18.75, 18.75]], atol=1e-4)
+
+    def test_nothing_above_the_threshold(self):
+        detections = self.decode(yolo_output([192, 160, 64, 32, 0.1, 0.1]))
+        self.assertEqual(len(detections), 0)
+        self.assertEqual(detections.boxes.shape, (0, 4))
+
+
+class FakeDetector(Detector):
+    """Reports fixed boxes in crop coordinates and remembers the crop it got"""
+
+    name = 'fake'
+
+    def __init__(self, boxes):
+        super().__init__('fake.onnx', confidence_threshold=0.5, iou_threshold=0.4)
+        self.boxes = boxes
+        self.crop = None
+
+    def detect(self, frame):
+        self.crop = frame
+        return Detections.from_array([[*box, 0.9, 0] for box in self.boxes])
+
+
+class RoiDetectorTests(unittest.TestCase):
+    def test_boxes_come_back_in_frame_coordinates(self):
+        inner = FakeDetector([(10, 5, 50, 45)])
+        detector = RoiDetector(inner, line_y=240, frame_height=480, band_height=100, padding=20)
+        frame = np.arange(480)[:, None, None].repeat(4, axis=1).repeat(3, axis=2)
+        detections = detector.detect(frame)
+        # Band 240 +/- (50 + 20): rows 170..310 go to the inner detector
+        self.assertEqual((detector.y0, detector.y1), (170, 310))
+        self.assertEqual((inner.crop[0, 0, 0], inner.crop[-1, 0, 0], len(inner.crop)), (170, 309, 140))
+        np.testing.assert_array_equal(detections.boxes, [[10, 175, 50, 215]])
+
+    def test_band_is_clipped_to_the_frame(self):
+        detector = RoiDetector(FakeDetector([]), line_y=30, frame_height=100, band_height=100, padding=20)
+        self.assertEqual((detector.y0, detector.y1), (0, 100))
+        self.assertEqual(len(detector.detect(np.zeros((100, 4, 3)))), 0)
+
+    def test_shares_the_inner_detector_settings(self):
+        detector = RoiDetector(FakeDetector([]), line_y=240, frame_height=480)
+        self.assertEqual((detector.name, detector.model_path, detector.confidence_threshold,
+                          detector.iou_threshold), ('fake+roi', 'fake.onnx', 0.5, 0.4))
+
+
+class CreateDetectorTests(unittest.TestCase):
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_detector('tensorrt')
+
+    def test_detector_is_abstract(self):
+        with self.assertRaises(TypeError):
+            Detector('model.onnx')
+
+
+if __name__ == '__main__':
+    unittest.main()
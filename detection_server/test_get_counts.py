@@ -0,0 +1,87 @@
+"""Tests for the /get_counts long-poll and ETag handling. Run from detection_server/:
+
+    python -m unittest test_get_counts
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from config import Config
+
+# Keep the module-level state away from the real count log and serial port
+DATA_DIR = tempfile.mkdtemp()
+Config.COUNTLOG_PATH = os.path.join(DATA_DIR, 'countlog.sqlite3')
+Config.ESP32_ENABLED = False
+
+from object_detection import app, detection_state, notify_counts  # noqa: E402
+
+
+def tearDownModule():
+    detection_state.outbox.stop()
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+class GetCountsTests(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        detection_state.suitable_count = 0
+        detection_state.unsuitable_count = 0
+        notify_counts()
+
+    def get(self, **params):
+        return self.client.get('/get_counts', query_string=params)
+
+    def test_reports_counts_with_the_version_as_etag(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["ETag"], f'"{response.json["version"]}"')
+        self.assertEqual(response.json["suitable_count"], 0)
+
+    def test_matching_if_none_match_is_not_modified(self):
+        etag = self.get().headers["ETag"]
+        response = self.client.get('/get_counts', headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+        detection_state.suitable_count = 1
+        response = self.client.get('/get_counts', headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_long_poll_times_out_with_the_unchanged_version(self):
+        version = self.get().json["version"]
+        start = time.monotonic()
+        response = self.get(version=version, timeout=0.2)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["version"], version)
+
+    def test_publish_wakes_a_waiting_request(self):
+        version = self.get().json["version"]
+
+        def count_one():
+            time.sleep(0.1)
+            detection_state.suitable_count = 1
+            notify_counts()
+
+        threading.Thread(target=count_one).start()
+        start = time.monotonic()
+        response = self.get(version=version, timeout=5)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(response.json["suitable_count"], 1)
+        self.assertGreater(response.json["version"], version)
+
+    def test_stale_version_returns_at_once(self):
+        version = self.get().json["version"]
+        detection_state.unsuitable_count = 2
+        start = time.monotonic()
+        response = self.get(version=version, timeout=5)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(response.json["unsuitable_count"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
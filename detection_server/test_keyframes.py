@@ -0,0 +1,68 @@
+"""Tests for keyframe scheduling and counting on propagated frames. Run from detection_server/:
+
+    python -m unittest test_keyframes
+"""
+import unittest
+
+from keyframes import KeyframeScheduler
+from test_tracker import LINE_Y, box, detections
+from tracker import LineCrossingCounter, Tracker
+
+
+class KeyframeSchedulerTests(unittest.TestCase):
+    def test_first_frame_is_a_keyframe(self):
+        self.assertTrue(KeyframeScheduler(1, 6, 24).is_keyframe())
+
+    def test_empty_scene_uses_max_interval(self):
+        scheduler = KeyframeScheduler(1, 6, 24)
+        scheduler.update_activity(Tracker())
+        flags = [scheduler.is_keyframe() for _ in range(12)]
+        self.assertEqual(flags, [True, False, False, False, False, False] * 2)
+
+    def test_interval_shrinks_with_speed(self):
+        scheduler = KeyframeScheduler(1, 6, 24)
+        tracker = Tracker()
+        for cy in range(100, 180, 8):
+            tracker.update(detections(box(cy)))
+        scheduler.update_activity(tracker)
+        # ~8 px per frame and at most 24 px between keyframes
+        self.assertIn(scheduler.interval, (2, 3))
+
+    def test_interval_is_clamped(self):
+        scheduler = KeyframeScheduler(2, 6, 24)
+        tracker = Tracker(max_distance=200)
+        for cy in range(0, 400, 100):
+            tracker.update(detections(box(cy)))
+        scheduler.update_activity(tracker)
+        self.assertEqual(scheduler.interval, 2)
+
+    def test_stats(self):
+        scheduler = KeyframeScheduler(1, 2, 24)
+        scheduler.update_activity(Tracker())
+        for _ in range(4):
+            scheduler.is_keyframe()
+        self.assertEqual(scheduler.stats()["detector_ratio"], 0.5)
+
+
+class PropagatedCountingTests(unittest.TestCase):
+    def test_crossing_between_keyframes_is_counted_once(self):
+        counter = LineCrossingCounter(LINE_Y, tolerance=3)
+        total = 0
+        for frame, cy in enumerate(range(150, 200, 10), 1):
+            total += len(counter.update(detections(box(cy)), frame))
+        for frame in range(6, 12):
+            total += len(counter.predict(frame))
+        # The next keyframe sees the bunch past the line: not counted again
+        total += len(counter.update(detections(box(265)), 12))
+        self.assertEqual(total, 1)
+
+    def test_predict_does_not_count_lost_tracks(self):
+        counter = LineCrossingCounter(LINE_Y, tolerance=3)
+        for frame, cy in enumerate(range(150, 200, 10), 1):
+            counter.update(detections(box(cy)), frame)
+        counter.update(detections(), 6)
+        self.assertEqual(sum(len(counter.predict(frame)) for frame in range(7, 12)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
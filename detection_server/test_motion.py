@@ -0,0 +1,65 @@
+"""Tests for the MotionGate hysteresis. Run from detection_server/:
+
+    python -m unittest test_motion
+"""
+import unittest
+
+import numpy as np
+
+from motion import MotionGate
+
+
+def frame(x):
+    """Dark 100 x 100 frame with a bright 20 x 20 bunch at column x.
+
+    Moving it 10 px changes ~5% of the pixels, 1 px ~1.2%.
+    """
+    image = np.zeros((100, 100, 3), dtype=np.uint8)
+    image[40:60, x:x + 20] = 255
+    return image
+
+
+def gate():
+    return MotionGate(scale=1.0, pixel_threshold=25, on_ratio=0.02, off_ratio=0.002, hold_frames=3)
+
+
+def run(motion_gate, positions):
+    return [motion_gate.should_run(frame(x)) for x in positions]
+
+
+class MotionGateTests(unittest.TestCase):
+    def test_closes_after_hold_frames_of_quiet(self):
+        motion_gate = gate()
+        # First frame has no reference and runs; then three quiet frames close the gate
+        self.assertEqual(run(motion_gate, [0, 0, 0, 0, 0]), [True, True, True, False, False])
+        self.assertEqual(motion_gate.stats()["skipped"], 2)
+
+    def test_opens_on_the_first_frame_above_on_ratio(self):
+        motion_gate = gate()
+        run(motion_gate, [0, 0, 0, 0])
+        self.assertFalse(motion_gate.active)
+        self.assertEqual(run(motion_gate, [10, 10]), [True, True])
+
+    def test_slow_motion_does_not_open_a_closed_gate(self):
+        motion_gate = gate()
+        run(motion_gate, [0, 0, 0, 0])
+        # Between off_ratio and on_ratio
+        self.assertEqual(run(motion_gate, [1, 2, 3]), [False, False, False])
+        self.assertGreater(motion_gate.last_ratio, motion_gate.off_ratio)
+
+    def test_slow_motion_keeps_an_open_gate_open(self):
+        motion_gate = gate()
+        # Opened by fast motion, a slowing bunch resets the quiet count
+        self.assertEqual(run(motion_gate, [0, 10, 20, 20, 21, 21, 21, 22, 22, 22, 22]),
+                         [True, True, True, True, True, True, True, True, True, True, False])
+
+    def test_stats(self):
+        motion_gate = gate()
+        run(motion_gate, [0, 0, 0, 0])
+        stats = motion_gate.stats()
+        self.assertEqual((stats["frames"], stats["skipped"], stats["skip_ratio"], stats["active"]),
+                         (4, 1, 0.25, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""Tests for the Django outbox worker. Run from detection_server/:
+
+    python -m unittest test_outbox
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import outbox
+from countlog import CountLog
+from outbox import DjangoOutbox
+
+
+class FakeDjango:
+    """Stands in for send_batch_to_django; records what was delivered"""
+
+    def __init__(self, fail_times=0):
+        self.fail_times = fail_times
+        self.entries = []
+        self.events = []
+
+    def __call__(self, entries, events=(), http=None):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise RuntimeError("boom")
+        self.entries.extend(entries)
+        self.events.extend(events)
+        return [{"id": 1, "status": "created"} for _ in entries]
+
+
+class DjangoOutboxTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.log = CountLog(os.path.join(self.tmp.name, 'countlog.sqlite3'))
+        self.outbox = DjangoOutbox(self.log, retry_interval=0.05, commit_interval=0)
+
+    def start(self, django):
+        patcher = mock.patch.object(outbox, 'send_batch_to_django', django)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.outbox.start()
+        self.addCleanup(self.outbox.stop, 1)
+
+    def test_delivers_latest_counts(self):
+        django = FakeDjango()
+        self.start(django)
+        self.outbox.submit('s1', 1, 0)
+        self.outbox.submit('s1', 2, 1)
+        self.assertTrue(self.outbox.flush(2))
+        self.assertEqual([(e["seq"], e["suitable_count"]) for e in django.entries], [(2, 2)])
+        self.assertEqual(self.log.pending(), [])
+
+    def test_worker_survives_a_send_error(self):
+        django = FakeDjango(fail_times=1)
+        self.start(django)
+        self.outbox.submit('s1', 1, 0)
+        self.assertTrue(self.outbox.flush(2))
+        self.assertEqual(len(django.entries), 1)
+        self.assertTrue(self.outbox._thread.is_alive())
+        self.assertEqual(self.outbox.stats()["failed"], 1)
+
+    def test_worker_survives_a_commit_error(self):
+        django = FakeDjango()
+        commit = self.log.commit
+        calls = []
+
+        def failing_commit():
+            calls.append(1)
+            if len(calls) == 1:
+                raise OSError("disk full")
+            return commit()
+
+        self.log.commit = failing_commit
+        self.start(django)
+        self.outbox.submit('s1', 1, 0)
+        self.assertTrue(self.outbox.flush(2))
+        self.assertFalse(self.outbox._busy)
+        self.assertEqual(len(django.entries), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
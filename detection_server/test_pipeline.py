@@ -0,0 +1,127 @@
+"""Tests for the staged pipeline. Run from detection_server/:
+
+    python -m unittest test_pipeline
+"""
+import itertools
+import time
+import unittest
+
+from pipeline import LatestQueue, Pipeline, StageStats
+
+SLOW_STAGE_SECONDS = 0.02
+
+
+def build(queue_size=2):
+    """source -> slow -> sink; returns the pipeline and the list the sink fills"""
+    pipeline = Pipeline(queue_size=queue_size)
+    counter = itertools.count(1)
+    received = []
+
+    def slow(item):
+        time.sleep(SLOW_STAGE_SECONDS)
+        return item
+
+    def sink(item):
+        received.append(item)
+        return item
+
+    pipeline.add_stage("source", lambda: next(counter))
+    pipeline.add_stage("slow", slow)
+    pipeline.add_stage("sink", sink)
+    return pipeline, received
+
+
+class StageStatsTests(unittest.TestCase):
+    def test_snapshot_averages_processing_time(self):
+        stats = StageStats("stage")
+        stats.record(0.01)
+        stats.record(0.03)
+        snapshot = stats.snapshot(queue_depth=1)
+        self.assertEqual((snapshot["processed"], snapshot["avg_process_ms"], snapshot["queue_depth"]),
+                         (2, 20.0, 1))
+
+    def test_fps_needs_two_samples(self):
+        stats = StageStats("stage")
+        stats.record(0.0)
+        self.assertEqual(stats.fps(), 0.0)
+
+
+class LatestQueueTests(unittest.TestCase):
+    def test_full_queue_drops_the_oldest_item(self):
+        latest = LatestQueue(1)
+        for item in (1, 2, 3):
+            latest.put(item, timeout=0)
+        self.assertEqual((latest.get_nowait(), latest.dropped), (3, 2))
+        self.assertTrue(latest.empty())
+
+
+class PipelineTests(unittest.TestCase):
+    def setUp(self):
+        self.pipeline, self.received = build()
+        self.pipeline.start()
+        self.addCleanup(self.pipeline.stop)
+
+    def test_slow_stage_sets_the_end_to_end_rate(self):
+        time.sleep(0.5)
+        stats = self.pipeline.stats()
+        source, _, sink = stats["stages"]
+        # Back-pressure: the source runs at most the queued items ahead of the sink
+        self.assertLessEqual(source["processed"], sink["processed"] + 2 * self.pipeline.queue_size + 2)
+        self.assertLess(stats["end_to_end_fps"], 1 / SLOW_STAGE_SECONDS * 1.2)
+        self.assertGreater(stats["end_to_end_fps"], 0)
+
+    def test_slow_stage_is_the_bottleneck(self):
+        time.sleep(0.3)
+        self.assertEqual(self.pipeline.stats()["bottleneck"], "slow")
+
+    def test_items_arrive_in_order(self):
+        time.sleep(0.2)
+        received = list(self.received)
+        self.assertEqual(received, list(range(1, len(received) + 1)))
+
+    def test_stop_joins_every_stage_thread(self):
+        time.sleep(0.1)
+        self.pipeline.stop()
+        self.assertFalse(self.pipeline.is_alive())
+        self.assertTrue(all(not stage._thread.is_alive() for stage in self.pipeline.stages))
+
+    def test_stage_error_stops_the_pipeline(self):
+        pipeline = Pipeline()
+        pipeline.add_stage("source", lambda: 1)
+        pipeline.add_stage("broken", lambda item: 1 / 0)
+        pipeline.start()
+        self.addCleanup(pipeline.stop)
+        for _ in range(50):
+            if not pipeline.is_alive():
+                break
+            time.sleep(0.02)
+        self.assertIsInstance(pipeline.error(), ZeroDivisionError)
+
+    def test_drop_oldest_hop_feeds_the_slow_stage_fresh_items(self):
+        pipeline = Pipeline(queue_size=2)
+        counter = itertools.count(1)
+        seen = []
+
+        def source():
+            time.sleep(0.002)
+            return next(counter)
+
+        def slow(item):
+            seen.append(item)
+            time.sleep(SLOW_STAGE_SECONDS)
+            return item
+
+        pipeline.add_stage("source", source)
+        pipeline.add_stage("slow", slow, queue_size=1, drop_oldest=True)
+        pipeline.start()
+        time.sleep(0.3)
+        pipeline.stop()
+        source, slow_stats = pipeline.stats()["stages"]
+        # The source is never held back, the slow stage skips what it can't keep up with
+        self.assertGreater(source["processed"], 2 * slow_stats["processed"])
+        self.assertGreater(slow_stats["dropped"], 0)
+        self.assertEqual(seen, sorted(seen))
+
+
+if __name__ == '__main__':
+    unittest.main()
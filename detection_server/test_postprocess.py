@@ -0,0 +1,80 @@
+"""Tests for Detections. Run from detection_server/:
+
+    python -m unittest test_postprocess
+"""
+import unittest
+
+import numpy as np
+
+from postprocess import Detections
+
+DATA = np.array([
+    [10, 20, 50, 60, 0.9, 0],
+    [100, 100, 140, 180, 0.3, 1],
+    [0, 0, 20, 20, 0.5, 1],
+], dtype=np.float32)
+
+
+class FakeTensor:
+    """Stands in for a torch tensor on the GPU; counts device-to-host copies"""
+
+    def __init__(self, data):
+        self.data = data
+        self.copies = 0
+
+    def cpu(self):
+        self.copies += 1
+        return self
+
+    def numpy(self):
+        return self.data
+
+
+class FakeBoxes:
+    def __init__(self, data):
+        self.data = FakeTensor(data)
+
+    def __len__(self):
+        return len(self.data.data)
+
+    @property
+    def xyxy(self):
+        raise AssertionError("per-field access means one copy per field")
+
+
+class FakeResult:
+    def __init__(self, data):
+        self.boxes = FakeBoxes(data) if data is not None else None
+
+
+class DetectionsTests(unittest.TestCase):
+    def test_from_results_copies_once(self):
+        result = FakeResult(DATA)
+        detections = Detections.from_results([result])
+        self.assertEqual(result.boxes.data.copies, 1)
+        np.testing.assert_array_equal(detections.boxes, DATA[:, :4])
+        np.testing.assert_array_equal(detections.scores, DATA[:, 4])
+        self.assertEqual(detections.classes.tolist(), [0, 1, 1])
+        self.assertEqual((detections.boxes.dtype, detections.classes.dtype), (np.float32, np.int32))
+        self.assertTrue(detections.boxes.flags['C_CONTIGUOUS'])
+
+    def test_from_results_without_boxes(self):
+        for results in ([], [FakeResult(None)], [FakeResult(np.zeros((0, 6), dtype=np.float32))]):
+            detections = Detections.from_results(results)
+            self.assertEqual(len(detections), 0)
+            self.assertEqual(detections.boxes.shape, (0, 4))
+
+    def test_filter_drops_low_confidence(self):
+        detections = Detections.from_array(DATA).filter(0.5)
+        self.assertEqual(detections.scores.tolist(), [np.float32(0.9), 0.5])
+        self.assertEqual(detections.classes.tolist(), [0, 1])
+        self.assertEqual(len(detections.boxes), 2)
+
+    def test_centers_and_band(self):
+        detections = Detections.from_array(DATA)
+        np.testing.assert_array_equal(detections.centers(), [[30, 40], [120, 140], [10, 10]])
+        self.assertEqual(detections.in_band(42, 3).tolist(), [True, False, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
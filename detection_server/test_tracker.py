@@ -0,0 +1,132 @@
+"""Tests for the tracker and line-crossing counter. Run from detection_server/:
+
+    python -m unittest test_tracker
+"""
+import unittest
+
+import numpy as np
+
+from postprocess import Detections
+from tracker import LineCrossingCounter, Tracker, greedy_assignment, iou_matrix
+
+LINE_Y = 200
+
+
+def box(cy, cx=100, size=40):
+    half = size / 2
+    return (cx - half, cy - half, cx + half, cy + half)
+
+
+def detections(*boxes, cls=0):
+    return Detections.from_array([[*b, 0.9, cls] for b in boxes])
+
+
+def run(counter, frames):
+    """Feed a list of per-frame box lists; returns the total count"""
+    total = 0
+    for frame, boxes in enumerate(frames, 1):
+        total += len(counter.update(detections(*boxes), frame))
+    return total
+
+
+class GeometryTests(unittest.TestCase):
+    def test_iou_matrix(self):
+        a = np.array([[0, 0, 10, 10]], dtype=np.float32)
+        b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=np.float32)
+        np.testing.assert_allclose(iou_matrix(a, b), [[1.0, 50 / 150, 0.0]], rtol=1e-6)
+
+    def test_greedy_assignment_skips_forbidden_pairs(self):
+        cost = np.array([[0.1, np.inf], [0.2, np.inf]])
+        rows, cols = greedy_assignment(cost)
+        self.assertEqual((rows.tolist(), cols.tolist()), ([0], [0]))
+
+
+class TrackerTests(unittest.TestCase):
+    def test_keeps_identity_of_a_moving_box(self):
+        tracker = Tracker(max_lost=2)
+        for cy in range(100, 200, 10):
+            tracker.update(detections(box(cy)))
+        self.assertEqual(tracker.ids.tolist(), [1])
+        self.assertGreater(tracker.velocity[0, 1], 0)
+
+    def test_classes_are_tracked_separately(self):
+        tracker = Tracker()
+        tracker.update(detections(box(100), cls=0))
+        tracker.update(detections(box(100), cls=1))
+        self.assertEqual(len(tracker), 2)
+
+    def test_retires_tracks_after_max_lost(self):
+        tracker = Tracker(max_lost=2)
+        tracker.update(detections(box(100)))
+        for _ in range(3):
+            tracker.update(detections())
+        self.assertEqual(len(tracker), 0)
+
+    def test_keep_prevents_retirement(self):
+        tracker = Tracker(max_lost=2)
+        tracker.update(detections(box(100)))
+        for _ in range(5):
+            tracker.update(detections(), keep={1})
+        self.assertEqual(tracker.ids.tolist(), [1])
+
+    def test_prev_cy_is_the_last_observation(self):
+        tracker = Tracker()
+        tracker.update(detections(box(100)))
+        tracker.update(detections(box(110)))
+        tracker.update(detections())
+        tracker.update(detections())
+        # Predicted boxes moved on, the observed reference did not
+        self.assertGreater(tracker.centers()[0, 1], 110)
+        self.assertEqual(tracker.prev_cy[0], 110)
+
+
+class LineCrossingCounterTests(unittest.TestCase):
+    def counter(self, **kwargs):
+        return LineCrossingCounter(LINE_Y, tolerance=3, **kwargs)
+
+    def test_counts_a_crossing_once(self):
+        frames = [[box(cy)] for cy in range(100, 300, 8)]
+        self.assertEqual(run(self.counter(), frames), 1)
+
+    def test_does_not_count_a_box_that_never_reaches_the_line(self):
+        frames = [[box(cy)] for cy in range(100, 180, 8)]
+        self.assertEqual(run(self.counter(), frames), 0)
+
+    def test_counts_despite_dropout_on_the_crossing_frame(self):
+        frames = [[box(cy)] if cy != 204 else [] for cy in range(100, 300, 8)]
+        self.assertEqual(run(self.counter(), frames), 1)
+
+    def test_counts_despite_several_missed_frames_around_the_line(self):
+        frames = [[box(cy)] if not 180 < cy < 240 else [] for cy in range(100, 300, 8)]
+        self.assertEqual(run(self.counter(), frames), 1)
+
+    def test_counts_a_fast_box_that_jumps_over_the_band(self):
+        # 30 px per frame never lands within the 3 px band around the line
+        frames = [[box(cy)] for cy in range(95, 400, 30)]
+        self.assertEqual(run(self.counter(), frames), 1)
+
+    def test_counts_two_bunches_in_one_column_with_flicker(self):
+        frames = []
+        for frame in range(40):
+            boxes = [box(cy) for cy in (100 + 8 * frame, 20 + 8 * frame) if cy < 400]
+            # Every third frame the detector misses the leading bunch
+            if frame % 3 == 1:
+                boxes = boxes[1:]
+            frames.append(boxes)
+        self.assertEqual(run(self.counter(), frames), 2)
+
+    def test_stationary_bunch_on_the_line_is_counted_once(self):
+        counter = self.counter(tracker=Tracker(max_lost=5, counted_memory=500))
+        # Conveyor stopped with a bunch on the line; its detection drops out
+        # for longer than max_lost plus the cooldown
+        frames = [[] if 20 <= frame < 120 else [box(LINE_Y)] for frame in range(200)]
+        self.assertEqual(run(counter, frames), 1)
+
+    def test_new_bunch_after_memory_expires_is_counted(self):
+        counter = self.counter(tracker=Tracker(max_lost=5, counted_memory=10))
+        frames = [[] if 20 <= frame < 120 else [box(LINE_Y)] for frame in range(200)]
+        self.assertEqual(run(counter, frames), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
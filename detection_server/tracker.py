@@ -0,0 +1,275 @@
+import numpy as np
+
+from config import Config
+from cooldown import CooldownStore
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (T, 4) and (D, 4) xyxy boxes"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def box_centers(boxes):
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) * 0.5,
+                     (boxes[:, 1] + boxes[:, 3]) * 0.5], axis=1)
+
+
+def greedy_assignment(cost):
+    """Match rows to columns by increasing cost; inf marks forbidden pairs"""
+    if cost.size == 0:
+        return np.zeros((0,), dtype=np.int64), np.zeros((0,), dtype=np.int64)
+    order = np.argsort(cost, axis=None)
+    order = order[np.isfinite(cost.ravel()[order])]
+    rows, cols = np.unravel_index(order, cost.shape)
+    row_used = np.zeros(cost.shape[0], dtype=bool)
+    col_used = np.zeros(cost.shape[1], dtype=bool)
+    matched_rows, matched_cols = [], []
+    limit = min(cost.shape)
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        if row_used[r] or col_used[c]:
+            continue
+        row_used[r] = True
+        col_used[c] = True
+        matched_rows.append(r)
+        matched_cols.append(c)
+        if len(matched_rows) == limit:
+            break
+    return np.array(matched_rows, dtype=np.int64), np.array(matched_cols, dtype=np.int64)
+
+
+class Tracker:
+    """IoU/centroid multi-object tracker with array-backed track state.
+
+    Tracks are associated to detections of the same class through a
+    (tracks x detections) cost matrix combining 1 - IoU and normalised
+    centroid distance. A pair is only allowed when the boxes overlap by at
+    least iou_threshold or their centers are within max_distance pixels.
+
+    Each track also carries a constant-velocity estimate (pixels per frame,
+    alpha-beta filtered). Boxes are moved forward by it before association,
+    and predict() uses it to carry tracks through frames without detection.
+
+    prev_cy is the center y the track was last *observed* at (its last
+    matched detection) before the current frame, never a predicted one, so
+    crossings are judged between real measurements even across missed
+    detections. When a counted track is dropped its box is remembered for
+    counted_memory frames, and a new track starting on top of it inherits
+    the counted flag: a bunch that stood still while undetected for a long
+    time is the same bunch, not a new one.
+    """
+
+    def __init__(self, iou_threshold=None, max_distance=None, max_lost=None, velocity_gain=None,
+                 counted_memory=None):
+        self.iou_threshold = Config.TRACKER_IOU_THRESHOLD if iou_threshold is None else iou_threshold
+        self.max_distance = Config.TRACKING_DISTANCE_THRESHOLD if max_distance is None else max_distance
+        self.max_lost = Config.TRACKER_MAX_LOST if max_lost is None else max_lost
+        self.velocity_gain = Config.TRACKER_VELOCITY_GAIN if velocity_gain is None else velocity_gain
+        self.counted_memory = Config.COUNTED_MEMORY_FRAMES if counted_memory is None else counted_memory
+        self._next_id = 1
+        self.reset()
+
+    def reset(self):
+        self.ids = np.zeros((0,), dtype=np.int64)
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.classes = np.zeros((0,), dtype=np.int32)
+        self.scores = np.zeros((0,), dtype=np.float32)
+        self.velocity = np.zeros((0, 2), dtype=np.float32)
+        # Frames since the last detection matched the track
+        self.since_update = np.zeros((0,), dtype=np.int32)
+        self.lost = np.zeros((0,), dtype=np.int32)
+        # Center y of the last matched detection, and its value before this frame
+        self.observed_cy = np.zeros((0,), dtype=np.float32)
+        self.prev_cy = np.zeros((0,), dtype=np.float32)
+        self.counted = np.zeros((0,), dtype=bool)
+        # Whether each track was seen in the last update
+        self.matched = np.zeros((0,), dtype=bool)
+        # Last boxes of dropped counted tracks and the frame they are forgotten at
+        self.frame = 0
+        self.retired_boxes = np.zeros((0, 4), dtype=np.float32)
+        self.retired_classes = np.zeros((0,), dtype=np.int32)
+        self.retired_until = np.zeros((0,), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def centers(self):
+        return box_centers(self.boxes)
+
+    def _advance(self):
+        """Move every box one frame forward along its velocity"""
+        self.frame += 1
+        self.prev_cy = self.observed_cy.copy()
+        self.boxes[:, [0, 2]] += self.velocity[:, 0:1]
+        self.boxes[:, [1, 3]] += self.velocity[:, 1:2]
+        self.since_update += 1
+
+    def predict(self):
+        """Propagate tracks through a frame on which the detector did not run.
+
+        Only tracks that were matched on the last detector frame are
+        considered visible afterwards.
+        """
+        self._advance()
+        self.matched = self.lost == 0
+
+    def _cost_matrix(self, det_boxes, det_classes):
+        iou = iou_matrix(self.boxes, det_boxes)
+        track_centers = box_centers(self.boxes)
+        det_centers = box_centers(det_boxes)
+        dist = np.sqrt(((track_centers[:, None, :] - det_centers[None, :, :]) ** 2).sum(axis=2))
+        valid = (self.classes[:, None] == det_classes[None, :]) & (
+            (iou >= self.iou_threshold) | (dist <= self.max_distance))
+        cost = (1.0 - iou) + dist / max(self.max_distance, 1)
+        return np.where(valid, cost, np.inf)
+
+    def update(self, detections, keep=None):
+        """Associate detections with tracks, retire lost ones and spawn new ones.
+
+        keep is an optional container of track ids that must not be
+        retired even after max_lost missed frames.
+        """
+        det_boxes = detections.boxes
+        det_classes = detections.classes
+        num_tracks = len(self.ids)
+
+        # Predict to this frame first (also remembers the last observed
+        # center for crossing tests), then associate against the predicted boxes
+        self._advance()
+        rows, cols = greedy_assignment(self._cost_matrix(det_boxes, det_classes))
+
+        self.lost += 1
+        self.matched = np.zeros(num_tracks, dtype=bool)
+        if len(rows):
+            # Alpha-beta correction: nudge velocity by the prediction error
+            # spread over the frames since the last measurement
+            residual = box_centers(det_boxes[cols]) - box_centers(self.boxes[rows])
+            self.velocity[rows] += self.velocity_gain * residual / self.since_update[rows, None]
+            self.boxes[rows] = det_boxes[cols]
+            self.observed_cy[rows] = (det_boxes[cols, 1] + det_boxes[cols, 3]) * 0.5
+            self.scores[rows] = detections.scores[cols]
+            self.since_update[rows] = 0
+            self.lost[rows] = 0
+            self.matched[rows] = True
+
+        # Retire tracks that have been missing for too long
+        retire = self.lost > self.max_lost
+        if keep and retire.any():
+            candidates = np.flatnonzero(retire)
+            kept = np.fromiter((track_id in keep for track_id in self.ids[candidates].tolist()),
+                               dtype=bool, count=len(candidates))
+            retire[candidates[kept]] = False
+        if retire.any():
+            self._remember_counted(retire & self.counted)
+            alive = ~retire
+            self.ids = self.ids[alive]
+            self.boxes = self.boxes[alive]
+            self.classes = self.classes[alive]
+            self.scores = self.scores[alive]
+            self.velocity = self.velocity[alive]
+            self.since_update = self.since_update[alive]
+            self.lost = self.lost[alive]
+            self.observed_cy = self.observed_cy[alive]
+            self.prev_cy = self.prev_cy[alive]
+            self.counted = self.counted[alive]
+            self.matched = self.matched[alive]
+
+        # Unmatched detections start new tracks
+        unmatched = np.ones(len(det_boxes), dtype=bool)
+        unmatched[cols] = False
+        new = np.flatnonzero(unmatched)
+        if len(new):
+            count = len(new)
+            new_boxes = det_boxes[new]
+            self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + count)])
+            self._next_id += count
+            self.boxes = np.concatenate([self.boxes, new_boxes])
+            self.classes = np.concatenate([self.classes, det_classes[new]])
+            self.scores = np.concatenate([self.scores, detections.scores[new]])
+            self.velocity = np.concatenate([self.velocity, np.zeros((count, 2), dtype=np.float32)])
+            self.since_update = np.concatenate([self.since_update, np.zeros(count, dtype=np.int32)])
+            self.lost = np.concatenate([self.lost, np.zeros(count, dtype=np.int32)])
+            self.observed_cy = np.concatenate([self.observed_cy, (new_boxes[:, 1] + new_boxes[:, 3]) * 0.5])
+            # A new track has no history; NaN never satisfies a side change
+            self.prev_cy = np.concatenate([self.prev_cy, np.full(count, np.nan, dtype=np.float32)])
+            self.counted = np.concatenate([self.counted, self._recall_counted(new_boxes, det_classes[new])])
+            self.matched = np.concatenate([self.matched, np.ones(count, dtype=bool)])
+
+    def _remember_counted(self, mask):
+        """Keep the boxes of counted tracks being dropped, and forget expired ones"""
+        keep = self.retired_until >= self.frame
+        self.retired_boxes = np.concatenate([self.retired_boxes[keep], self.boxes[mask]])
+        self.retired_classes = np.concatenate([self.retired_classes[keep], self.classes[mask]])
+        self.retired_until = np.concatenate([
+            self.retired_until[keep],
+            np.full(int(mask.sum()), self.frame + self.counted_memory, dtype=np.int64)])
+
+    def _recall_counted(self, boxes, classes):
+        """counted flags for new tracks: True where one takes over a remembered box"""
+        counted = np.zeros(len(boxes), dtype=bool)
+        live = self.retired_until >= self.frame
+        if not live.any():
+            return counted
+        valid = (classes[:, None] == self.retired_classes[None, :]) & live[None, :] & (
+            iou_matrix(boxes, self.retired_boxes) >= self.iou_threshold)
+        rows, cols = greedy_assignment(np.where(valid, 0.0, np.inf))
+        counted[rows] = True
+        # Each remembered box is taken over at most once
+        self.retired_until[cols] = -1
+        return counted
+
+
+class LineCrossingCounter:
+    """Counts each track exactly once when it crosses the counting line.
+
+    A visible track is counted when its center is on the other side of
+    line_y than where the track was last observed, or when its center is
+    inside line_y +/- tolerance. Because the reference is the last
+    observation, a bunch whose detection drops out on the frame it crosses
+    is still counted as soon as it is matched again.
+    Counted track ids are kept in the recently_counted CooldownStore for
+    COOLDOWN_FRAMES; while an id is there the tracker keeps the track alive
+    so a bunch that briefly disappears is re-associated instead of being
+    counted again.
+    """
+
+    def __init__(self, line_y, tolerance=None, tracker=None, recently_counted=None):
+        self.line_y = line_y
+        self.tolerance = Config.MINIMUM_CROSSING_FRAMES if tolerance is None else tolerance
+        self.tracker = tracker if tracker is not None else Tracker()
+        self.recently_counted = CooldownStore() if recently_counted is None else recently_counted
+
+    def update(self, detections, frame_count):
+        """Update tracks and return the indices of newly counted tracks"""
+        self.recently_counted.expire(frame_count)
+        self.tracker.update(detections, keep=self.recently_counted)
+        return self._count_crossings(frame_count)
+
+    def predict(self, frame_count):
+        """Propagate tracks without detections; crossings are still evaluated"""
+        self.recently_counted.expire(frame_count)
+        self.tracker.predict()
+        return self._count_crossings(frame_count)
+
+    def _count_crossings(self, frame_count):
+        tracker = self.tracker
+        cy = (tracker.boxes[:, 1] + tracker.boxes[:, 3]) * 0.5
+        offset = cy - self.line_y
+        prev_offset = tracker.prev_cy - self.line_y
+        with np.errstate(invalid='ignore'):
+            crossed = (prev_offset * offset) <= 0
+        in_band = np.abs(offset) < self.tolerance
+        newly_counted = np.flatnonzero(tracker.matched & ~tracker.counted & (crossed | in_band))
+
+        if len(newly_counted):
+            tracker.counted[newly_counted] = True
+            for track_id in tracker.ids[newly_counted].tolist():
+                self.recently_counted.mark(track_id, frame_count)
+        return newly_counted
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import CountingSession, PalmOilCount
+from .models import CountEvent, CountingSession, DailyCountSummary, PalmOilCount
+from .rollup import record_saved
 
 # Register your models here.
 admin.site.register(CountingSession)
@@ -9,3 +10,22 @@ class PalmOilCountAdmin(admin.ModelAdmin):
     list_display = ('date', 'suitable_count', 'unsuitable_count', 'status')
     list_filter = ('status', 'date')
     search_fields = ('date', 'status')
+
+    def save_model(self, request, obj, form, change):
+        # Counts, date and device feed the daily rollup and the cached periods
+        old = PalmOilCount.objects.select_for_update().get(pk=obj.pk) if change else None
+        super().save_model(request, obj, form, change)
+        record_saved(obj, old)
+
+@admin.register(CountEvent)
+class CountEventAdmin(admin.ModelAdmin):
+    list_display = ('timestamp', 'class_id', 'confidence', 'device', 'session')
+    list_filter = ('class_id', 'device')
+    date_hierarchy = 'timestamp'
+    raw_id_fields = ('session',)
+
+@admin.register(DailyCountSummary)
+class DailyCountSummaryAdmin(admin.ModelAdmin):
+    list_display = ('day', 'device', 'suitable_count', 'unsuitable_count')
+    list_filter = ('device',)
+    date_hierarchy = 'day'
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class MyappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'myapp'
+
+    def ready(self):
+        from django.db.models.signals import post_delete
+        from .models import PalmOilCount
+        from .rollup import record_deleted
+        # Bulk, API and admin writes update the rollup explicitly; deletes (admin) go through the signal
+        post_delete.connect(record_deleted, sender=PalmOilCount, dispatch_uid='palmoilcount_rollup_delete')
@@ -0,0 +1,230 @@
+import base64
+import json
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CountEvent, PalmOilCount
+from .rollup import CountDeltas
+from .thumbnails import schedule_thumbnail
+
+try:
+    import msgpack
+except ImportError:  # Binary batches are optional; JSON always works
+    msgpack = None
+
+MSGPACK_CONTENT_TYPE = 'application/msgpack'
+UPDATE_FIELDS = ['suitable_count', 'unsuitable_count', 'status', 'last_seq']
+EVENT_INSERT_BATCH_SIZE = 500
+
+
+class IngestError(ValueError):
+    """The batch as a whole cannot be decoded"""
+
+
+def decode_batch(request):
+    """Return (device, items, events) from a JSON or msgpack request body"""
+    content_type = (request.content_type or '').lower()
+    if content_type == MSGPACK_CONTENT_TYPE:
+        if msgpack is None:
+            raise IngestError("msgpack is not installed on the server, send JSON")
+        try:
+            payload = msgpack.unpackb(request.body, raw=False)
+        except Exception as e:
+            raise IngestError(f"Invalid msgpack data: {e}")
+    else:
+        try:
+            payload = json.loads(request.body)
+        except json.JSONDecodeError:
+            raise IngestError("Invalid JSON data")
+
+    if not isinstance(payload, dict) or not isinstance(payload.get('items'), list):
+        raise IngestError("Expected an object with an 'items' list")
+    events = payload.get('events') or []
+    if not isinstance(events, list):
+        raise IngestError("'events' must be a list")
+    return str(payload.get('device') or ''), payload['items'], events
+
+
+def parse_item(item):
+    """Validate one session update; raises ValueError with a readable message"""
+    if not isinstance(item, dict):
+        raise ValueError("item must be an object")
+    session_key = item.get('session_key')
+    if not session_key or not isinstance(session_key, str):
+        raise ValueError("session_key is required")
+
+    image = item.get('image')
+    if isinstance(image, str):  # JSON carries the JPEG base64-encoded
+        image = base64.b64decode(image)
+
+    date = item.get('date')
+    if isinstance(date, (int, float)):
+        date = datetime.fromtimestamp(date, tz=dt_timezone.utc)
+    else:
+        date = timezone.now()
+
+    return {
+        "session_key": session_key,
+        "seq": int(item['seq']),
+        "suitable_count": int(item.get('suitable_count', 0)),
+        "unsuitable_count": int(item.get('unsuitable_count', 0)),
+        "status": str(item.get('status', 'running'))[:20],
+        "date": date,
+        "image": image,
+    }
+
+
+def parse_event(event, device):
+    """Build an unsaved CountEvent; session_key is kept aside for linking"""
+    x1, y1, x2, y2 = (int(v) for v in event['box'])
+    count_event = CountEvent(
+        timestamp=datetime.fromtimestamp(float(event['timestamp']), tz=dt_timezone.utc),
+        device=device,
+        seq=int(event['seq']),
+        class_id=int(event['class_id']),
+        confidence=float(event['confidence']),
+        x1=x1, y1=y1, x2=x2, y2=y2,
+    )
+    return event.get('session_key'), count_event
+
+
+def insert_events(device, events, session_ids):
+    """Bulk insert crossing events; returns (inserted, rejected).
+
+    Duplicates of already stored events (same device and seq) are skipped
+    by the unique constraint, which keeps replays idempotent; inserted only
+    counts the new rows.
+    """
+    parsed, rejected = [], 0
+    for event in events:
+        try:
+            parsed.append(parse_event(event, device))
+        except (KeyError, TypeError, ValueError):
+            rejected += 1
+
+    missing = {key for key, _ in parsed if key and key not in session_ids}
+    if missing:
+        session_ids.update(PalmOilCount.objects.filter(session_key__in=missing).values_list('session_key', 'id'))
+
+    rows = []
+    for session_key, count_event in parsed:
+        count_event.session_id = session_ids.get(session_key)
+        rows.append(count_event)
+    if not rows:
+        return 0, rejected
+
+    # ignore_conflicts does not report what was skipped: count the batch's seq
+    # range (one index range scan) before and after the insert
+    seqs = [row.seq for row in rows]
+    window = CountEvent.objects.filter(device=device, seq__gte=min(seqs), seq__lte=max(seqs))
+    before = window.count()
+    CountEvent.objects.bulk_create(rows, batch_size=EVENT_INSERT_BATCH_SIZE, ignore_conflicts=True)
+    return window.count() - before, rejected
+
+
+def store_image(record, data):
+    """Give a new record its image name now and write the file after commit.
+
+    A rolled-back batch then leaves no orphaned file. Should the name be
+    taken by the time the file is written, storage picks another one and
+    the record is pointed at it.
+    """
+    field = record.image.field
+    name = field.generate_filename(record, f"palm_oil_{record.date.strftime('%Y%m%d_%H%M%S')}.jpg")
+    record.image.name = default_storage.get_available_name(name, max_length=field.max_length)
+
+    def save():
+        saved = default_storage.save(record.image.name, ContentFile(data))
+        if saved != record.image.name:
+            PalmOilCount.objects.filter(id=record.id).update(image=saved)
+        schedule_thumbnail(saved)
+
+    transaction.on_commit(save)
+
+
+def apply_batch(device, items, events=()):
+    """Apply a batch of session updates in one transaction.
+
+    Items carry session totals, so only the newest seq per session matters;
+    older ones in the batch (and any not newer than the record's last_seq)
+    are reported as 'stale'. New sessions are inserted with one bulk_create
+    and changed ones written back with one bulk_update; their count changes
+    go to the daily rollup. The crossing events are then bulk inserted and
+    linked to their session. New session images (and their thumbnails) are
+    written once the transaction commits. Returns one result dict per input
+    item, in input order, and the event (inserted, rejected) counts.
+    """
+    results = [None] * len(items)
+    latest = {}
+    for index, raw in enumerate(items):
+        try:
+            item = parse_item(raw)
+        except (KeyError, TypeError, ValueError) as e:
+            results[index] = {"index": index, "result": "error", "message": str(e) or "invalid item"}
+            continue
+        item["index"] = index
+        current = latest.get(item["session_key"])
+        if current is None or item["seq"] > current["seq"]:
+            latest[item["session_key"]] = item
+
+    with transaction.atomic():
+        records = {
+            record.session_key: record
+            for record in PalmOilCount.objects.select_for_update().filter(session_key__in=list(latest))
+        }
+
+        to_create, to_update, outcome = [], [], {}
+        deltas = CountDeltas()
+        for session_key, item in latest.items():
+            record = records.get(session_key)
+            if record is None:
+                record = PalmOilCount(
+                    session_key=session_key,
+                    device=device,
+                    date=item["date"],
+                    suitable_count=item["suitable_count"],
+                    unsuitable_count=item["unsuitable_count"],
+                    status=item["status"],
+                    last_seq=item["seq"],
+                )
+                if item["image"]:
+                    store_image(record, item["image"])
+                records[session_key] = record
+                to_create.append(record)
+                deltas.add(record)
+                outcome[session_key] = "created"
+            elif item["seq"] > record.last_seq:
+                old_suitable, old_unsuitable = record.suitable_count, record.unsuitable_count
+                record.suitable_count = item["suitable_count"]
+                record.unsuitable_count = item["unsuitable_count"]
+                record.status = item["status"]
+                record.last_seq = item["seq"]
+                to_update.append(record)
+                deltas.add(record, old_suitable, old_unsuitable)
+                outcome[session_key] = "updated"
+
+        PalmOilCount.objects.bulk_create(to_create)
+        PalmOilCount.objects.bulk_update(to_update, UPDATE_FIELDS)
+        deltas.apply()
+
+        session_ids = {session_key: record.id for session_key, record in records.items()}
+        event_counts = insert_events(device, events, session_ids)
+
+    for index, raw in enumerate(items):
+        if results[index] is not None:
+            continue
+        session_key = raw['session_key']
+        record = records[session_key]
+        winner = latest[session_key]["index"] == index
+        results[index] = {
+            "index": index,
+            "session_key": session_key,
+            "seq": int(raw['seq']),
+            "id": record.id,
+            "result": outcome.get(session_key, "stale") if winner else "stale",
+        }
+    return results, event_counts
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+KEEPALIVE = 15  # Seconds between keep-alive comments on an idle browser stream
+
+
+class LiveCounts:
+    """Relays the detection server's /events stream to any number of browsers.
+
+    While at least one browser listens, a background thread holds a single
+    Server-Sent Events connection to the detection server and keeps the
+    latest counts/status snapshot with a version number; browser streams
+    wait on that. Ten open tabs therefore cost the detection server one
+    connection, and nothing at all once the last tab has been idle for
+    idle_timeout seconds.
+    """
+
+    def __init__(self, events_url, read_timeout, idle_timeout=30.0, retry_interval=3.0, http=requests):
+        self.events_url = events_url  # Callable, so server URL changes are picked up on reconnect
+        self.read_timeout = read_timeout
+        self.idle_timeout = idle_timeout
+        self.retry_interval = retry_interval
+        self.http = http  # requests or a Session, to share its connection pool
+        self._cond = threading.Condition()
+        self._version = 0
+        self._snapshot = None
+        self._waiters = []  # (event loop, asyncio Future) of async views in wait_async
+        self._listeners = 0
+        self._idle_since = time.monotonic()
+        self._thread = None
+
+    @contextmanager
+    def listening(self):
+        """Register a browser stream for as long as the block runs"""
+        with self._cond:
+            self._listeners += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="live-counts")
+                self._thread.daemon = True
+                self._thread.start()
+        try:
+            yield self
+        finally:
+            with self._cond:
+                self._listeners -= 1
+                if not self._listeners:
+                    self._idle_since = time.monotonic()
+
+    def wait(self, since, timeout=None):
+        """Block until the snapshot version is not since, or timeout; returns (version, snapshot)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._version != since, timeout)
+            return self._version, self._snapshot
+
+    async def wait_async(self, since, timeout=None):
+        """wait() for async views, without holding a thread while waiting"""
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self._version != since:
+                return self._version, self._snapshot
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._cond:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        with self._cond:
+            return self._version, self._snapshot
+
+    def _publish(self, snapshot):
+        with self._cond:
+            if snapshot != self._snapshot:
+                self._snapshot = snapshot
+                self._version += 1
+                self._cond.notify_all()
+                for loop, future in self._waiters:
+                    loop.call_soon_threadsafe(_wake, future)
+                self._waiters.clear()
+
+    def _idle(self):
+        """True (and the thread marked gone) once nobody has listened for idle_timeout"""
+        with self._cond:
+            if self._listeners or time.monotonic() - self._idle_since < self.idle_timeout:
+                return False
+            self._thread = None
+            return True
+
+    def _run(self):
+        while not self._idle():
+            try:
+                with self.http.get(self.events_url(), stream=True,
+                                   timeout=(self.retry_interval, self.read_timeout)) as response:
+                    response.raise_for_status()
+                    # Byte-wise, so each event is handed over as soon as it arrives
+                    # (larger chunks would wait for more data on a quiet stream)
+                    for line in response.iter_lines(chunk_size=1, decode_unicode=True):
+                        if line and line.startswith('data:'):
+                            self._publish(json.loads(line[5:]))
+                        if self._idle():
+                            return
+            except (requests.exceptions.RequestException, ValueError) as e:
+                # Same shape as the get_counts error, so pages show the server as offline
+                self._publish({"status": "error", "message": f"Cannot connect to detection server: {e}"})
+            time.sleep(self.retry_interval)
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
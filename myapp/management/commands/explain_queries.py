@@ -0,0 +1,142 @@
+import json
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from myapp import views
+from myapp.models import DailyCountSummary, PalmOilCount
+from myapp.pagination import table_page
+
+TABLE = PalmOilCount._meta.db_table
+TABLES = (TABLE, DailyCountSummary._meta.db_table)
+
+
+class Command(BaseCommand):
+    help = ("Run the dashboard, period and control queries and print the database query plan "
+            "of every statement on PalmOilCount and its daily rollup, flagging full table scans")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Insert this many synthetic rows first (rolled back afterwards)")
+        parser.add_argument('--strict', action='store_true',
+                            help="Exit with an error if any query full-scans the table")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                self.seed(options['seed'])
+            # No response cache, so cached views still run (and show) their queries
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+                full_scans = self.explain_all()
+            # Never keep the synthetic rows
+            transaction.set_rollback(True)
+
+        if full_scans:
+            message = f"{full_scans} statement(s) do a full table scan"
+            if options['strict']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS("No full table scans"))
+
+    def seed(self, count):
+        """Spread count rows over the last two years, like a long-running mill"""
+        now = timezone.now()
+        statuses = ['stopped'] * 18 + ['running', 'paused']
+        PalmOilCount.objects.bulk_create(
+            (PalmOilCount(date=now - timedelta(minutes=random.randint(0, 2 * 365 * 24 * 60)),
+                          suitable_count=random.randint(0, 500),
+                          unsuitable_count=random.randint(0, 100),
+                          status=random.choice(statuses))
+             for _ in range(count)),
+            batch_size=1000,
+        )
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        self.stdout.write(f"Seeded {count} rows")
+
+    def view_calls(self):
+        """(name, callable) pairs that run the same queries as the views"""
+        factory = RequestFactory()
+        user = User(username='explain_queries')  # Unsaved: only passes login_required
+        today = timezone.localdate()
+        iso_year, iso_week, _ = today.isocalendar()
+
+        def call(view, path):
+            request = factory.get(path)
+            request.user = user
+            return lambda: view(request)
+
+        def post(view, path, **params):
+            # The dashboard JS posts JSON to the chart endpoints
+            request = factory.post(path, json.dumps(params), content_type='application/json')
+            request.user = user
+            return lambda: view(request)
+
+        return [
+            ("dashboard", call(views.dashboard, '/dashboard/')),
+            ("control", call(views.control, '/control/')),
+            ("tables", call(views.tables, '/tables/')),
+            ("tables_data page 2", call(views.tables_data, f'/api/tables/?cursor={self.second_page_cursor()}')),
+            ("tables_data filtered", call(views.tables_data,
+                                          f'/api/tables/?status=stopped&start={today.replace(day=1)}&end={today}')),
+            ("get_week_data", post(views.get_week_data, '/api/dashboard/week-data/',
+                                   week=f"{iso_year}-W{iso_week:02d}")),
+            ("get_period_data week", post(views.get_period_data, '/api/dashboard/period-data/',
+                                          period_type='week', period_value=f"{iso_year}-W{iso_week:02d}")),
+            ("get_period_data month", post(views.get_period_data, '/api/dashboard/period-data/',
+                                           period_type='month', period_value=today.strftime('%Y-%m'))),
+            ("get_period_data year", post(views.get_period_data, '/api/dashboard/period-data/',
+                                          period_type='year', period_value=str(today.year))),
+            # start/pause/resume talk to the detection server; run their lookups directly
+            ("start_detection", PalmOilCount.objects.latest_active),
+            ("pause_detection", lambda: PalmOilCount.objects.filter(status='running').first()),
+            ("resume_detection", lambda: PalmOilCount.objects.filter(status='paused').first()),
+        ]
+
+    @staticmethod
+    def second_page_cursor():
+        return table_page({}).get('next_cursor') or ''
+
+    def explain_all(self):
+        prefix = "EXPLAIN QUERY PLAN " if connection.vendor == 'sqlite' else "EXPLAIN "
+        full_scans = 0
+        for name, run in self.view_calls():
+            with CaptureQueriesContext(connection) as captured:
+                run()
+            statements = [q['sql'] for q in captured.captured_queries
+                          if any(table in q['sql'] for table in TABLES)]
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{name}: {len(statements)} statement(s)"))
+            for sql in statements:
+                with connection.cursor() as cursor:
+                    cursor.execute(prefix + sql)
+                    plan = [" ".join(str(col) for col in row) for row in cursor.fetchall()]
+                scans = [line for line in plan if self.is_full_scan(line, sql)]
+                full_scans += bool(scans)
+
+                self.stdout.write(f"  {sql[:160]}{'...' if len(sql) > 160 else ''}")
+                for line in plan:
+                    style = self.style.ERROR if line in scans else self.style.SQL_KEYWORD
+                    self.stdout.write(style(f"    {line}"))
+        return full_scans
+
+    @staticmethod
+    def is_full_scan(line, sql):
+        """A table scan, or a walk over a whole index (SCAN ... USING INDEX, not SEARCH).
+
+        Only an index walk in ORDER BY order with a LIMIT and no WHERE (the
+        latest rows, the first tables page) is fine: it stops after LIMIT rows.
+        """
+        if connection.vendor == 'sqlite':
+            if not any(f"SCAN {table}" in line for table in TABLES):
+                return False
+            return not ("INDEX" in line and " LIMIT " in sql and " WHERE " not in sql)
+        return any(f"Seq Scan on {table}" in line for table in TABLES)
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from myapp.models import PalmOilCount
+from myapp.thumbnails import make_thumbnail, thumbnail_name
+
+
+class Command(BaseCommand):
+    help = "Create the missing thumbnails of PalmOilCount images (all of them with --force)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Recreate thumbnails that already exist")
+        parser.add_argument('--workers', type=int, default=settings.THUMBNAIL_CONFIG['WORKERS'],
+                            help="Images processed in parallel")
+
+    def handle(self, *args, **options):
+        force = options['force']
+        names = (PalmOilCount.objects.exclude(image='').exclude(image__isnull=True)
+                 .order_by().values_list('image', flat=True).iterator())
+        todo = [name for name in names if force or not default_storage.exists(thumbnail_name(name))]
+
+        def create(name):
+            try:
+                make_thumbnail(name, force=force)
+                return None
+            except (OSError, ValueError) as e:
+                return f"{name}: {e}"
+
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            errors = [error for error in pool.map(create, todo) if error]
+
+        for error in errors:
+            self.stdout.write(self.style.WARNING(f"Skipped {error}"))
+        self.stdout.write(self.style.SUCCESS(f"Created {len(todo) - len(errors)} thumbnails"))
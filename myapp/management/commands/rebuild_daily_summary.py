@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.rollup import rebuild
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', use YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Recompute DailyCountSummary from PalmOilCount (whole history, or a date range)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=parse_date, help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument('--end', type=parse_date, help="Last day to rebuild (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end']
+        if start and end and start > end:
+            raise CommandError("--start must not be after --end")
+
+        rows = rebuild(start, end)
+        scope = f"{start or 'beginning'} .. {end or 'today'}" if start or end else "all days"
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily summary rows ({scope})"))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='palmoilcount',
+            name='last_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='palmoilcount',
+            name='session_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
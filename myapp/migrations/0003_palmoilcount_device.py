@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0002_palmoilcount_session_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='palmoilcount',
+            name='device',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_palmoilcount_device'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CountEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('device', models.CharField(blank=True, default='', max_length=64)),
+                ('seq', models.BigIntegerField()),
+                ('class_id', models.PositiveSmallIntegerField(choices=[(0, 'Ripe'), (1, 'Unripe')])),
+                ('confidence', models.FloatField()),
+                ('x1', models.IntegerField()),
+                ('y1', models.IntegerField()),
+                ('x2', models.IntegerField()),
+                ('y2', models.IntegerField()),
+                ('session', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='myapp.palmoilcount')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['timestamp'], name='countevent_timestamp_idx'), models.Index(fields=['device', 'timestamp'], name='countevent_device_ts_idx'), models.Index(fields=['session', 'timestamp'], name='countevent_session_ts_idx')],
+                'constraints': [models.UniqueConstraint(fields=('device', 'seq'), name='countevent_unique_device_seq')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0004_countevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='palmoilcount',
+            index=models.Index(fields=['date'], name='palmoilcount_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='palmoilcount',
+            index=models.Index(fields=['status', 'date'], name='palmoilcount_status_date_idx'),
+        ),
+    ]
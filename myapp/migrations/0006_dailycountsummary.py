@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:21
+
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+
+def build_summaries(apps, schema_editor):
+    """Backfill the rollup from the records that already exist"""
+    PalmOilCount = apps.get_model('myapp', 'PalmOilCount')
+    DailyCountSummary = apps.get_model('myapp', 'DailyCountSummary')
+    totals = PalmOilCount.objects.order_by().annotate(day=TruncDate('date')).values('day', 'device').annotate(
+        suitable=Sum('suitable_count'),
+        unsuitable=Sum('unsuitable_count'),
+    )
+    DailyCountSummary.objects.bulk_create(
+        (DailyCountSummary(day=row['day'], device=row['device'], suitable_count=row['suitable'] or 0,
+                           unsuitable_count=row['unsuitable'] or 0)
+         for row in totals.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0005_palmoilcount_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCountSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('device', models.CharField(blank=True, default='', max_length=64)),
+                ('suitable_count', models.BigIntegerField(default=0)),
+                ('unsuitable_count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['day', 'device'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'device'), name='dailycountsummary_unique_day_device')],
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
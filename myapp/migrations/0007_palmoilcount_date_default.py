@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_dailycountsummary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='palmoilcount',
+            name='date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
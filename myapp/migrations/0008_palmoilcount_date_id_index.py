@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0007_palmoilcount_date_default'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='palmoilcount',
+            name='palmoilcount_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='palmoilcount',
+            index=models.Index(fields=['date', 'id'], name='palmoilcount_date_id_idx'),
+        ),
+    ]
@@ -1,4 +1,7 @@
+from datetime import datetime, time, timedelta
+
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 
@@ -12,15 +15,118 @@ class CountingSession(models.Model):
     class Meta:
         ordering = ['-date']
 
+ACTIVE_STATUSES = ('running', 'paused')
+
+
+class PalmOilCountQuerySet(models.QuerySet):
+    def between_dates(self, start, end):
+        """Records whose local date is within [start, end] (inclusive).
+
+        Same rows as date__date__range, but as a plain range on the date
+        column so the database can use its index instead of computing the
+        date of every row.
+        """
+        start_dt = timezone.make_aware(datetime.combine(start, time.min))
+        end_dt = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+        return self.filter(date__gte=start_dt, date__lt=end_dt)
+
+    def latest_active(self):
+        """Newest running or paused record, or None.
+
+        One equality lookup per status, each a search on the (status, date)
+        index; with status__in SQLite walks the whole date index instead,
+        which is the common case of no active session.
+        """
+        sessions = [self.filter(status=status).first() for status in ACTIVE_STATUSES]
+        return max(filter(None, sessions), key=lambda record: record.date, default=None)
+
+    async def alatest_active(self):
+        sessions = [await self.filter(status=status).afirst() for status in ACTIVE_STATUSES]
+        return max(filter(None, sessions), key=lambda record: record.date, default=None)
+
+
 class PalmOilCount(models.Model):
-    date = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: replayed records keep the date they were counted
+    date = models.DateTimeField(default=timezone.now)
     suitable_count = models.IntegerField(default=0)
     unsuitable_count = models.IntegerField(default=0)
     status = models.CharField(max_length=20, default='stopped')
     image = models.ImageField(upload_to='palm_oil_images/', null=True, blank=True)
+    # Detection server session and the last count-log seq applied to this record,
+    # so replayed or retried updates are applied at most once
+    session_key = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    last_seq = models.BigIntegerField(default=0)
+    device = models.CharField(max_length=64, blank=True, default='')  # Detection server that counted it
+
+    objects = PalmOilCountQuerySet.as_manager()
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Date-range filters, the default -date ordering and the
+            # (date, id) keyset pagination of the tables page
+            models.Index(fields=['date', 'id'], name='palmoilcount_date_id_idx'),
+            # Active-session lookups: status filter, newest first
+            models.Index(fields=['status', 'date'], name='palmoilcount_status_date_idx'),
+        ]
 
     def __str__(self):
         return f"Count on {self.date.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+class CountEvent(models.Model):
+    """One counted crossing of the line, as reported by a detection server"""
+    RIPE = 0
+    UNRIPE = 1
+    CLASS_CHOICES = [
+        (RIPE, 'Ripe'),
+        (UNRIPE, 'Unripe'),
+    ]
+
+    timestamp = models.DateTimeField()
+    # No separate FK index: the (session, timestamp) index below covers it
+    session = models.ForeignKey(PalmOilCount, on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='events', db_index=False)
+    device = models.CharField(max_length=64, blank=True, default='')
+    seq = models.BigIntegerField()  # Count-log sequence number on the device
+    class_id = models.PositiveSmallIntegerField(choices=CLASS_CHOICES)
+    confidence = models.FloatField()
+    x1 = models.IntegerField()
+    y1 = models.IntegerField()
+    x2 = models.IntegerField()
+    y2 = models.IntegerField()
+
+    class Meta:
+        # No default ordering: range scans and GROUP BY over millions of rows
+        # should not pay for an implicit sort
+        indexes = [
+            models.Index(fields=['timestamp'], name='countevent_timestamp_idx'),
+            models.Index(fields=['device', 'timestamp'], name='countevent_device_ts_idx'),
+            models.Index(fields=['session', 'timestamp'], name='countevent_session_ts_idx'),
+        ]
+        constraints = [
+            # Replays insert with ignore_conflicts, so a resent event is dropped
+            models.UniqueConstraint(fields=['device', 'seq'], name='countevent_unique_device_seq'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_class_id_display()} at {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+class DailyCountSummary(models.Model):
+    """Per-day, per-device totals of PalmOilCount, kept up to date on every write"""
+    day = models.DateField()
+    device = models.CharField(max_length=64, blank=True, default='')
+    suitable_count = models.BigIntegerField(default=0)
+    unsuitable_count = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['day', 'device']
+        constraints = [
+            # Also serves as the index for day-range reads
+            models.UniqueConstraint(fields=['day', 'device'], name='dailycountsummary_unique_day_device'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.device or '-'}: {self.suitable_count}/{self.unsuitable_count}"
+
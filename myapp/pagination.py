@@ -0,0 +1,98 @@
+import base64
+from datetime import date, datetime
+
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import PalmOilCount
+from .thumbnails import thumbnail_version
+
+PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+STATUSES = ('running', 'paused', 'stopped')
+
+
+class PageError(ValueError):
+    """Malformed cursor or filter parameter"""
+
+
+def encode_cursor(record):
+    """Opaque cursor pointing just after record in (-date, -id) order"""
+    raw = f"{record.date.isoformat()}|{record.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode()
+        when, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(when), int(pk)
+    except (ValueError, UnicodeError):
+        raise PageError("Invalid cursor")
+
+
+def keyset_page(queryset, cursor=None, limit=PAGE_SIZE):
+    """One page of queryset, newest first, starting after cursor.
+
+    Seeks with WHERE (date, id) < cursor instead of OFFSET, so every page
+    is a short walk down the date index however deep it is. Returns
+    (records, next_cursor); next_cursor is None on the last page.
+    """
+    queryset = queryset.order_by('-date', '-id')
+    if cursor:
+        when, pk = decode_cursor(cursor)
+        # date <= when keeps the condition a plain index range
+        queryset = queryset.filter(Q(date__lt=when) | Q(id__lt=pk), date__lte=when)
+    records = list(queryset[:limit + 1])
+    next_cursor = encode_cursor(records[limit - 1]) if len(records) > limit else None
+    return records[:limit], next_cursor
+
+
+def parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise PageError(f"{name} must be a YYYY-MM-DD date")
+
+
+def filtered_records(params):
+    """PalmOilCount rows matching the start/end/status query parameters"""
+    records = PalmOilCount.objects.all()
+    start, end = params.get('start'), params.get('end')
+    if start or end:
+        start = parse_date(start, 'start') if start else date(1970, 1, 1)
+        end = parse_date(end, 'end') if end else timezone.localdate()
+        records = records.between_dates(start, end)
+
+    status = params.get('status')
+    if status:
+        if status not in STATUSES:
+            raise PageError(f"status must be one of {', '.join(STATUSES)}")
+        records = records.filter(status=status)
+    return records
+
+
+def table_row(record):
+    date_local = timezone.localtime(record.date)
+    return {
+        'id': record.id,
+        'date': date_local.strftime('%Y-%m-%d'),
+        'date_display': date_local.strftime('%d/%m/%Y'),
+        'suitable_count': record.suitable_count,
+        'unsuitable_count': record.unsuitable_count,
+        'image': record.image.url if record.image else None,
+        'thumbnail': (f"{reverse('myapp:thumbnail', args=[record.id])}?v={thumbnail_version(record.image.name)}"
+                      if record.image else None),
+        'status': record.status,
+    }
+
+
+def table_page(params):
+    """JSON-ready page for the tables view: {rows, next_cursor}"""
+    try:
+        limit = min(max(int(params.get('limit') or PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        raise PageError("limit must be a number")
+    records, next_cursor = keyset_page(filtered_records(params), params.get('cursor'), limit)
+    return {'rows': [table_row(record) for record in records], 'next_cursor': next_cursor}
@@ -0,0 +1,222 @@
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import DailyCountSummary, PalmOilCount
+
+TRUNCATE = {
+    'day': lambda field: F(field),
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+# Periods the dashboard caches; each has its own data version
+VERSION_UNITS = ('week', 'month', 'year')
+VERSION_PREFIX = 'rollup-version'
+
+
+def summary_key(record):
+    """(day, device) bucket of a PalmOilCount, in the current time zone"""
+    return timezone.localdate(record.date), record.device or ''
+
+
+class CountDeltas:
+    """Collects count changes per (day, device) and applies them in one go.
+
+    Record writers call add() with the counts before and after their write;
+    apply() turns the non-zero totals into one UPDATE per bucket (or an
+    insert for a new bucket) and bumps the data version of every period
+    it touched once the transaction commits.
+    """
+
+    def __init__(self):
+        self._deltas = defaultdict(lambda: [0, 0])
+
+    def add(self, record, old_suitable=0, old_unsuitable=0):
+        delta = self._deltas[summary_key(record)]
+        delta[0] += record.suitable_count - old_suitable
+        delta[1] += record.unsuitable_count - old_unsuitable
+
+    def remove(self, record):
+        delta = self._deltas[summary_key(record)]
+        delta[0] -= record.suitable_count
+        delta[1] -= record.unsuitable_count
+
+    def apply(self):
+        for (day, device), (suitable, unsuitable) in self._deltas.items():
+            if suitable or unsuitable:
+                add_to_summary(day, device, suitable, unsuitable)
+        # Also for zero deltas: a new record still changes a period's last_counted
+        days = {day for day, _ in self._deltas}
+        if days:
+            transaction.on_commit(lambda: bump_data_versions(days))
+        self._deltas.clear()
+
+
+def add_to_summary(day, device, suitable, unsuitable):
+    """Atomically add to one bucket, creating it on first use"""
+    updated = DailyCountSummary.objects.filter(day=day, device=device).update(
+        suitable_count=F('suitable_count') + suitable,
+        unsuitable_count=F('unsuitable_count') + unsuitable,
+    )
+    if updated:
+        return
+    try:
+        # Savepoint, so losing a creation race does not break the outer transaction
+        with transaction.atomic():
+            DailyCountSummary.objects.create(day=day, device=device, suitable_count=suitable,
+                                             unsuitable_count=unsuitable)
+    except IntegrityError:
+        add_to_summary(day, device, suitable, unsuitable)
+
+
+def record_saved(record, old=None):
+    """Move a saved record's counts into its bucket; old is the row before the write.
+
+    For writes that may change the date or device (admin edits): the old
+    counts leave the old bucket and the new ones enter the new bucket.
+    """
+    deltas = CountDeltas()
+    if old is not None:
+        deltas.remove(old)
+    deltas.add(record)
+    deltas.apply()
+
+
+def record_deleted(sender, instance, **kwargs):
+    """post_delete receiver: take a deleted record's counts out of its bucket"""
+    deltas = CountDeltas()
+    deltas.remove(instance)
+    deltas.apply()
+
+
+def rebuild(start=None, end=None):
+    """Recompute the summary rows for [start, end] (whole history by default).
+
+    Returns the number of summary rows written.
+    """
+    records = PalmOilCount.objects.order_by()
+    summaries = DailyCountSummary.objects.all()
+    if start is not None or end is not None:
+        start = start or date(1970, 1, 1)
+        end = end or timezone.localdate()
+        records = records.between_dates(start, end)
+        summaries = summaries.filter(day__range=[start, end])
+
+    totals = records.annotate(day=TruncDate('date')).values('day', 'device').annotate(
+        suitable=Sum('suitable_count'),
+        unsuitable=Sum('unsuitable_count'),
+    )
+    with transaction.atomic():
+        summaries.delete()
+        rows = DailyCountSummary.objects.bulk_create(
+            (DailyCountSummary(day=row['day'], device=row['device'], suitable_count=row['suitable'] or 0,
+                               unsuitable_count=row['unsuitable'] or 0)
+             for row in totals.iterator()),
+            batch_size=1000,
+        )
+        transaction.on_commit(bump_all_data_versions)
+    return len(rows)
+
+
+def version_key(unit, start):
+    return f"{VERSION_PREFIX}:{unit}:{start.isoformat()}"
+
+
+def new_version():
+    # Versions start from the clock rather than 1, so a version key evicted
+    # by the cache comes back larger than any value it had before, never
+    # matching an entry cached under an old version
+    return time.time_ns()
+
+
+def data_version(unit, start):
+    """Current version of one period's data, for cache keys.
+
+    Changes whenever a record in the period is written or deleted, and
+    when the rollup is rebuilt.
+    """
+    keys = [version_key(unit, bucket_start(start, unit)), f"{VERSION_PREFIX}:all"]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, new_version(), None)
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def bump_data_versions(days):
+    """Invalidate the cached periods (week, month, year) containing days"""
+    for unit in VERSION_UNITS:
+        for start in {bucket_start(day, unit) for day in days}:
+            try:
+                cache.incr(version_key(unit, start))
+            except ValueError:
+                pass  # Never read (or evicted): the next reader starts a new version
+
+
+def bump_all_data_versions():
+    try:
+        cache.incr(f"{VERSION_PREFIX}:all")
+    except ValueError:
+        pass
+
+
+def bucket_start(day, unit):
+    if unit == 'week':
+        return day - timedelta(days=day.weekday())
+    if unit == 'month':
+        return day.replace(day=1)
+    if unit == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def next_bucket(start, unit):
+    if unit == 'week':
+        return start + timedelta(days=7)
+    if unit == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def count_series(start, end, unit='day'):
+    """Gap-filled totals over all devices for [start, end], from one GROUP BY.
+
+    unit is 'day', 'week' (ISO weeks, starting Monday) or 'month'. Returns
+    [(bucket_start, suitable, unsuitable)] with a row for every bucket that
+    overlaps the range, zeros where nothing was counted. Days are already
+    local-time days (the rollup buckets records with the current time zone),
+    so truncating them to weeks and months needs no further conversion.
+    """
+    if unit not in TRUNCATE:
+        raise ValueError(f"Unknown unit '{unit}', expected one of {sorted(TRUNCATE)}")
+
+    rows = DailyCountSummary.objects.filter(day__range=[start, end]).annotate(
+        bucket=TRUNCATE[unit]('day')
+    ).values('bucket').annotate(
+        suitable=Sum('suitable_count'),
+        unsuitable=Sum('unsuitable_count'),
+    ).order_by()
+    totals = {row['bucket']: (row['suitable'], row['unsuitable']) for row in rows}
+
+    series = []
+    bucket = bucket_start(start, unit)
+    while bucket <= end:
+        suitable, unsuitable = totals.get(bucket, (0, 0))
+        series.append((bucket, suitable, unsuitable))
+        bucket = next_bucket(bucket, unit)
+    return series
+
+
+def chunk_series(series, size):
+    """Fold consecutive buckets into groups of size: [(first_start, suitable, unsuitable)]"""
+    return [
+        (group[0][0], sum(row[1] for row in group), sum(row[2] for row in group))
+        for group in (series[i:i + size] for i in range(0, len(series), size))
+    ]
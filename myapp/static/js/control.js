@@ -8,7 +8,6 @@ const statusText = document.querySelector('.status-text');
 
 let isRunning = false;
 let isPaused = false;
-let countPollingInterval = null;
 let loadingTimeout = null;
 let isProcessing = false;
 
@@ -105,56 +104,46 @@ function updateStatus(status) {
     statusText.textContent = statusTextContent;
 }
 
-async function updateCount() {
-    try {
-        const response = await fetch('/api/detection/get_counts/');
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        
-        const data = await response.json();
-        console.log('Count data:', data);
-        
-        if (data) {
-            document.getElementById('suitableCount').textContent = data.suitable_count;
-            document.getElementById('unsuitableCount').textContent = data.unsuitable_count;
-            
-            // Update status berdasarkan response dari server
-            if (data.status === 'paused') {
-                isPaused = true;
-                pauseBtn.textContent = 'Resume';
-                updateStatus('paused');
-                updateStatusGif('waiting');
-            } else if (data.status === 'running') {
-                isPaused = false;
-                pauseBtn.textContent = 'Pause';
-                updateStatus('running');
-                updateStatusGif('running');
-                // Setelah running, polling bisa diperlambat
-                if (countPollingInterval) {
-                    clearInterval(countPollingInterval);
-                    countPollingInterval = setInterval(updateCount, 1000);
-                }
-            } else if (data.status === 'loading') {
-                // Kamera belum siap, tetap loading
-                updateStatus('loading');
-                updateStatusGif('loading');
-            } else if (data.status === 'stopped') {
-                isRunning = false;
-                isPaused = false;
-                pauseBtn.textContent = 'Pause';
-                updateStatus('stopped');
-                updateStatusGif('waiting');
-            }
-        }
-    } catch (error) {
-        console.error('Error fetching counts:', error);
-        if (countPollingInterval) {
-            clearInterval(countPollingInterval);
-            countPollingInterval = null;
-            updateStatus('stopped');
-            updateStatusGif('waiting');
-        }
+// Dipanggil setiap kali server deteksi mem-push counts/status baru (live-counts.js)
+function updateCount(data) {
+    if (!data || data.status === 'error') {
+        console.error('Detection server unavailable:', data && data.message);
+        updateStatus('stopped');
+        updateStatusGif('waiting');
+        return;
+    }
+
+    document.getElementById('suitableCount').textContent = data.suitable_count;
+    document.getElementById('unsuitableCount').textContent = data.unsuitable_count;
+    
+    // Update status berdasarkan data dari server (juga perubahan dari tab/operator lain)
+    if (data.status === 'paused') {
+        isRunning = true;
+        isPaused = true;
+        pauseBtn.textContent = 'Resume';
+        updateStatus('paused');
+        updateStatusGif('waiting');
+    } else if (data.status === 'running') {
+        isRunning = true;
+        isPaused = false;
+        pauseBtn.textContent = 'Pause';
+        updateStatus('running');
+        updateStatusGif('running');
+    } else if (data.status === 'loading') {
+        // Kamera belum siap, tetap loading
+        isRunning = true;
+        updateStatus('loading');
+        updateStatusGif('loading');
+    } else if (data.status === 'stopped') {
+        isRunning = false;
+        isPaused = false;
+        pauseBtn.textContent = 'Pause';
+        updateStatus('stopped');
+        updateStatusGif('waiting');
+    }
+
+    if (!isProcessing) {
+        updateButtons();
     }
 }
 
@@ -172,15 +161,8 @@ startBtn.addEventListener("click", async () => {
         isRunning = true;
         isPaused = false;
         
+        // Status berubah otomatis lewat live stream ketika kamera siap
         updateButtons();
-        
-        if (countPollingInterval) {
-            clearInterval(countPollingInterval);
-        }
-        
-        // Start polling counts immediately - status akan berubah otomatis ketika kamera siap
-        countPollingInterval = setInterval(updateCount, 500);
-        
     } else {
         updateStatusGif('waiting');
         updateStatus('stopped');
@@ -209,12 +191,6 @@ pauseBtn.addEventListener("click", async () => {
                 pauseBtn.textContent = 'Resume';
                 updateStatus('paused');
                 updateStatusGif('waiting');
-                
-                // Keep polling but reduce frequency during pause
-                if (countPollingInterval) {
-                    clearInterval(countPollingInterval);
-                    countPollingInterval = setInterval(updateCount, 2000);
-                }
             } else {
                 console.error("Invalid pause response:", response);
             }
@@ -228,12 +204,6 @@ pauseBtn.addEventListener("click", async () => {
                 pauseBtn.textContent = 'Pause';
                 updateStatus('running');
                 updateStatusGif('running');
-                
-                // Resume normal polling frequency
-                if (countPollingInterval) {
-                    clearInterval(countPollingInterval);
-                    countPollingInterval = setInterval(updateCount, 1000);
-                }
             } else {
                 console.error("Invalid resume response:", response);
             }
@@ -258,11 +228,6 @@ stopBtn.addEventListener("click", async () => {
         isRunning = false;
         isPaused = false;
         
-        if (countPollingInterval) {
-            clearInterval(countPollingInterval);
-            countPollingInterval = null;
-        }
-        
         if (loadingTimeout) {
             clearTimeout(loadingTimeout);
             loadingTimeout = null;
@@ -290,29 +255,6 @@ async function checkServerConnection() {
     }
 }
 
-// Handle page visibility changes untuk optimasi polling
-document.addEventListener('visibilitychange', () => {
-    if (document.hidden) {
-        // Halaman tidak terlihat - perlambat polling atau hentikan sementara
-        console.log("Page hidden - slowing down polling");
-        if (countPollingInterval && isRunning) {
-            clearInterval(countPollingInterval);
-            // Polling setiap 5 detik saat halaman tersembunyi
-            countPollingInterval = setInterval(updateCount, 5000);
-        }
-    } else {
-        // Halaman terlihat kembali - kembalikan polling normal
-        console.log("Page visible - restoring normal polling");
-        if (countPollingInterval && isRunning) {
-            clearInterval(countPollingInterval);
-            // Polling normal setiap 1 detik
-            countPollingInterval = setInterval(updateCount, 1000);
-            // Update segera saat kembali ke halaman
-            updateCount();
-        }
-    }
-});
-
 document.addEventListener('DOMContentLoaded', async () => {
     isProcessing = false;
     updateButtons();
@@ -323,11 +265,13 @@ document.addEventListener('DOMContentLoaded', async () => {
         alert('Warning: Cannot connect to detection server. Please check if the server is running.');
         updateStatusGif('waiting');
         updateStatus('stopped');
-        return;
+    } else {
+        // Restore status dari detection server
+        await restoreDetectionStatus();
     }
 
-    // Restore status dari detection server
-    await restoreDetectionStatus();
+    // Perubahan counts/status selanjutnya di-push server, tanpa polling
+    LiveCounts.subscribe(updateCount);
 });
 
 async function restoreDetectionStatus() {
@@ -361,12 +305,6 @@ async function restoreDetectionStatus() {
                     showNotification('Detection is running in background! Current counts restored.', 'success');
                 }
                 
-                // Start polling untuk update real-time
-                if (countPollingInterval) {
-                    clearInterval(countPollingInterval);
-                }
-                countPollingInterval = setInterval(updateCount, 1000);
-                
             } else if (data.status === 'paused') {
                 console.log("Detection is currently paused - restoring state");
                 isRunning = true;
@@ -387,12 +325,6 @@ async function restoreDetectionStatus() {
                 
                 showNotification('Detection is starting up...', 'info');
                 
-                // Start polling untuk menunggu sampai ready
-                if (countPollingInterval) {
-                    clearInterval(countPollingInterval);
-                }
-                countPollingInterval = setInterval(updateCount, 500);
-                
             } else {
                 console.log("Detection is stopped");
                 isRunning = false;
@@ -1,9 +1,6 @@
-// Fungsi untuk mengecek status deteksi
-async function checkDetectionStatus() {
+// Fungsi untuk menampilkan status deteksi (butuh live-counts.js)
+function checkDetectionStatus(data) {
     try {
-        const response = await fetch('/api/detection/get_counts/');
-        const data = await response.json();
-        
         // Update status dot dan text di semua halaman
         const statusDot = document.querySelector('.status-dot');
         const statusText = document.querySelector('.status-text');
@@ -39,8 +36,7 @@ async function checkDetectionStatus() {
     }
 }
 
-// Mulai polling ketika dokumen dimuat
+// Status di-push server setiap ada perubahan, tanpa polling
 document.addEventListener('DOMContentLoaded', () => {
-    // Polling setiap 1 detik
-    setInterval(checkDetectionStatus, 1000);
+    LiveCounts.subscribe(checkDetectionStatus);
 }); 
\ No newline at end of file
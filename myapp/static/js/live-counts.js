@@ -0,0 +1,87 @@
+// Counts dan status deteksi yang di-push server lewat Server-Sent Events
+// (/api/detection/events/). Satu stream per halaman, dibagi ke semua subscriber.
+// Kalau EventSource tidak tersedia atau stream terus gagal, kembali ke long-polling.
+const LiveCounts = (function() {
+    const listeners = [];
+    const maxFailures = 3;
+    const pollInterval = 2000;
+    const longPollTimeout = 25;
+    let source = null;
+    let polling = false;
+    let failures = 0;
+    let latest = null;
+
+    function emit(data) {
+        latest = data;
+        listeners.forEach(listener => listener(data));
+    }
+
+    function sleep(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+
+    // Long-poll: get_counts?version=V menunggu sampai counts/status berubah,
+    // jadi request hanya terjadi sesering buah melewati garis
+    async function poll() {
+        let version = null;
+        while (true) {
+            try {
+                const url = version === null
+                    ? '/api/detection/get_counts/'
+                    : `/api/detection/get_counts/?version=${version}&timeout=${longPollTimeout}`;
+                const response = await fetch(url);
+                const data = await response.json();
+                if (data.version === undefined) {
+                    // Error, atau server tanpa dukungan long-poll: polling biasa
+                    emit(data);
+                    version = null;
+                    await sleep(pollInterval);
+                    continue;
+                }
+                if (data.version !== version) {
+                    emit(data);
+                }
+                version = data.version;
+            } catch (error) {
+                emit({ status: 'error', message: error.message });
+                version = null;
+                await sleep(pollInterval);
+            }
+        }
+    }
+
+    function startPolling() {
+        console.warn('Live count stream unavailable - falling back to long-polling');
+        polling = true;
+        poll();
+    }
+
+    function connect() {
+        if (!window.EventSource) {
+            startPolling();
+            return;
+        }
+        source = new EventSource('/api/detection/events/');
+        source.onmessage = (event) => {
+            failures = 0;
+            emit(JSON.parse(event.data));
+        };
+        source.onerror = () => {
+            // EventSource reconnects by itself; give up only if it keeps failing
+            failures++;
+            if (failures >= maxFailures) {
+                source.close();
+                source = null;
+                startPolling();
+            }
+        };
+    }
+
+    return {
+        subscribe(listener) {
+            listeners.push(listener);
+            if (latest) listener(latest);
+            if (!source && !polling) connect();
+        }
+    };
+})();
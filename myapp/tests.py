@@ -1,3 +1,803 @@
-from django.test import TestCase
+import asyncio
+import glob
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import cv2
+import httpx
+import numpy as np
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .ingest import apply_batch
+from .live import LiveCounts
+from .management.commands.explain_queries import Command as ExplainQueries
+from .models import CountEvent, DailyCountSummary, PalmOilCount
+from .pagination import PageError, decode_cursor, encode_cursor, keyset_page
+from . import thumbnails, views
+from .rollup import chunk_series, count_series, data_version, rebuild, record_saved
+from .upstream import DetectionServer, SingleFlight
+from .views import cached_period
+
+MEDIA_ROOT = tempfile.mkdtemp()
+JPEG = cv2.imencode('.jpg', np.zeros((8, 8, 3), dtype=np.uint8))[1].tobytes()
+
+
+def item(session_key, seq, suitable=0, unsuitable=0, status='running', **extra):
+    return {"session_key": session_key, "seq": seq, "suitable_count": suitable,
+            "unsuitable_count": unsuitable, "status": status, **extra}
+
+
+def event(session_key, seq, class_id=0, timestamp=1700000000.0):
+    return {"session_key": session_key, "seq": seq, "class_id": class_id, "confidence": 0.9,
+            "box": [1, 2, 3, 4], "timestamp": timestamp}
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class IngestTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_creates_records_with_their_logged_date(self):
+        logged_at = datetime(2024, 3, 1, 8, 30, tzinfo=dt_timezone.utc)
+        results, _ = apply_batch('dev', [item('s1', 1, 3, 1, date=logged_at.timestamp())])
+        self.assertEqual(results[0]["result"], "created")
+        record = PalmOilCount.objects.get(session_key='s1')
+        self.assertEqual((record.device, record.suitable_count, record.unsuitable_count, record.last_seq),
+                         ('dev', 3, 1, 1))
+        # A replayed backlog keeps the real date, not the replay time
+        self.assertEqual(record.date, logged_at)
+
+    def test_replaying_a_batch_is_idempotent(self):
+        batch = [item('s1', 1, 1), item('s2', 2, 0, 2)]
+        apply_batch('dev', batch)
+        results, _ = apply_batch('dev', batch)
+        self.assertEqual([r["result"] for r in results], ["stale", "stale"])
+        self.assertEqual(PalmOilCount.objects.count(), 2)
+        self.assertEqual(PalmOilCount.objects.get(session_key='s1').suitable_count, 1)
+
+    def test_newest_seq_per_session_wins(self):
+        results, _ = apply_batch('dev', [item('s1', 3, 3), item('s1', 2, 2), item('s1', 4, 4)])
+        self.assertEqual([r["result"] for r in results], ["stale", "stale", "created"])
+        self.assertEqual(len({r["id"] for r in results}), 1)
+        record = PalmOilCount.objects.get(session_key='s1')
+        self.assertEqual((record.suitable_count, record.last_seq), (4, 4))
+
+    def test_updates_only_with_a_newer_seq(self):
+        apply_batch('dev', [item('s1', 5, 5)])
+        results, _ = apply_batch('dev', [item('s1', 4, 1)])
+        self.assertEqual(results[0]["result"], "stale")
+        results, _ = apply_batch('dev', [item('s1', 6, 6, 1, status='stopped')])
+        self.assertEqual(results[0]["result"], "updated")
+        record = PalmOilCount.objects.get(session_key='s1')
+        self.assertEqual((record.suitable_count, record.unsuitable_count, record.status), (6, 1, 'stopped'))
+
+    def test_image_is_stored_on_create(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_batch('dev', [item('s1', 1, 1, image=JPEG, date=0)])
+        record = PalmOilCount.objects.get(session_key='s1')
+        self.assertTrue(record.image.name.startswith('palm_oil_images/palm_oil_19700101'))
+        with record.image.open('rb') as f:
+            self.assertEqual(f.read(), JPEG)
+
+    def test_taken_image_name_is_replaced(self):
+        other = cv2.imencode('.jpg', np.full((8, 8, 3), 255, dtype=np.uint8))[1].tobytes()
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_batch('dev', [item('s1', 1, 1, image=JPEG, date=0)])
+            apply_batch('dev', [item('s2', 2, 1, image=other, date=0)])
+        first, second = (PalmOilCount.objects.get(session_key=key).image for key in ('s1', 's2'))
+        self.assertNotEqual(first.name, second.name)
+        with second.open('rb') as f:
+            self.assertEqual(f.read(), other)
+
+    def test_rolled_back_batch_writes_no_image(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    apply_batch('dev', [item('s1', 1, 1, image=JPEG, date=86400)])
+                    raise RuntimeError("fail after the batch")
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertFalse(PalmOilCount.objects.exists())
+        self.assertFalse(glob.glob(os.path.join(MEDIA_ROOT, 'palm_oil_images', 'palm_oil_19700102*')))
+
+    def test_invalid_items_are_reported_individually(self):
+        results, _ = apply_batch('dev', [{"seq": 1}, item('s1', 1, 1)])
+        self.assertEqual(results[0]["result"], "error")
+        self.assertEqual(results[1]["result"], "created")
+
+    def test_endpoint_accepts_json(self):
+        body = {"device": "dev", "items": [item('s1', 1, 2)]}
+        response = self.client.post('/api/ingest/', json.dumps(body), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["result"], "created")
+
+    def test_endpoint_rejects_a_malformed_body(self):
+        response = self.client.post('/api/ingest/', '{"items": 1}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CountEventIngestTests(TestCase):
+    def test_events_are_linked_to_their_session(self):
+        _, counts = apply_batch('dev', [item('s1', 1, 1)], [event('s1', 2), event('s1', 3, class_id=1)])
+        self.assertEqual(counts, (2, 0))
+        record = PalmOilCount.objects.get(session_key='s1')
+        self.assertEqual(sorted(record.events.values_list('seq', 'class_id')), [(2, 0), (3, 1)])
+
+    def test_events_of_an_earlier_batch_find_their_session(self):
+        apply_batch('dev', [item('s1', 1, 1)])
+        apply_batch('dev', [], [event('s1', 2)])
+        self.assertEqual(CountEvent.objects.get(seq=2).session.session_key, 's1')
+
+    def test_replayed_events_are_skipped_and_not_reported_as_inserted(self):
+        apply_batch('dev', [], [event('s1', 1), event('s1', 2)])
+        _, counts = apply_batch('dev', [], [event('s1', 2), event('s1', 3)])
+        self.assertEqual(counts, (1, 0))
+        self.assertEqual(CountEvent.objects.count(), 3)
+
+    def test_same_seq_from_another_device_is_a_different_event(self):
+        apply_batch('dev-a', [], [event('s1', 1)])
+        _, counts = apply_batch('dev-b', [], [event('s2', 1)])
+        self.assertEqual(counts, (1, 0))
+
+    def test_malformed_events_are_rejected(self):
+        _, counts = apply_batch('dev', [], [event('s1', 1), {"seq": 2}])
+        self.assertEqual(counts, (1, 1))
+
+    def test_endpoint_reports_inserted_events(self):
+        body = {"device": "dev", "items": [], "events": [event('s1', 1)]}
+        for inserted in (1, 0):
+            response = self.client.post('/api/ingest/', json.dumps(body), content_type='application/json')
+            self.assertEqual(response.json()["events"], {"inserted": inserted, "rejected": 0})
+
+
+class ActiveSessionTests(TestCase):
+    def test_latest_active_is_the_newest_running_or_paused_record(self):
+        now = timezone.now()
+        PalmOilCount.objects.create(status='running', date=now - timedelta(hours=2))
+        paused = PalmOilCount.objects.create(status='paused', date=now - timedelta(hours=1))
+        PalmOilCount.objects.create(status='stopped', date=now)
+        self.assertEqual(PalmOilCount.objects.latest_active(), paused)
+
+    def test_latest_active_without_sessions(self):
+        PalmOilCount.objects.create(status='stopped')
+        self.assertIsNone(PalmOilCount.objects.latest_active())
+
+    def test_explain_flags_whole_index_walks(self):
+        table = PalmOilCount._meta.db_table
+        walk = f"SCAN {table} USING INDEX palmoilcount_date_id_idx"
+        self.assertTrue(ExplainQueries.is_full_scan(walk, f'SELECT * FROM {table} WHERE status IN (?) LIMIT 1'))
+        self.assertFalse(ExplainQueries.is_full_scan(walk, f'SELECT * FROM {table} ORDER BY date DESC LIMIT 1'))
+        self.assertTrue(ExplainQueries.is_full_scan(f"SCAN {table}", f'SELECT * FROM {table} LIMIT 1'))
+        self.assertFalse(ExplainQueries.is_full_scan(
+            f"SEARCH {table} USING INDEX palmoilcount_status_date_idx (status=?)", 'SELECT ... WHERE status = ?'))
+
+
+def summaries():
+    """Non-empty rollup buckets; deltas leave emptied buckets at zero, rebuild drops them"""
+    return {(row.day, row.device): (row.suitable_count, row.unsuitable_count)
+            for row in DailyCountSummary.objects.all() if row.suitable_count or row.unsuitable_count}
+
+
+class RollupTests(TestCase):
+    def test_incremental_rollup_matches_rebuild(self):
+        day = datetime(2024, 3, 1, 8, tzinfo=dt_timezone.utc).timestamp()
+        apply_batch('dev', [item('s1', 1, 2, 1, date=day), item('s2', 2, 4, date=day + 86400)])
+        apply_batch('dev', [item('s1', 3, 5, 2, status='stopped', date=day)])
+        PalmOilCount.objects.get(session_key='s2').delete()
+        incremental = summaries()
+        rebuild()
+        self.assertEqual(incremental, summaries())
+        self.assertEqual(list(incremental.values()), [(5, 2)])
+
+    def test_admin_edit_moves_counts_and_bumps_the_data_version(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.login(username='admin', password='secret')
+        old_day = timezone.localdate() - timedelta(days=400)
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_batch('dev', [item('s1', 1, 3, 1)])
+        record = PalmOilCount.objects.get(session_key='s1')
+        version = data_version('year', old_day)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/admin/myapp/palmoilcount/{record.id}/change/', {
+                'date_0': old_day.isoformat(), 'date_1': '10:00:00', 'suitable_count': 7,
+                'unsuitable_count': 1, 'status': 'stopped', 'session_key': 's1', 'last_seq': 1,
+                'device': 'dev',
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(summaries(), {(old_day, 'dev'): (7, 1)})
+        self.assertNotEqual(data_version('year', old_day), version)
+
+
+class CountSeriesTests(TestCase):
+    def setUp(self):
+        for day, device, suitable, unsuitable in [
+            (date(2024, 2, 28), 'dev-a', 1, 0),
+            (date(2024, 3, 1), 'dev-a', 2, 1),
+            (date(2024, 3, 1), 'dev-b', 3, 0),
+            (date(2024, 3, 4), 'dev-a', 0, 4),
+        ]:
+            DailyCountSummary.objects.create(day=day, device=device, suitable_count=suitable,
+                                             unsuitable_count=unsuitable)
+
+    def test_days_are_gap_filled_and_summed_over_devices(self):
+        self.assertEqual(count_series(date(2024, 2, 29), date(2024, 3, 4)), [
+            (date(2024, 2, 29), 0, 0),
+            (date(2024, 3, 1), 5, 1),
+            (date(2024, 3, 2), 0, 0),
+            (date(2024, 3, 3), 0, 0),
+            (date(2024, 3, 4), 0, 4),
+        ])
+
+    def test_weeks_start_on_monday(self):
+        # 2024-02-26 and 2024-03-04 are Mondays; the range starts mid-week
+        self.assertEqual(count_series(date(2024, 2, 28), date(2024, 3, 10), 'week'), [
+            (date(2024, 2, 26), 6, 1),
+            (date(2024, 3, 4), 0, 4),
+        ])
+
+    def test_months_cover_only_the_range(self):
+        self.assertEqual(count_series(date(2024, 2, 29), date(2024, 4, 30), 'month'), [
+            (date(2024, 2, 1), 0, 0),
+            (date(2024, 3, 1), 5, 5),
+            (date(2024, 4, 1), 0, 0),
+        ])
+
+    def test_unknown_unit(self):
+        with self.assertRaises(ValueError):
+            count_series(date(2024, 3, 1), date(2024, 3, 2), 'year')
+
+    def test_chunk_series_folds_consecutive_buckets(self):
+        series = count_series(date(2024, 2, 28), date(2024, 3, 4))
+        self.assertEqual(chunk_series(series, 3), [
+            (date(2024, 2, 28), 6, 1),
+            (date(2024, 3, 2), 0, 4),
+        ])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        base = datetime(2024, 3, 1, 8, tzinfo=dt_timezone.utc)
+        # Pairs of records share a date, so pages must break ties on id
+        self.records = [
+            PalmOilCount.objects.create(date=base + timedelta(hours=i // 2), suitable_count=i,
+                                        status='stopped' if i % 3 else 'running')
+            for i in range(7)
+        ]
+        User.objects.create_user('user', password='secret')
+
+    def test_cursor_round_trip(self):
+        record = self.records[0]
+        self.assertEqual(decode_cursor(encode_cursor(record)), (record.date, record.id))
+
+    def test_invalid_cursor(self):
+        for cursor in ('not base64!', 'bm8gc2VwYXJhdG9y', ''):
+            with self.assertRaises(PageError):
+                decode_cursor(cursor)
+
+    def test_pages_have_no_duplicates_or_gaps(self):
+        seen, cursor = [], None
+        while True:
+            records, cursor = keyset_page(PalmOilCount.objects.all(), cursor, limit=2)
+            seen += [record.id for record in records]
+            if cursor is None:
+                break
+        expected = [r.id for r in sorted(self.records, key=lambda r: (r.date, r.id), reverse=True)]
+        self.assertEqual(seen, expected)
+
+    def test_exact_last_page_has_no_next_cursor(self):
+        records, cursor = keyset_page(PalmOilCount.objects.all(), limit=7)
+        self.assertEqual((len(records), cursor), (7, None))
+
+    def test_endpoint_filters_by_status(self):
+        self.client.login(username='user', password='secret')
+        response = self.client.get('/api/tables/', {'status': 'running', 'limit': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['suitable_count'] for row in response.json()['rows']], [6, 3, 0])
+        self.assertIsNone(response.json()['next_cursor'])
+
+    def test_endpoint_filters_by_date(self):
+        PalmOilCount.objects.create(date=datetime(2024, 3, 5, 8, tzinfo=dt_timezone.utc), suitable_count=9)
+        self.client.login(username='user', password='secret')
+        response = self.client.get('/api/tables/', {'start': '2024-03-04', 'end': '2024-03-06'})
+        self.assertEqual([row['suitable_count'] for row in response.json()['rows']], [9])
+
+    def test_endpoint_follows_the_cursor(self):
+        self.client.login(username='user', password='secret')
+        first = self.client.get('/api/tables/', {'limit': 4}).json()
+        second = self.client.get('/api/tables/', {'limit': 4, 'cursor': first['next_cursor']}).json()
+        ids = [row['id'] for row in first['rows'] + second['rows']]
+        self.assertEqual(sorted(ids), sorted(r.id for r in self.records))
+        self.assertIsNone(second['next_cursor'])
+
+    def test_endpoint_rejects_bad_parameters(self):
+        self.client.login(username='user', password='secret')
+        for params in ({'cursor': '!!'}, {'status': 'bogus'}, {'start': '03/01/2024'}, {'limit': 'ten'}):
+            self.assertEqual(self.client.get('/api/tables/', params).status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        # A private single-worker pool, so the test can wait for the jobs it submitted
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(setattr, thumbnails, '_executor', thumbnails._executor)
+        thumbnails._executor = self.pool
+        image = cv2.imencode('.jpg', np.zeros((600, 800, 3), dtype=np.uint8))[1].tobytes()
+        self.image_name = default_storage.save('palm_oil_images/thumb_test.jpg', ContentFile(image))
+        self.addCleanup(default_storage.delete, self.image_name)
+        self.thumb_name = thumbnails.thumbnail_name(self.image_name)
+
+    def test_thumbnail_is_written_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            thumbnails.schedule_thumbnail(self.image_name)
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(default_storage.exists(self.thumb_name))
+
+        callbacks[0]()  # The commit
+        self.pool.shutdown(wait=True)
+        self.addCleanup(default_storage.delete, self.thumb_name)
+        with default_storage.open(self.thumb_name, 'rb') as f:
+            thumb = cv2.imdecode(np.frombuffer(f.read(), np.uint8), cv2.IMREAD_COLOR)
+        size = settings.THUMBNAIL_CONFIG['MAX_SIZE']
+        self.assertEqual(thumb.shape[:2], (size * 3 // 4, size))
+
+    def test_nothing_runs_on_rollback(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    thumbnails.schedule_thumbnail(self.image_name)
+                    raise RuntimeError("roll back")
+            except RuntimeError:
+                pass
+        self.pool.shutdown(wait=True)
+        self.assertEqual(callbacks, [])
+        self.assertFalse(default_storage.exists(self.thumb_name))
+
+
+class CachedPeriodTests(TestCase):
+    MARCH = date(2024, 3, 1)
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return {"calls": self.calls}
+
+    def march(self):
+        return cached_period('test', 'month', self.MARCH, self.compute)
+
+    def record(self, month=3):
+        return PalmOilCount.objects.create(date=datetime(2024, month, 10, 8, tzinfo=dt_timezone.utc),
+                                           suitable_count=1)
+
+    def test_served_from_cache_until_a_record_is_saved(self):
+        self.assertEqual(self.march(), {"calls": 1})
+        self.assertEqual(self.march(), {"calls": 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            record_saved(self.record())
+        self.assertEqual(self.march(), {"calls": 2})
+
+    def test_deleting_a_record_invalidates_its_period(self):
+        record = self.record()
+        self.march()
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delete()
+        self.assertEqual(self.march(), {"calls": 2})
+
+    def test_writes_to_other_periods_keep_the_cache(self):
+        self.march()
+        with self.captureOnCommitCallbacks(execute=True):
+            record_saved(self.record(month=4))
+        self.assertEqual(self.march(), {"calls": 1})
+
+    def test_endpoints_reflect_a_new_record(self):
+        User.objects.create_user('user', password='secret')
+        self.client.login(username='user', password='secret')
+        requests = [('/api/dashboard/period-data/', {'period_type': 'month', 'period_value': '2024-03'}),
+                    ('/api/dashboard/week-data/', {'week': '2024-W10'})]  # 4-10 March
+        for url, params in requests:
+            self.assertEqual(self.client.get(url, params).json()["weekly_suitable"], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_batch('dev', [item('s1', 1, 4, date=datetime(2024, 3, 10, 8, tzinfo=dt_timezone.utc).timestamp())])
+        for url, params in requests:
+            self.assertEqual(self.client.get(url, params).json()["weekly_suitable"], 4)
+
+
+class FakeEventStream:
+    """Stands in for requests: each get() is one /events connection fed from lines"""
+
+    def __init__(self, error=None):
+        self.lines = queue.Queue()
+        self.error = error
+        self.connections = 0
+        self.closed = 0
+
+    def send(self, snapshot):
+        self.lines.put(f"data: {json.dumps(snapshot)}")
+
+    def get(self, url, stream, timeout):
+        if self.error:
+            raise self.error
+        self.connections += 1
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.closed += 1
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, chunk_size, decode_unicode):
+        while True:
+            try:
+                yield self.lines.get(timeout=0.02)
+            except queue.Empty:
+                yield ''  # Keep-alive: lets the relay notice it went idle
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class LiveCountsTests(SimpleTestCase):
+    def live(self, http, idle_timeout=0.05):
+        return LiveCounts(lambda: 'http://detector/events', read_timeout=1, idle_timeout=idle_timeout,
+                          retry_interval=0.05, http=http)
+
+    def test_every_subscriber_gets_each_event_over_one_connection(self):
+        upstream = FakeEventStream()
+        live = self.live(upstream)
+        with live.listening(), live.listening():
+            upstream.send({"suitable_count": 1})
+            results = []
+            readers = [threading.Thread(target=lambda: results.append(live.wait(0, timeout=2)))
+                       for _ in range(3)]
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join()
+            self.assertEqual(results, [(1, {"suitable_count": 1})] * 3)
+
+            upstream.send({"suitable_count": 1})  # Unchanged: no new version
+            upstream.send({"suitable_count": 2})
+            self.assertEqual(live.wait(1, timeout=2), (2, {"suitable_count": 2}))
+        self.assertEqual(upstream.connections, 1)
+
+    def test_async_subscribers(self):
+        upstream = FakeEventStream()
+        live = self.live(upstream)
+
+        async def subscribe():
+            with live.listening():
+                threading.Timer(0.05, upstream.send, [{"status": "running"}]).start()
+                return await asyncio.gather(live.wait_async(0, 2), live.wait_async(0, 2))
+
+        self.assertEqual(asyncio.run(subscribe()), [(1, {"status": "running"})] * 2)
+        self.assertEqual(live._waiters, [])
+
+    def test_timed_out_async_waiter_is_removed(self):
+        live = self.live(FakeEventStream())
+        self.assertEqual(asyncio.run(live.wait_async(0, 0.05)), (0, None))
+        self.assertEqual(live._waiters, [])
+
+    def test_upstream_closes_after_the_last_subscriber_leaves(self):
+        upstream = FakeEventStream()
+        live = self.live(upstream)
+        with live.listening():
+            upstream.send({"suitable_count": 1})
+            live.wait(0, timeout=2)
+        self.assertTrue(wait_until(lambda: live._thread is None))
+        self.assertEqual((upstream.connections, upstream.closed), (1, 1))
+
+        # A new subscriber opens a new connection
+        with live.listening():
+            self.assertTrue(wait_until(lambda: upstream.connections == 2))
+
+    def test_upstream_error_is_published(self):
+        live = self.live(FakeEventStream(error=requests.exceptions.ConnectionError("refused")), idle_timeout=0)
+        with live.listening():
+            version, snapshot = live.wait(0, timeout=2)
+        self.assertEqual(snapshot["status"], "error")
+        self.assertIn("refused", snapshot["message"])
+
+
+class SingleFlightTests(SimpleTestCase):
+    CALLERS = 5
+
+    def concurrent(self, flight, fn):
+        """Run do() from CALLERS threads while fn is held until all of them joined"""
+        release = threading.Event()
+        outcomes = [None] * self.CALLERS
+
+        def held():
+            release.wait(2)
+            return fn()
+
+        def call(index):
+            try:
+                outcomes[index] = ('ok', flight.do('counts', held))
+            except Exception as e:
+                outcomes[index] = ('error', e)
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(self.CALLERS)]
+        for thread in threads:
+            thread.start()
+        self.assertTrue(wait_until(lambda: flight.stats()["shared"] == self.CALLERS - 1))
+        release.set()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        upstream_calls = []
+
+        def fetch():
+            upstream_calls.append(1)
+            return {"suitable_count": 3}
+
+        outcomes = self.concurrent(flight, fetch)
+        self.assertEqual(len(upstream_calls), 1)
+        self.assertEqual({id(value) for _, value in outcomes}, {id(outcomes[0][1])})
+        self.assertEqual(outcomes[0], ('ok', {"suitable_count": 3}))
+        self.assertEqual(flight.stats(), {"calls": 1, "shared": self.CALLERS - 1, "in_flight": 0})
+
+    def test_exception_reaches_every_waiter_and_releases_the_key(self):
+        flight = SingleFlight()
+        error = ConnectionError("server down")
+
+        def fail():
+            raise error
+
+        outcomes = self.concurrent(flight, fail)
+        self.assertEqual(outcomes, [('error', error)] * self.CALLERS)
+        self.assertEqual(flight.stats()["in_flight"], 0)
+        # Nothing cached: the next caller makes a new call
+        self.assertEqual(flight.do('counts', lambda: 'fresh'), 'fresh')
+        self.assertEqual(flight.stats()["calls"], 2)
+
+    def test_ttl_keeps_the_result(self):
+        flight = SingleFlight()
+        flight.do('counts', lambda: 1, ttl=60)
+        self.assertEqual(flight.do('counts', lambda: 2, ttl=60), 1)
+        self.assertEqual(flight.do('other', lambda: 3), 3)
+
+    def test_async_callers_share_one_call(self):
+        flight = SingleFlight()
+        upstream_calls = []
+
+        async def fetch():
+            upstream_calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"status": "running"}
+
+        async def burst():
+            return await asyncio.gather(*(flight.ado('counts', fetch) for _ in range(self.CALLERS)))
+
+        self.assertEqual(asyncio.run(burst()), [{"status": "running"}] * self.CALLERS)
+        self.assertEqual(len(upstream_calls), 1)
+
+    def test_async_exception_reaches_every_waiter(self):
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ConnectionError("server down")
+
+        async def burst():
+            return await asyncio.gather(*(flight.ado('counts', fail) for _ in range(self.CALLERS)),
+                                        return_exceptions=True)
+
+        results = asyncio.run(burst())
+        self.assertTrue(all(isinstance(result, ConnectionError) for result in results))
+        self.assertEqual(flight.stats(), {"calls": 1, "shared": self.CALLERS - 1, "in_flight": 0})
+
+
+class DetectionServerTests(SimpleTestCase):
+    CANDIDATES = ['http://localhost:5000', 'http://192.168.1.10:5000', 'http://detector:5000']
+
+    def setUp(self):
+        # Candidate URL -> status code, or None when it does not answer
+        self.upstream = dict.fromkeys(self.CANDIDATES, 200)
+        self.server = DetectionServer(self.CANDIDATES, check_interval=60)
+        patcher = mock.patch.object(self.server.session, 'get', side_effect=self.get)
+        self.probe = patcher.start()
+        self.addCleanup(patcher.stop)
+        # Keep the failover log lines out of the test output
+        quiet = mock.patch('myapp.upstream.print', create=True)
+        quiet.start()
+        self.addCleanup(quiet.stop)
+
+    def get(self, url, timeout):
+        status = self.upstream[url.removesuffix('/get_counts')]
+        if status is None:
+            raise requests.exceptions.ConnectionError(url)
+        return mock.Mock(status_code=status)
+
+    def test_first_healthy_candidate_is_chosen(self):
+        self.upstream[self.CANDIDATES[0]] = None
+        self.upstream[self.CANDIDATES[1]] = 503
+        self.assertEqual(self.server.check(), self.CANDIDATES[2])
+        self.assertEqual(self.server.status(), {"url": self.CANDIDATES[2], "healthy": True})
+        self.assertEqual([call.args[0] for call in self.probe.call_args_list],
+                         [f"{url}/get_counts" for url in self.CANDIDATES])
+
+    def test_preferred_candidate_wins_when_everything_answers(self):
+        self.assertEqual(self.server.check(), self.CANDIDATES[0])
+        self.assertEqual(self.probe.call_count, 1)
+
+    def test_last_candidate_is_kept_unhealthy_when_all_fail(self):
+        self.upstream.update(dict.fromkeys(self.CANDIDATES))
+        self.assertEqual(self.server.check(), self.CANDIDATES[-1])
+        self.assertEqual(self.server.status(), {"url": self.CANDIDATES[-1], "healthy": False})
+        self.assertEqual(self.probe.call_count, len(self.CANDIDATES))
+
+    def test_report_failure_rechecks_without_waiting(self):
+        self.assertEqual(self.server.url(), self.CANDIDATES[0])
+        self.upstream[self.CANDIDATES[0]] = None
+        # The next scheduled check is a minute away; only report_failure() can fail over
+        self.assertFalse(wait_until(lambda: self.server.url() != self.CANDIDATES[0], timeout=0.1))
+        self.server.report_failure()
+        self.assertTrue(wait_until(lambda: self.server.url() == self.CANDIDATES[1]))
+        self.assertTrue(self.server.status()["healthy"])
+
+        # And back once the preferred server answers again
+        self.upstream[self.CANDIDATES[0]] = 200
+        self.server.report_failure()
+        self.assertTrue(wait_until(lambda: self.server.url() == self.CANDIDATES[0]))
+
+    def test_async_client_is_shared_per_loop_and_closed_with_it(self):
+        async def clients():
+            return self.server.async_client(), self.server.async_client()
+
+        first, again = asyncio.run(clients())
+        self.assertIs(first, again)
+        self.assertTrue(first.is_closed)
+        self.assertEqual(self.server._async_clients, {})
+
+        second, _ = asyncio.run(clients())
+        self.assertIsNot(second, first)
+        self.assertTrue(second.is_closed)
+
+
+class DetectionProxyTests(TestCase):
+    """The async proxy views against a mocked detection server"""
+
+    UPSTREAM = 'http://detector:5000'
+    UNREACHABLE = 'http://unreachable:5000'
+    FRAME = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + b'\xff\xd8\xff\xd9' + b'\r\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user', password='secret')
+
+    def setUp(self):
+        self.requests = []
+        self.counts = {"suitable_count": 2, "unsuitable_count": 1, "status": "running", "version": 7}
+        client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+        for patcher in (
+            mock.patch.object(views.detection_server, '_url', self.UPSTREAM),
+            mock.patch.object(views.detection_server, 'async_client', return_value=client),
+            mock.patch.object(views.detection_server, 'report_failure'),
+            mock.patch.object(views, 'upstream_calls', SingleFlight()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def handle(self, request):
+        self.requests.append((request.method, request.url.path, dict(request.url.params)))
+        path = request.url.path.strip('/')
+        if request.url.host == 'unreachable':
+            raise httpx.ConnectError("Connection refused", request=request)
+        if path == 'video_feed':
+            return httpx.Response(200, content=self.frames(3),
+                                  headers={"Content-Type": "multipart/x-mixed-replace; boundary=frame"})
+        if path == 'get_counts':
+            return httpx.Response(200, json=self.counts, headers={"ETag": f'"{self.counts["version"]}"'})
+        return httpx.Response(200, json={"status": {"start": "started", "pause": "paused",
+                                                    "resume": "resumed", "stop": "stopped"}[path]})
+
+    async def frames(self, count):
+        for _ in range(count):
+            yield self.FRAME
+
+    async def post(self, action):
+        await self.async_client.aforce_login(self.user)
+        return await self.async_client.post(f'/api/detection/{action}/')
+
+    async def test_start_stops_the_active_session(self):
+        running = await PalmOilCount.objects.acreate(status='running')
+        response = await self.post('start')
+        self.assertEqual(response.json(), {"status": "started"})
+        self.assertEqual(self.requests, [('POST', '/start', {})])
+        await running.arefresh_from_db()
+        self.assertEqual(running.status, 'stopped')
+
+    async def test_pause_and_resume_follow_the_server(self):
+        session = await PalmOilCount.objects.acreate(status='running')
+        self.assertEqual((await self.post('pause')).json(), {"status": "paused"})
+        await session.arefresh_from_db()
+        self.assertEqual(session.status, 'paused')
+
+        self.assertEqual((await self.post('resume')).json(), {"status": "resumed"})
+        await session.arefresh_from_db()
+        self.assertEqual(session.status, 'running')
+
+    async def test_stop_is_proxied(self):
+        self.assertEqual((await self.post('stop')).json(), {"status": "stopped"})
+        self.assertEqual(self.requests, [('POST', '/stop', {})])
+
+    async def test_unreachable_server_reports_a_failure(self):
+        with mock.patch.object(views.detection_server, '_url', self.UNREACHABLE):
+            for action in ('start', 'pause', 'resume', 'stop'):
+                response = await self.post(action)
+                self.assertEqual(response.json()["status"], "error")
+        self.assertEqual(views.detection_server.report_failure.call_count, 4)
+
+    async def test_video_feed_relays_the_stream(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/api/video_feed/')
+        self.assertEqual(response['Content-Type'], 'multipart/x-mixed-replace; boundary=frame')
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), self.FRAME * 3)
+
+    async def test_get_counts_passes_the_etag_through(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/api/detection/get_counts/')
+        self.assertEqual(response.json(), self.counts)
+        self.assertEqual(response['ETag'], '"7"')
+
+        response = await self.async_client.get('/api/detection/get_counts/', headers={"If-None-Match": '"7"'})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_get_counts_long_poll_is_forwarded_capped(self):
+        await self.async_client.aforce_login(self.user)
+        await self.async_client.get('/api/detection/get_counts/', {'version': 7, 'timeout': 999})
+        (method, path, params), = self.requests
+        self.assertEqual((method, path, params['version']), ('GET', '/get_counts', '7'))
+        self.assertEqual(float(params['timeout']), settings.DETECTION_SERVER_CONFIG['LONG_POLL_TIMEOUT'])
+
+    async def test_get_counts_reuses_a_fresh_result(self):
+        await self.async_client.aforce_login(self.user)
+        for _ in range(3):
+            await self.async_client.get('/api/detection/get_counts/')
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_get_counts_error(self):
+        await self.async_client.aforce_login(self.user)
+        with mock.patch.object(views.detection_server, '_url', self.UNREACHABLE):
+            response = await self.async_client.get('/api/detection/get_counts/')
+        self.assertEqual(response.json()["status"], "error")
+        views.detection_server.report_failure.assert_called_once_with()
+
+    async def test_login_required(self):
+        response = await self.async_client.post('/api/detection/start/')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.requests, [])
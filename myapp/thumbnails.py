@@ -0,0 +1,86 @@
+import posixpath
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+THUMBNAIL_DIR = 'thumbs'
+
+_executor = None
+_executor_lock = threading.Lock()
+_save_lock = threading.Lock()
+
+
+def thumbnail_name(image_name):
+    """palm_oil_images/x.jpg -> palm_oil_images/thumbs/x.jpg, next to the original"""
+    directory, filename = posixpath.split(image_name)
+    return posixpath.join(directory, THUMBNAIL_DIR, posixpath.splitext(filename)[0] + '.jpg')
+
+
+def thumbnail_version(image_name):
+    """Short token for the thumbnail URL; changes when the record gets another image"""
+    return format(zlib.crc32(image_name.encode()), '08x')
+
+
+def make_thumbnail(image_name, force=False):
+    """Create the thumbnail of a stored image unless it exists; returns its storage name.
+
+    Raises OSError if the original is missing and ValueError if it cannot
+    be decoded.
+    """
+    name = thumbnail_name(image_name)
+    if not force and default_storage.exists(name):
+        return name
+
+    config = settings.THUMBNAIL_CONFIG
+    with default_storage.open(image_name, 'rb') as f:
+        data = f.read()
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError(f"{image_name} is not a readable image")
+
+    height, width = frame.shape[:2]
+    scale = config['MAX_SIZE'] / max(height, width)
+    if scale < 1:
+        # INTER_AREA: no aliasing when shrinking
+        frame = cv2.resize(frame, (max(round(width * scale), 1), max(round(height * scale), 1)),
+                           interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, config['QUALITY']])
+    if not ok:
+        raise ValueError(f"Could not encode thumbnail of {image_name}")
+
+    # The worker and an early page view may race for the same image
+    with _save_lock:
+        if default_storage.exists(name):
+            if not force:
+                return name
+            default_storage.delete(name)
+        return default_storage.save(name, ContentFile(encoded.tobytes()))
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.THUMBNAIL_CONFIG['WORKERS'],
+                                           thread_name_prefix='thumbnails')
+        return _executor
+
+
+def _make_thumbnail_logged(image_name):
+    try:
+        make_thumbnail(image_name)
+    except (OSError, ValueError) as e:
+        print(f"Error creating thumbnail for {image_name}: {e}")
+
+
+def schedule_thumbnail(image_name):
+    """Create the thumbnail in the worker pool once the current transaction commits"""
+    if image_name:
+        transaction.on_commit(lambda: executor().submit(_make_thumbnail_logged, image_name))
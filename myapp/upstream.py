@@ -0,0 +1,196 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one upstream call.
+
+    The first caller for a key runs the function; callers arriving while
+    it is in flight wait for and share its result (or exception). A
+    successful result is also kept for ttl seconds, so a burst of polls
+    right after it is answered without another call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> Future of the call in flight
+        self._results = {}  # key -> (expires_at, value)
+        self._tasks = set()  # ado() calls in flight, referenced until done
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, fn, ttl=0):
+        leader, future = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            value = fn()
+        except BaseException as e:
+            self._fail(key, future, e)
+            raise
+        return self._finish(key, future, value, ttl)
+
+    async def ado(self, key, fn, ttl=0):
+        """do() for async views: fn returns a coroutine, waiting doesn't block the event loop"""
+        leader, future = self._join(key)
+        if leader:
+            # Its own task, so a caller that disconnects doesn't cancel the
+            # call for everyone else waiting on it
+            task = asyncio.ensure_future(fn())
+            self._tasks.add(task)
+            task.add_done_callback(lambda task: self._settle(key, future, task, ttl))
+        # A concurrent Future, so callers on other event loops/threads can share it too
+        return await asyncio.wrap_future(future)
+
+    def _join(self, key):
+        """(True, new Future to fill) or (False, Future in flight or already done)"""
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                if cached[0] > time.monotonic():
+                    self.shared += 1
+                    future = Future()
+                    future.set_result(cached[1])
+                    return False, future
+                del self._results[key]
+
+            future = self._calls.get(key)
+            if future is None:
+                future = self._calls[key] = Future()
+                future.set_running_or_notify_cancel()  # Waiters giving up must not cancel it
+                self.calls += 1
+                return True, future
+            self.shared += 1
+            return False, future
+
+    def _fail(self, key, future, e):
+        with self._lock:
+            del self._calls[key]
+        future.set_exception(e)
+
+    def _finish(self, key, future, value, ttl):
+        with self._lock:
+            del self._calls[key]
+            if ttl > 0:
+                self._results[key] = (time.monotonic() + ttl, value)
+        future.set_result(value)
+        return value
+
+    def _settle(self, key, future, task, ttl):
+        self._tasks.discard(task)
+        if task.cancelled():
+            self._fail(key, future, asyncio.CancelledError())
+        elif task.exception() is not None:
+            self._fail(key, future, task.exception())
+        else:
+            self._finish(key, future, task.result(), ttl)
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._calls)}
+
+
+class DetectionServer:
+    """Resolved detection server URL plus one pooled HTTP session for the proxy views.
+
+    A background thread probes the candidate base URLs (in order of
+    preference) every check_interval seconds and keeps the first one that
+    answers, so url() is a plain attribute read and requests reuse
+    keep-alive connections instead of probing and reconnecting each time.
+    report_failure() asks for an immediate re-check, which is how a dead
+    localhost fails over to the configured IP (and back) between checks.
+
+    Async views use async_client() instead of the session: one pooled
+    httpx.AsyncClient per event loop, i.e. one for the whole ASGI server.
+    It is closed when its loop shuts down, so the short-lived loops that
+    async_to_sync() runs each request in under WSGI leave no pools behind.
+    """
+
+    def __init__(self, candidates, check_interval=10.0, probe_timeout=2.0, pool_size=10):
+        self.candidates = list(candidates)
+        self.check_interval = check_interval
+        self.probe_timeout = probe_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.candidates), pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self._async_clients = {}  # event loop -> (httpx.AsyncClient, task closing it with the loop)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._url = None
+        self._healthy = False
+        self._thread = None
+
+    def url(self):
+        if self._url is None:
+            with self._lock:
+                # Pertama kali: cek langsung, sesudahnya hanya di background
+                if self._url is None:
+                    self.check()
+                    self._thread = threading.Thread(target=self._run, name="detection-health")
+                    self._thread.daemon = True
+                    self._thread.start()
+        return self._url
+
+    async def aurl(self):
+        """url() for async views; the first check runs in a thread instead of the event loop"""
+        if self._url is None:
+            return await asyncio.to_thread(self.url)
+        return self._url
+
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            client = httpx.AsyncClient(limits=self.limits)
+            self._async_clients[loop] = (client, loop.create_task(self._close_with_loop(loop, client)))
+        return self._async_clients[loop][0]
+
+    async def _close_with_loop(self, loop, client):
+        """Wait for the loop to shut down, then close its client.
+
+        asyncio.run() (and so async_to_sync()) cancels the tasks still
+        pending before it closes the loop, which lets the finally block run.
+        """
+        try:
+            await loop.create_future()
+        finally:
+            del self._async_clients[loop]
+            await client.aclose()
+
+    def check(self):
+        """Probe the candidates and keep the first healthy one (the last one if none is)"""
+        for url in self.candidates:
+            try:
+                response = self.session.get(f"{url}/get_counts", timeout=self.probe_timeout)
+                if response.status_code == 200:
+                    self._set(url, True)
+                    return url
+            except requests.exceptions.RequestException:
+                pass
+        self._set(self.candidates[-1], False)
+        return self._url
+
+    def report_failure(self):
+        """A proxied request could not reach the server: re-check without waiting"""
+        self._wake.set()
+
+    def status(self):
+        return {"url": self._url, "healthy": self._healthy}
+
+    def _set(self, url, healthy):
+        if url != self._url and self._url is not None:
+            print(f"Detection server URL: {self._url} -> {url}")
+        self._url, self._healthy = url, healthy
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.check_interval)
+            self._wake.clear()
+            self.check()
@@ -10,6 +10,7 @@ urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
     path('control/', views.control, name='control'),
     path('tables/', views.tables, name='tables'),
+    path('thumbnails/<int:record_id>/', views.thumbnail, name='thumbnail'),
     
     # API endpoints
     path('api/detection/start/', views.start_detection, name='start_detection'),
@@ -18,8 +19,11 @@ urlpatterns = [
     path('api/detection/stop/', views.stop_detection, name='stop_detection'),
     path('api/video_feed/', views.video_feed, name='video_feed'),
     path('api/detection/get_counts/', views.get_counts, name='get_counts'),
+    path('api/detection/events/', views.count_events, name='count_events'),
+    path('api/tables/', views.tables_data, name='tables_data'),
     path('api/dashboard/week-data/', views.get_week_data, name='get_week_data'),
     path('api/dashboard/period-data/', views.get_period_data, name='get_period_data'),
     path('api/save_count_data/', views.save_count_data_api, name='save_count_data_api'),
     path('api/update_count_data/<int:record_id>/', views.update_count_data_api, name='update_count_data_api'),
+    path('api/ingest/', views.ingest_count_data_api, name='ingest_count_data_api'),
 ] 
\ No newline at end of file
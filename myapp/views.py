@@ -1,52 +1,87 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, StreamingHttpResponse
+from django.http import FileResponse, Http404, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 import json
 from datetime import datetime, timedelta, date
 from .models import PalmOilCount
-from django.db.models import Sum
-from django.db.models.functions import TruncWeek
-from ultralytics import YOLO
-import cv2
-import threading
-from .detection_state import detection_state
-import os
-import requests
+from django.db import transaction
+from .ingest import IngestError, apply_batch, decode_batch
+from .live import KEEPALIVE, LiveCounts
+from .upstream import DetectionServer, SingleFlight
+from .pagination import STATUSES, PageError, table_page
+from .rollup import CountDeltas, chunk_series, count_series, data_version
+from .thumbnails import make_thumbnail, schedule_thumbnail
+import httpx
 from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.utils import timezone
+from django.utils.http import parse_etags
 
 from django.views.decorators.csrf import csrf_exempt
-from django.utils import timezone
+
+def day_label(i, bucket):
+    return bucket.strftime('%a')  # Mon, Tue, etc.
+
+def month_label(i, bucket):
+    return bucket.strftime('%b')
+
+def chart_rows(series, label):
+    """Chart data for the dashboard JS from a count_series() result"""
+    return [
+        {
+            'day': label(i, bucket),
+            'date': bucket.strftime('%Y-%m-%d'),
+            'suitable_count': suitable,
+            'unsuitable_count': unsuitable
+        }
+        for i, (bucket, suitable, unsuitable) in enumerate(series)
+    ]
+
+def cached_period(name, unit, start, compute):
+    """compute() for one week/month/year, cached until that period's data changes.
+
+    The key carries the period's data version (bumped after every write to
+    it), so finished periods stay cached and no entry is ever stale.
+    """
+    key = f"{name}:{unit}:{start.isoformat()}:{data_version(unit, start)}"
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, None)
+    return value
 
 # Buat fungsi helper untuk mendapatkan URL server deteksi
-def get_detection_server_url():
+def detection_server_candidates():
     config = settings.DETECTION_SERVER_CONFIG
     base_url = f"{config['HOST']}:{config['PORT']}"
-    
-    # Jika berjalan di mesin yang sama, coba localhost dulu
+
+    # Jika berjalan di mesin yang sama, coba localhost dulu, lalu IP yang dikonfigurasi
     if config['HOST'] in ['http://192.168.137.150', 'http://127.0.0.1', 'http://localhost']:
-        # Coba localhost terlebih dahulu
-        try:
-            import requests
-            test_url = f"http://localhost:{config['PORT']}/get_counts"
-            response = requests.get(test_url, timeout=2)
-            if response.status_code == 200:
-                return f"http://localhost:{config['PORT']}"
-        except:
-            pass
-        
-        # Jika localhost gagal, coba IP yang dikonfigurasi
-        try:
-            test_url = f"{base_url}/get_counts"
-            response = requests.get(test_url, timeout=2)
-            if response.status_code == 200:
-                return base_url
-        except:
-            pass
-    
-    return base_url
+        return [f"http://localhost:{config['PORT']}", base_url]
+    return [base_url]
+
+# URL server deteksi dicek di background; semua proxy view memakai satu session (connection pool)
+detection_server = DetectionServer(
+    detection_server_candidates(),
+    check_interval=settings.DETECTION_SERVER_CONFIG['HEALTH_CHECK_INTERVAL'],
+    pool_size=settings.DETECTION_SERVER_CONFIG['POOL_SIZE'],
+)
+
+def get_detection_server_url():
+    return detection_server.url()
+
+# Panggilan GET yang sama ke server deteksi dijalankan sekali untuk semua request
+upstream_calls = SingleFlight()
+
+# Satu koneksi /events ke server deteksi, dibagi ke semua browser yang terbuka
+live_counts = LiveCounts(
+    lambda: f"{get_detection_server_url()}/events",
+    read_timeout=settings.DETECTION_SERVER_CONFIG['EVENTS_TIMEOUT'],
+    http=detection_server.session,
+)
 
 def index(request):
     return render(request, 'myapp/index.html')
@@ -70,54 +105,30 @@ def logout_view(request):
 
 @login_required
 def dashboard(request):
-    # Dapatkan tanggal hari ini
-    today = timezone.now()
+    # Dapatkan tanggal hari ini (zona waktu lokal)
+    today = timezone.localdate()
     
     # Hitung awal dan akhir minggu (Senin-Minggu)
     start_of_week = today - timedelta(days=today.weekday())
-    start_of_week = start_of_week.replace(hour=0, minute=0, second=0, microsecond=0)
-    
     end_of_week = start_of_week + timedelta(days=6)
-    end_of_week = end_of_week.replace(hour=23, minute=59, second=59, microsecond=999999)
     
-    # Ambil data untuk minggu ini
-    weekly_data = PalmOilCount.objects.filter(
-        date__range=[start_of_week, end_of_week]
-    ).aggregate(
-        weekly_suitable=Sum('suitable_count'),
-        weekly_unsuitable=Sum('unsuitable_count')
-    )
-
-    # Siapkan data harian untuk chart
-    daily_data = []
-    for i in range(7):  # 7 hari dalam seminggu
-        current_date = start_of_week + timedelta(days=i)
-        next_date = current_date + timedelta(days=1)
-        
-        daily_counts = PalmOilCount.objects.filter(
-            date__range=[current_date, next_date]
-        ).aggregate(
-            suitable_count=Sum('suitable_count'),
-            unsuitable_count=Sum('unsuitable_count')
-        )
-        
-        daily_data.append({
-            'date': current_date.strftime('%Y-%m-%d'),
-            'day': current_date.strftime('%a'),  # Nama hari singkat (Mon, Tue, etc.)
-            'suitable_count': daily_counts['suitable_count'] or 0,
-            'unsuitable_count': daily_counts['unsuitable_count'] or 0
-        })
+    def week_summary():
+        # Data harian untuk chart, satu query ke rollup
+        daily_data = chart_rows(count_series(start_of_week, end_of_week, 'day'), day_label)
+        return {
+            'weekly_suitable': sum(day['suitable_count'] for day in daily_data),
+            'weekly_unsuitable': sum(day['unsuitable_count'] for day in daily_data),
+            'chart_data': json.dumps(daily_data),  # Serialize ke JSON string
+        }
 
-    # Data terakhir untuk status
+    # Data terakhir untuk status (tidak di-cache, status berubah tanpa perubahan count)
     latest_count = PalmOilCount.objects.order_by('-date').first()
 
     context = {
-        'weekly_suitable': weekly_data['weekly_suitable'] or 0,
-        'weekly_unsuitable': weekly_data['weekly_unsuitable'] or 0,
+        **cached_period('dashboard', 'week', start_of_week, week_summary),
         'last_counted': latest_count.date if latest_count else None,
         'start_of_week': start_of_week.strftime('%d %B %Y'),
         'end_of_week': end_of_week.strftime('%d %B %Y'),
-        'chart_data': json.dumps(daily_data),  # Serialize ke JSON string
         'counting_status': latest_count.status if latest_count else 'stopped'
     }
     
@@ -137,175 +148,234 @@ def control(request):
 
 @login_required
 def tables(request):
-    table_data = PalmOilCount.objects.all().order_by('-date')
-    
-    # Format data untuk template dengan tanggal yang konsisten
-    formatted_data = []
-    for item in table_data:
-        formatted_item = {
-            'id': item.id,
-            'date': item.date.strftime('%Y-%m-%d'),  # Format YYYY-MM-DD untuk filter
-            'date_display': item.date.strftime('%d/%m/%Y'),  # Format display yang user-friendly
-            'suitable_count': item.suitable_count,
-            'unsuitable_count': item.unsuitable_count,
-            'image': item.image if item.image else None,
-            'status': item.status
-        }
-        formatted_data.append(formatted_item)
-        
-        # Debug logging
-        print(f"Item {item.id}: date={formatted_item['date']}, display={formatted_item['date_display']}")
-        
-        if item.image:
-            print(f"Image path: {item.image.path}")
-            print(f"Image URL: {item.image.url}")
-    
-    print(f"Total items sent to template: {len(formatted_data)}")
-    return render(request, 'myapp/tables.html', {'table_data': formatted_data})
+    # Only the first page is rendered; tables.js fetches the rest from tables_data
+    return render(request, 'myapp/tables.html', {
+        'first_page': table_page({}),
+        'statuses': STATUSES,
+    })
+
+@login_required
+def tables_data(request):
+    """API endpoint untuk satu halaman tabel (filter start/end/status, cursor, limit)"""
+    try:
+        return JsonResponse(table_page(request.GET))
+    except PageError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+
+@login_required
+def thumbnail(request, record_id):
+    """Thumbnail of a record's image; the URL carries a version token, so browsers keep it"""
+    image_name = PalmOilCount.objects.filter(id=record_id).values_list('image', flat=True).first()
+    if not image_name:
+        raise Http404("No image for this record")
+    try:
+        # Normally already made by the worker pool; made here if the page got there first
+        name = make_thumbnail(image_name)
+    except (OSError, ValueError):
+        raise Http404("Image not available")
+
+    response = FileResponse(default_storage.open(name, 'rb'), content_type='image/jpeg')
+    response['Cache-Control'] = f"private, max-age={settings.THUMBNAIL_CONFIG['MAX_AGE']}, immutable"
+    return response
 
 @login_required
-def start_detection(request):
+async def start_detection(request):
     try:
         # Pastikan tidak ada sesi yang sedang berjalan
-        active_session = PalmOilCount.objects.filter(status__in=['running', 'paused']).first()
+        active_session = await PalmOilCount.objects.alatest_active()
         if active_session:
             active_session.status = 'stopped'
-            active_session.save()
+            await active_session.asave(update_fields=['status'])
 
-        response = requests.post(
-            f"{get_detection_server_url()}/start",
+        response = await detection_server.async_client().post(
+            f"{await detection_server.aurl()}/start",
             timeout=settings.DETECTION_SERVER_CONFIG['TIMEOUT']
         )
         
         # Hapus pembuatan record baru di sini karena akan dibuat oleh detection server
         return JsonResponse(response.json())
-    except requests.exceptions.ConnectionError as e:
+    except httpx.ConnectError as e:
+        detection_server.report_failure()
         return JsonResponse({
             "status": "error",
             "message": f"Cannot connect to detection server. Please check:\n1. Detection server is running\n2. IP address is correct: {get_detection_server_url()}\n3. Firewall allows port 5000\n\nError: {str(e)}"
         })
-    except requests.exceptions.Timeout as e:
+    except httpx.TimeoutException as e:
+        detection_server.report_failure()
         return JsonResponse({
             "status": "error", 
             "message": f"Connection to detection server timed out. Server may be overloaded or network is slow. Error: {str(e)}"
         })
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, ValueError) as e:
+        detection_server.report_failure()
         return JsonResponse({
             "status": "error",
             "message": f"Cannot connect to detection server: {str(e)}"
         })
 
 @login_required
-def pause_detection(request):
+async def pause_detection(request):
     try:
-        response = requests.post(
-            f"{get_detection_server_url()}/pause",
+        response = await detection_server.async_client().post(
+            f"{await detection_server.aurl()}/pause",
             timeout=settings.DETECTION_SERVER_CONFIG['TIMEOUT']
         )
         
         if response.json()['status'] == 'paused':
             # Update status sesi yang sedang berjalan
-            current_session = PalmOilCount.objects.filter(status='running').first()
+            current_session = await PalmOilCount.objects.filter(status='running').afirst()
             if current_session:
                 current_session.status = 'paused'
-                current_session.save()
+                await current_session.asave(update_fields=['status'])
         
         return JsonResponse(response.json())
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, ValueError) as e:
+        detection_server.report_failure()
         return JsonResponse({
             "status": "error",
             "message": f"Cannot connect to detection server: {str(e)}"
         })
 
 @login_required
-def resume_detection(request):
+async def resume_detection(request):
     try:
-        response = requests.post(
-            f"{get_detection_server_url()}/resume",
+        response = await detection_server.async_client().post(
+            f"{await detection_server.aurl()}/resume",
             timeout=settings.DETECTION_SERVER_CONFIG['TIMEOUT']
         )
         
         if response.json()['status'] == 'resumed':
             # Update status sesi yang sedang berjalan
-            current_session = PalmOilCount.objects.filter(status='paused').first()
+            current_session = await PalmOilCount.objects.filter(status='paused').afirst()
             if current_session:
                 current_session.status = 'running'
-                current_session.save()
+                await current_session.asave(update_fields=['status'])
         
         return JsonResponse(response.json())
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, ValueError) as e:
+        detection_server.report_failure()
         return JsonResponse({
             "status": "error",
             "message": f"Cannot connect to detection server: {str(e)}"
         })
 
 @login_required
-def stop_detection(request):
+async def stop_detection(request):
     try:
-        response = requests.post(
-            f"{get_detection_server_url()}/stop",
+        response = await detection_server.async_client().post(
+            f"{await detection_server.aurl()}/stop",
             timeout=settings.DETECTION_SERVER_CONFIG['TIMEOUT']
         )
         
         # Hapus update status di sini karena sudah ditangani oleh detection server
         return JsonResponse(response.json())
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, ValueError) as e:
+        detection_server.report_failure()
         return JsonResponse({
             "status": "error",
             "message": f"Cannot connect to detection server: {str(e)}"
         })
 
-def gen_frames():
-    while True:
-        if detection_state.cap and detection_state.is_running:
-            ret, frame = detection_state.cap.read()
-            if not ret:
-                break
-            
-            # Gunakan frame yang sudah diproses jika ada
-            if hasattr(detection_state, 'current_frame') and detection_state.current_frame is not None:
-                frame = detection_state.current_frame
-                
-            # Encode frame ke format JPEG
-            ret, buffer = cv2.imencode('.jpg', frame)
-            frame = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-
 @login_required
-def video_feed(request):
+async def video_feed(request):
+    client = detection_server.async_client()
     try:
-        return StreamingHttpResponse(
-            requests.get(
-                f"{get_detection_server_url()}/video_feed",
-                stream=True,
+        upstream = await client.send(
+            client.build_request(
+                'GET',
+                f"{await detection_server.aurl()}/video_feed",
                 timeout=settings.DETECTION_SERVER_CONFIG['TIMEOUT']
             ),
-            content_type='multipart/x-mixed-replace; boundary=frame'
+            stream=True
         )
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
+        detection_server.report_failure()
         return JsonResponse({
             "status": "error",
             "message": f"Cannot connect to video feed: {str(e)}"
         })
+    return StreamingHttpResponse(relay_stream(upstream), content_type='multipart/x-mixed-replace; boundary=frame')
+
+async def relay_stream(upstream):
+    """Teruskan body yang di-stream dari server deteksi, lalu kembalikan koneksinya ke pool"""
+    try:
+        async for chunk in upstream.aiter_raw():
+            yield chunk
+    finally:
+        await upstream.aclose()
+
+async def fetch_counts(version=None, wait=0):
+    """(etag, data) from the detection server's /get_counts, long-polling if version is set"""
+    params = {'version': version, 'timeout': wait} if version is not None else {}
+    response = await detection_server.async_client().get(
+        f"{await detection_server.aurl()}/get_counts",
+        params=params,
+        timeout=settings.DETECTION_SERVER_CONFIG['TIMEOUT'] + wait
+    )
+    return response.headers.get('ETag'), response.json()
 
 @login_required
-def get_counts(request):
+async def get_counts(request):
+    """Proxy ke /get_counts; ?version=V long-polls and If-None-Match gets 304, like upstream.
+
+    Concurrent requests share one upstream call and a plain result is
+    reused for COALESCE_TTL seconds, so the detection server sees the
+    same load however many tabs are polling.
+    """
+    config = settings.DETECTION_SERVER_CONFIG
+    version, wait = request.GET.get('version'), 0
+    if version is not None:
+        try:
+            wait = min(float(request.GET.get('timeout', config['LONG_POLL_TIMEOUT'])), config['LONG_POLL_TIMEOUT'])
+        except ValueError:
+            wait = config['LONG_POLL_TIMEOUT']
+
     try:
-        response = requests.get(
-            f"{get_detection_server_url()}/get_counts",
-            timeout=settings.DETECTION_SERVER_CONFIG['TIMEOUT']
+        etag, data = await upstream_calls.ado(
+            ('get_counts', version, wait),
+            lambda: fetch_counts(version, wait),
+            # A long-poll answer is only news to the requests that waited for it
+            ttl=0 if version is not None else config['COALESCE_TTL'],
         )
-        data = response.json()
-        
-        # Hapus pembuatan/update record di sini karena sudah ditangani oleh detection server
-        return JsonResponse(data)
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, ValueError) as e:
+        detection_server.report_failure()
         return JsonResponse({
             "status": "error",
             "message": f"Cannot connect to detection server: {str(e)}"
         })
 
+    if etag is None:
+        # Hapus pembuatan/update record di sini karena sudah ditangani oleh detection server
+        return JsonResponse(data)
+    if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(data)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+@login_required
+async def count_events(request):
+    """Server-Sent Events: counts dan status di-push ke browser setiap ada perubahan"""
+    async def stream():
+        with live_counts.listening():
+            yield "retry: 3000\n\n"
+            version = 0
+            while True:
+                new_version, snapshot = await live_counts.wait_async(version, KEEPALIVE)
+                if new_version == version:
+                    yield ": keep-alive\n\n"
+                    continue
+                version = new_version
+                yield f"data: {json.dumps(snapshot)}\n\n"
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
 @csrf_exempt
 def get_week_data(request):
@@ -315,7 +385,6 @@ def get_week_data(request):
     try:
         if request.method == 'POST':
             # Handle POST request dengan JSON data
-            import json
             data = json.loads(request.body)
             week_str = data.get('week')
         else:
@@ -360,54 +429,29 @@ def get_week_data(request):
         
         week_end = week_start + timedelta(days=6)
         
-        # Ambil data untuk minggu tersebut
-        week_data = PalmOilCount.objects.filter(
-            date__date__range=[week_start, week_end]
-        ).values(
-            'date__date'
-        ).annotate(
-            suitable_count=Sum('suitable_count'),
-            unsuitable_count=Sum('unsuitable_count')
-        ).order_by('date__date')
-        
-        # Format data untuk chart
-        daily_data = []
-        for i in range(7):  # 7 hari dalam seminggu
-            current_date = week_start + timedelta(days=i)
-            day_name = current_date.strftime('%a')  # Mon, Tue, etc.
+        def week_payload():
+            # Ambil data untuk minggu tersebut dari rollup harian
+            daily_data = chart_rows(count_series(week_start, week_end, 'day'), day_label)
             
-            # Cari data untuk hari ini
-            day_data = next(
-                (item for item in week_data if item['date__date'] == current_date),
-                {'suitable_count': 0, 'unsuitable_count': 0}
-            )
+            # Hitung total untuk minggu ini
+            weekly_suitable = sum(day['suitable_count'] for day in daily_data)
+            weekly_unsuitable = sum(day['unsuitable_count'] for day in daily_data)
             
-            daily_data.append({
-                'day': day_name,
-                'date': current_date.strftime('%Y-%m-%d'),
-                'suitable_count': day_data['suitable_count'] or 0,
-                'unsuitable_count': day_data['unsuitable_count'] or 0
-            })
-        
-        # Hitung total untuk minggu ini
-        weekly_suitable = sum(day['suitable_count'] for day in daily_data)
-        weekly_unsuitable = sum(day['unsuitable_count'] for day in daily_data)
-        
-        # Get last counted date
-        last_count = PalmOilCount.objects.filter(
-            date__date__range=[week_start, week_end]
-        ).order_by('-date').first()
+            # Get last counted date
+            last_count = PalmOilCount.objects.between_dates(week_start, week_end).order_by('-date').first()
+            
+            return {
+                "status": "success",
+                "weekly_suitable": weekly_suitable,
+                "weekly_unsuitable": weekly_unsuitable,
+                "last_counted": last_count.date.strftime('%d %b %Y') if last_count else 'No data',
+                "counting_status": "stopped",
+                "start_of_week": week_start.strftime('%d %B %Y'),
+                "end_of_week": week_end.strftime('%d %B %Y'),
+                "chart_data": json.dumps(daily_data)
+            }
         
-        return JsonResponse({
-            "status": "success",
-            "weekly_suitable": weekly_suitable,
-            "weekly_unsuitable": weekly_unsuitable,
-            "last_counted": last_count.date.strftime('%d %b %Y') if last_count else 'No data',
-            "counting_status": "stopped",
-            "start_of_week": week_start.strftime('%d %B %Y'),
-            "end_of_week": week_end.strftime('%d %B %Y'),
-            "chart_data": json.dumps(daily_data)
-        })
+        return JsonResponse(cached_period('week_data', 'week', week_start, week_payload))
         
     except Exception as e:
         return JsonResponse({
@@ -423,7 +467,6 @@ def get_period_data(request):
     """
     try:
         if request.method == 'POST':
-            import json
             data = json.loads(request.body)
             period_type = data.get('period_type')  # 'week', 'month', atau 'year'
             period_value = data.get('period_value')
@@ -484,106 +527,40 @@ def get_period_data(request):
                 "message": "Invalid period type"
             }, status=400)
         
-        # Get data for the period
-        period_data = PalmOilCount.objects.filter(
-            date__date__range=[period_start, period_end]
-        ).values(
-            'date__date'
-        ).annotate(
-            suitable_count=Sum('suitable_count'),
-            unsuitable_count=Sum('unsuitable_count')
-        ).order_by('date__date')
-        
-        # Format data for chart based on period type
-        if period_type == 'week':
-            # Daily data for week
-            daily_data = []
-            for i in range(7):
-                current_date = period_start + timedelta(days=i)
-                day_name = current_date.strftime('%a')
-                
-                day_data = next(
-                    (item for item in period_data if item['date__date'] == current_date),
-                    {'suitable_count': 0, 'unsuitable_count': 0}
-                )
-                
-                daily_data.append({
-                    'day': day_name,
-                    'date': current_date.strftime('%Y-%m-%d'),
-                    'suitable_count': day_data['suitable_count'] or 0,
-                    'unsuitable_count': day_data['unsuitable_count'] or 0
-                })
-                
-        elif period_type == 'month':
-            # Weekly data for month
-            daily_data = []
-            current_date = period_start
-            week_num = 1
+        def period_payload():
+            # Chart data from the daily rollup: one GROUP BY whatever the period length
+            if period_type == 'week':
+                # Daily data for week
+                daily_data = chart_rows(count_series(period_start, period_end, 'day'), day_label)
+            elif period_type == 'month':
+                # Weekly data for month: 7-day chunks from the 1st (Week 1 = days 1-7)
+                weeks = chunk_series(count_series(period_start, period_end, 'day'), 7)
+                daily_data = chart_rows(weeks, lambda i, bucket: f'Week {i + 1}')
+            elif period_type == 'year':
+                # Monthly data for year
+                daily_data = chart_rows(count_series(period_start, period_end, 'month'), month_label)
             
-            while current_date <= period_end:
-                week_end = min(current_date + timedelta(days=6), period_end)
-                
-                week_data = PalmOilCount.objects.filter(
-                    date__date__range=[current_date, week_end]
-                ).aggregate(
-                    suitable_count=Sum('suitable_count'),
-                    unsuitable_count=Sum('unsuitable_count')
-                )
-                
-                daily_data.append({
-                    'day': f'Week {week_num}',
-                    'date': current_date.strftime('%Y-%m-%d'),
-                    'suitable_count': week_data['suitable_count'] or 0,
-                    'unsuitable_count': week_data['unsuitable_count'] or 0
-                })
-                
-                current_date = week_end + timedelta(days=1)
-                week_num += 1
-                
-        elif period_type == 'year':
-            # Monthly data for year
-            daily_data = []
-            for month in range(1, 13):
-                month_start = date(year, month, 1)
-                if month == 12:
-                    month_end = date(year, 12, 31)
-                else:
-                    month_end = date(year, month + 1, 1) - timedelta(days=1)
-                
-                month_data = PalmOilCount.objects.filter(
-                    date__date__range=[month_start, month_end]
-                ).aggregate(
-                    suitable_count=Sum('suitable_count'),
-                    unsuitable_count=Sum('unsuitable_count')
-                )
-                
-                daily_data.append({
-                    'day': month_start.strftime('%b'),
-                    'date': month_start.strftime('%Y-%m-%d'),
-                    'suitable_count': month_data['suitable_count'] or 0,
-                    'unsuitable_count': month_data['unsuitable_count'] or 0
-                })
-        
-        # Calculate totals
-        total_suitable = sum(day['suitable_count'] for day in daily_data)
-        total_unsuitable = sum(day['unsuitable_count'] for day in daily_data)
-        
-        # Get last counted date in period
-        last_count = PalmOilCount.objects.filter(
-            date__date__range=[period_start, period_end]
-        ).order_by('-date').first()
+            # Calculate totals
+            total_suitable = sum(day['suitable_count'] for day in daily_data)
+            total_unsuitable = sum(day['unsuitable_count'] for day in daily_data)
+            
+            # Get last counted date in period
+            last_count = PalmOilCount.objects.between_dates(period_start, period_end).order_by('-date').first()
+            
+            return {
+                "status": "success",
+                "period_type": period_type,
+                "weekly_suitable": total_suitable,
+                "weekly_unsuitable": total_unsuitable,
+                "last_counted": last_count.date.strftime('%d %b %Y') if last_count else 'No data',
+                "counting_status": "stopped",
+                "start_of_week": title,
+                "end_of_week": "",
+                "chart_data": json.dumps(daily_data)
+            }
         
-        return JsonResponse({
-            "status": "success",
-            "period_type": period_type,
-            "weekly_suitable": total_suitable,
-            "weekly_unsuitable": total_unsuitable,
-            "last_counted": last_count.date.strftime('%d %b %Y') if last_count else 'No data',
-            "counting_status": "stopped",
-            "start_of_week": title,
-            "end_of_week": "",
-            "chart_data": json.dumps(daily_data)
-        })
+        # Past weeks, months and years never change: computed once, then served from cache
+        return JsonResponse(cached_period('period_data', period_type, period_start, period_payload))
         
     except Exception as e:
         return JsonResponse({
@@ -591,6 +568,33 @@ def get_period_data(request):
             "message": f"Error retrieving period data: {str(e)}"
         }, status=500)
 
+def add_to_rollup(count_record, old_suitable=0, old_unsuitable=0):
+    """Push one record's count change into the daily rollup"""
+    deltas = CountDeltas()
+    deltas.add(count_record, old_suitable, old_unsuitable)
+    deltas.apply()
+
+def apply_sequenced_update(count_record, suitable_count, unsuitable_count, status, seq):
+    """Apply an update only if seq is newer than the last one applied to the record.
+
+    The row is locked while the check and the write happen, so concurrent
+    retries of the same update cannot both apply, and the daily rollup gets
+    the exact count delta. Returns True if the update was applied.
+    """
+    with transaction.atomic():
+        locked = PalmOilCount.objects.select_for_update().get(id=count_record.id)
+        applied = seq > locked.last_seq
+        if applied:
+            old_suitable, old_unsuitable = locked.suitable_count, locked.unsuitable_count
+            locked.suitable_count = suitable_count
+            locked.unsuitable_count = unsuitable_count
+            locked.status = status
+            locked.last_seq = seq
+            locked.save(update_fields=['suitable_count', 'unsuitable_count', 'status', 'last_seq'])
+            add_to_rollup(locked, old_suitable, old_unsuitable)
+    count_record.refresh_from_db()
+    return applied
+
 @csrf_exempt
 def save_count_data_api(request):
     """
@@ -604,6 +608,8 @@ def save_count_data_api(request):
                 suitable_count = int(request.POST.get('suitable_count', 0))
                 unsuitable_count = int(request.POST.get('unsuitable_count', 0))
                 status = request.POST.get('status', 'running')
+                session_key = request.POST.get('session_key') or None
+                seq = int(request.POST.get('seq', 0))
                 image = request.FILES.get('image', None)
             else:
                 # Request JSON biasa
@@ -611,16 +617,42 @@ def save_count_data_api(request):
                 suitable_count = data.get('suitable_count', 0)
                 unsuitable_count = data.get('unsuitable_count', 0)
                 status = data.get('status', 'running')
+                session_key = data.get('session_key') or None
+                seq = int(data.get('seq') or 0)
                 image = None
             
-            # Buat record baru di database
-            count_record = PalmOilCount.objects.create(
-                suitable_count=suitable_count,
-                unsuitable_count=unsuitable_count,
-                status=status,
-                date=timezone.now(),
-                image=image  # Simpan gambar jika ada
-            )
+            if session_key:
+                # Replayed from the detection server's count log: a retried
+                # create returns the existing record instead of a duplicate
+                with transaction.atomic():
+                    count_record, created = PalmOilCount.objects.get_or_create(
+                        session_key=session_key,
+                        defaults={
+                            "suitable_count": suitable_count,
+                            "unsuitable_count": unsuitable_count,
+                            "status": status,
+                            "date": timezone.now(),
+                            "image": image,
+                            "last_seq": seq,
+                        }
+                    )
+                    if created:
+                        add_to_rollup(count_record)
+                        schedule_thumbnail(count_record.image.name)
+                    else:
+                        apply_sequenced_update(count_record, suitable_count, unsuitable_count, status, seq)
+            else:
+                # Buat record baru di database
+                with transaction.atomic():
+                    count_record = PalmOilCount.objects.create(
+                        suitable_count=suitable_count,
+                        unsuitable_count=unsuitable_count,
+                        status=status,
+                        date=timezone.now(),
+                        image=image  # Simpan gambar jika ada
+                    )
+                    add_to_rollup(count_record)
+                    schedule_thumbnail(count_record.image.name)
             
             return JsonResponse({
                 "status": "success",
@@ -663,14 +695,22 @@ def update_count_data_api(request, record_id):
             suitable_count = data.get('suitable_count', 0)
             unsuitable_count = data.get('unsuitable_count', 0)
             status = data.get('status', 'running')
+            seq = data.get('seq')
             
             # Update record yang sudah ada
             try:
                 count_record = PalmOilCount.objects.get(id=record_id)
-                count_record.suitable_count = suitable_count
-                count_record.unsuitable_count = unsuitable_count
-                count_record.status = status
-                count_record.save()
+                if seq is not None:
+                    # Sequenced update from the count log: stale or repeated ones are ignored
+                    apply_sequenced_update(count_record, suitable_count, unsuitable_count, status, int(seq))
+                else:
+                    with transaction.atomic():
+                        old_suitable, old_unsuitable = count_record.suitable_count, count_record.unsuitable_count
+                        count_record.suitable_count = suitable_count
+                        count_record.unsuitable_count = unsuitable_count
+                        count_record.status = status
+                        count_record.save()
+                        add_to_rollup(count_record, old_suitable, old_unsuitable)
                 
                 return JsonResponse({
                     "status": "success",
@@ -705,3 +745,37 @@ def update_count_data_api(request, record_id):
             "status": "error",
             "message": "Only PUT method allowed"
         }, status=405)
+
+@csrf_exempt
+def ingest_count_data_api(request):
+    """
+    Batch endpoint: apply many session updates from a detection server at once.
+    Body (JSON or application/msgpack): {"device": "...", "items": [{"session_key", "seq",
+    "suitable_count", "unsuitable_count", "status", "date", "image"}, ...],
+    "events": [{"session_key", "seq", "timestamp", "class_id", "confidence", "box"}, ...]}
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            "status": "error",
+            "message": "Only POST method allowed"
+        }, status=405)
+
+    try:
+        device, items, events = decode_batch(request)
+        results, (events_inserted, events_rejected) = apply_batch(device, items, events)
+        return JsonResponse({
+            "status": "success",
+            "count": len(results),
+            "results": results,
+            "events": {"inserted": events_inserted, "rejected": events_rejected}
+        })
+    except IngestError as e:
+        return JsonResponse({
+            "status": "error",
+            "message": str(e)
+        }, status=400)
+    except Exception as e:
+        return JsonResponse({
+            "status": "error",
+            "message": f"Error ingesting data: {str(e)}"
+        }, status=500)
@@ -32,6 +32,7 @@ ALLOWED_HOSTS = ['localhost', '127.0.0.1', '192.168.0.158', '192.168.0.56', '192
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',  # runserver melayani ASGI (proxy view server deteksi async)
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -73,6 +74,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'myproject.wsgi.application'
+ASGI_APPLICATION = 'myproject.asgi.application'
 
 
 # Database
@@ -135,6 +137,20 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 LOGIN_REDIRECT_URL = 'myapp:dashboard'
 LOGIN_URL = 'myapp:login'
 
+# Cache untuk data dashboard dan endpoint periode (lihat myapp.rollup.data_version).
+# LocMemCache berlaku per proses; kalau Django dijalankan dengan beberapa worker
+# process, ganti ke 'django.core.cache.backends.filebased.FileBasedCache' dengan
+# LOCATION sebuah folder, supaya versi data terbagi antar proses.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'palm-oil-counter',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    }
+}
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -158,4 +174,17 @@ DETECTION_SERVER_CONFIG = {
     'HOST': 'http://192.168.137.250',  # IP server deteksi
     'PORT': 5000,
     'TIMEOUT': 10,
-} 
\ No newline at end of file
+    'EVENTS_TIMEOUT': 30,  # Batas tunggu stream /events (harus > EVENTS_KEEPALIVE di server deteksi)
+    'LONG_POLL_TIMEOUT': 25,  # Maksimal tunggu get_counts?version=... (long-poll), detik
+    'COALESCE_TTL': 0.5,  # Detik hasil get_counts dipakai bersama oleh semua request
+    'HEALTH_CHECK_INTERVAL': 10,  # Detik antar pengecekan URL server deteksi di background
+    'POOL_SIZE': 10,  # Maksimal koneksi keep-alive ke server deteksi
+}
+
+# Thumbnail gambar sesi untuk halaman tables (dibuat di background saat upload)
+THUMBNAIL_CONFIG = {
+    'MAX_SIZE': 320,  # Sisi terpanjang dalam pixel (sel tabel 150px, cukup untuk layar 2x)
+    'QUALITY': 75,  # Kualitas JPEG
+    'WORKERS': 2,  # Thread pembuat thumbnail
+    'MAX_AGE': 31536000,  # Cache-Control browser (detik); gambar sesi tidak pernah berubah
+}